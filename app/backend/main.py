@@ -1,22 +1,66 @@
 import os
-import zipfile
+import time
+import queue
+import asyncio
 from typing import List
-from PIL import Image
 import json
+from contextlib import asynccontextmanager
 
 import warnings
 warnings.filterwarnings("ignore")
 
-from fastapi import FastAPI, UploadFile, File
-from fastapi.responses import FileResponse
+# Момент запуска процесса сервиса, от которого отсчитывается время до готовности
+STARTED_AT = time.time()
+
+from fastapi import FastAPI, UploadFile, File, HTTPException, Request, Response
+from fastapi.responses import FileResponse, StreamingResponse, JSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.middleware.cors import CORSMiddleware
+from starlette.background import BackgroundTask
+
+from model.model import YOLOModel, load_model, CLASS_NAMES, COLORS
+from model.renderer import Renderer
+from model.tiling import tile_windows, iter_tiles, shift_detections, merge_detections
+from model.batching import BatchingEngine
+from model.detections import Detections
+from utils.executors import ExecutionLayer
+from utils.jobs import JobManager
+from utils.cache import ResultCache, file_digest, image_digest
+from utils.workspace import Workspace, WorkspaceManager
+from utils.archive import ArchiveCache, STORED_EXTENSIONS, list_files, iter_zip
+from utils.columnar import ColumnarWriter, ColumnarReader
+from utils import metrics
+from utils import profiling
+from utils.native_text import NativeTextLayer, load_fitz
+from utils.file_handling import (
+    save_upload, load_page, process_zip, render_pdf_page, points_to_pixels, Page, PdfPageProducer, shutdown_render_pool
+)
 
-from model.model import load_model
-from utils.file_handling import save_upload, clean_up, pdf_to_images
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Запускает фоновые обработчики заданий и удаление устаревших рабочих пространств
+    на время работы приложения.
+
+    Модель загружается и прогревается в фоне: сервер сразу начинает принимать запросы,
+    а готовность к обработке сообщает GET /health/ready.
+    """
+    await job_manager.start()
+    await workspaces.start()
+    loader = asyncio.create_task(load_service())
+    yield
+    loader.cancel()
+    await asyncio.gather(loader, return_exceptions=True)
+    await workspaces.stop()
+    await job_manager.stop()
+    if batch_engine is not None:
+        batch_engine.close()
+    if MODEL_SERVER and yolo_model is not None:
+        yolo_model.runtime.close()
+    shutdown_render_pool()
 
 # Создаем экземпляр FastAPI
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # Настройка CORS
 origins = [
@@ -34,14 +78,228 @@ app.add_middleware(
 
 # Путь к весам модели
 MODEL_WEIGHTS = "model/best_model.pt"
-# Загружаем модель
-yolo_model = load_model(MODEL_WEIGHTS)
+# Среда выполнения модели (torch, onnx, openvino), размер входа и потоки на операцию для onnx/openvino
+MODEL_BACKEND = os.getenv("MODEL_BACKEND", "torch")
+MODEL_IMGSZ = int(os.getenv("MODEL_IMGSZ", "1024"))
+MODEL_THREADS = int(os.getenv("MODEL_THREADS", "0")) or None
+# Размеры синтетических страниц (ширина x высота) и количество проходов прогрева модели
+WARMUP_SIZES = [
+    tuple(int(side) for side in size.split("x"))
+    for size in os.getenv("WARMUP_SIZES", "2550x3300").split(",") if size
+]
+WARMUP_RUNS = int(os.getenv("WARMUP_RUNS", "1"))
+# Адрес сервера модели (unix-сокет или host:port). Если задан, воркер не загружает веса,
+# а отправляет страницы общему процессу модели (python -m model.server)
+MODEL_SERVER = os.getenv("MODEL_SERVER", "")
+MODEL_SERVER_TIMEOUT = float(os.getenv("MODEL_SERVER_TIMEOUT", "120"))
+# Модель загружается при старте приложения (см. load_service)
+yolo_model = None
+
+# Размеры пулов потоков для ввода-вывода и для инференса
+IO_WORKERS = int(os.getenv("IO_WORKERS", "8"))
+INFERENCE_WORKERS = int(os.getenv("INFERENCE_WORKERS", "1"))
+# Слой выполнения блокирующей работы вне цикла событий
+executors = ExecutionLayer(io_workers=IO_WORKERS, inference_workers=INFERENCE_WORKERS)
+
+# Параметры динамического батчинга
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "8"))
+BATCH_MAX_WAIT_MS = float(os.getenv("BATCH_MAX_WAIT_MS", "10"))
+BATCH_MAX_QUEUE = int(os.getenv("BATCH_MAX_QUEUE", "256"))
+# Движок, собирающий страницы всех запросов в общие батчи; создается после загрузки модели
+batch_engine = None
+
+# Сколько отрендеренных страниц PDF может ожидать инференса
+PDF_PREFETCH = int(os.getenv("PDF_PREFETCH", "2"))
+# Сколько страниц одного запроса обрабатывается одновременно. По умолчанию — два батча:
+# пока модель занята одним, страницы следующего уже стоят в очереди и уходят полным батчем
+PAGE_CONCURRENCY = int(os.getenv("PAGE_CONCURRENCY", str(2 * BATCH_MAX_SIZE)))
+# Количество процессов для параллельного рендеринга PDF (1 — рендеринг в одном потоке)
+RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", "1"))
+# Количество страниц в одной задаче процесса рендеринга
+RENDER_CHUNK = int(os.getenv("RENDER_CHUNK", "4"))
+# Сохранять ли отрендеренные страницы PDF в PNG на диск
+PERSIST_PAGES = os.getenv("PERSIST_PAGES", "0") == "1"
+
+# Порог уверенности для предсказаний
+CONF_THRESHOLD = float(os.getenv("CONF_THRESHOLD", "0.5"))
+
+# Инференс по перекрывающимся окнам для страниц, сторона которых больше TILE_SIZE (0 — отключен):
+# перекрытие окон в пикселях, порог IoU для объединения объектов на стыках, количество окон
+# страницы в обработке одновременно и дополнительный проход по всей странице для крупных объектов
+TILE_SIZE = int(os.getenv("TILE_SIZE", "0"))
+TILE_OVERLAP = int(os.getenv("TILE_OVERLAP", "256"))
+TILE_NMS_IOU = float(os.getenv("TILE_NMS_IOU", "0.5"))
+TILE_BATCH = int(os.getenv("TILE_BATCH", str(BATCH_MAX_SIZE)))
+TILE_FULL_PAGE = os.getenv("TILE_FULL_PAGE", "1") == "1"
+# Предел длинной стороны страницы PDF, отрендеренной для инференса по окнам: растр страницы
+# целиком находится в памяти (хеш для кеша, проход по всей странице), поэтому крупноформатные
+# страницы рендерятся с меньшим разрешением, чем 300 DPI
+TILE_MAX_SIDE = int(os.getenv("TILE_MAX_SIDE", "8192"))
+
+# Разрешение рендеринга страниц PDF для модели: auto — длинная сторона страницы равна MODEL_IMGSZ,
+# то есть ровно столько пикселей, сколько модель использует (при инференсе по окнам — 300 DPI);
+# число — фиксированное разрешение в DPI
+RENDER_DPI = os.getenv("RENDER_DPI", "auto")
+RENDER_MAX_SIDE = MODEL_IMGSZ if RENDER_DPI == "auto" and not TILE_SIZE else 0
+RENDER_SIDE_LIMIT = TILE_MAX_SIDE if TILE_SIZE else 0
+RENDER_FIXED_DPI = 300.0 if RENDER_DPI == "auto" else float(RENDER_DPI)
+# Гибридный режим: страницы PDF с богатым текстовым слоем (не меньше NATIVE_TEXT_MIN_CHARS символов,
+# изображения покрывают не больше NATIVE_TEXT_MAX_IMAGE_COVERAGE площади) размечаются по текстовому
+# слою без модели, сканы и страницы почти без текста — моделью. Требует пакет pymupdf
+NATIVE_TEXT = os.getenv("NATIVE_TEXT", "0") == "1"
+NATIVE_TEXT_MIN_CHARS = int(os.getenv("NATIVE_TEXT_MIN_CHARS", "200"))
+NATIVE_TEXT_MAX_IMAGE_COVERAGE = float(os.getenv("NATIVE_TEXT_MAX_IMAGE_COVERAGE", "0.5"))
+# Разрешение отдельного рендеринга страниц PDF для аннотированных изображений (0 — рисовать
+# на изображении, по которому работала модель)
+OUTPUT_DPI = float(os.getenv("OUTPUT_DPI", "0"))
+# Разрешение, в координатах которого записываются рамки и размеры страниц PDF в JSON-аннотациях
+# (0 — в пикселях изображения, по которому работала модель); запрос может задать свое значение
+ANNOTATION_DPI = float(os.getenv("ANNOTATION_DPI", "300"))
 
-# Директории для загрузки, результатов и JSON-файлов
+# Формат аннотированных изображений (png, jpeg, webp; пусто — как у исходной страницы),
+# качество JPEG/WebP, уровень сжатия PNG и максимальная сторона превью (0 — исходный размер)
+RESULT_FORMAT = os.getenv("RESULT_FORMAT", "")
+RESULT_QUALITY = int(os.getenv("RESULT_QUALITY", "85"))
+RESULT_PNG_COMPRESSION = int(os.getenv("RESULT_PNG_COMPRESSION", "6"))
+RESULT_MAX_SIDE = int(os.getenv("RESULT_MAX_SIDE", "0"))
+renderer = Renderer(
+    CLASS_NAMES, COLORS,
+    image_format=RESULT_FORMAT,
+    quality=RESULT_QUALITY,
+    compress_level=RESULT_PNG_COMPRESSION,
+    max_side=RESULT_MAX_SIDE
+)
+
+# Формат аннотаций: json — JSON-файл на страницу, columnar — один колоночный файл
+# на запрос (JSON страницы формируется из него по запросу), both — оба
+ANNOTATION_OUTPUT = os.getenv("ANNOTATION_OUTPUT", "json")
+# Имя колоночного файла аннотаций в рабочем пространстве
+COLUMNAR_FILENAME = "annotations.columnar"
+
+# Профилирование запросов: запрос с заголовком PROFILE_HEADER, равным PROFILE_TOKEN,
+# профилируется всегда, остальные — с вероятностью PROFILE_SAMPLE_RATE.
+# Профиль сохраняется в рабочее пространство запроса
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+PROFILE_HEADER = os.getenv("PROFILE_HEADER", "X-Profile")
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+# Интервал между снимками стеков, мс
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "10"))
+
+# Директории для загрузки, результатов и JSON-файлов.
+# Каждый запрос работает в своем подкаталоге (рабочем пространстве)
 UPLOAD_DIR = "data/uploads"
 RESULT_DIR = "data/results"
 JSON_DIR = "data/json"
 
+# Время жизни неиспользуемого рабочего пространства и период удаления устаревших, с
+WORKSPACE_TTL = float(os.getenv("WORKSPACE_TTL", "3600"))
+WORKSPACE_REAP_INTERVAL = float(os.getenv("WORKSPACE_REAP_INTERVAL", "60"))
+workspaces = WorkspaceManager(UPLOAD_DIR, RESULT_DIR, JSON_DIR, ttl=WORKSPACE_TTL, reap_interval=WORKSPACE_REAP_INTERVAL)
+
+# Максимальный размер одного загружаемого файла
+MAX_UPLOAD_MB = int(os.getenv("MAX_UPLOAD_MB", "512"))
+
+# Кеш результатов для повторно загружаемых файлов
+RESULT_CACHE = os.getenv("RESULT_CACHE", "1") == "1"
+CACHE_DIR = os.getenv("CACHE_DIR", "data/cache")
+CACHE_MAX_DISK_MB = int(os.getenv("CACHE_MAX_DISK_MB", "2048"))
+CACHE_MAX_MEMORY_MB = int(os.getenv("CACHE_MAX_MEMORY_MB", "256"))
+CACHE_MAX_MEMORY_ENTRIES = int(os.getenv("CACHE_MAX_MEMORY_ENTRIES", "10000"))
+# Кеш открывается вместе с загрузкой модели: его ключи зависят от весов
+result_cache = None
+
+# Состояние запуска сервиса и длительности его этапов
+startup = {
+    "status": "starting",
+    "error": None,
+    "model_load_s": None,
+    "warmup_s": None,
+    "spawn_to_ready_s": None,
+    "first_inference_ms": None,
+}
+
+def open_result_cache() -> ResultCache:
+    """
+    Открывает кеш результатов для текущих весов и среды выполнения модели.
+
+    Returns:
+        ResultCache: Кеш результатов.
+    """
+    # Результаты разных сред выполнения могут немного отличаться, поэтому кешируются раздельно
+    model_id = yolo_model.runtime.model_id if MODEL_SERVER else f"{file_digest(MODEL_WEIGHTS)}:{MODEL_BACKEND}:{MODEL_IMGSZ}"
+    # Страницы документа, взятые из кеша целиком, отрендерены с тем же разрешением
+    model_id += f":render{RENDER_DPI}"
+    if NATIVE_TEXT:
+        # Страницы с текстовым слоем размечены не моделью
+        model_id += f":native{NATIVE_TEXT_MIN_CHARS}/{NATIVE_TEXT_MAX_IMAGE_COVERAGE}"
+    if TILE_SIZE:
+        # Инференс по окнам находит другие объекты, чем по всей странице
+        model_id += f":tiles{TILE_SIZE}/{TILE_OVERLAP}/{TILE_NMS_IOU}/{int(TILE_FULL_PAGE)}/{TILE_MAX_SIDE}"
+    return ResultCache(
+        CACHE_DIR,
+        model_id=model_id,
+        max_disk_bytes=CACHE_MAX_DISK_MB * 1024 * 1024,
+        max_memory_bytes=CACHE_MAX_MEMORY_MB * 1024 * 1024,
+        max_memory_entries=CACHE_MAX_MEMORY_ENTRIES
+    )
+
+async def load_service() -> None:
+    """
+    Загружает модель, открывает кеш, прогревает модель и запускает движок батчинга.
+
+    Сервис сообщает о готовности только после прогрева, поэтому первый запрос
+    не платит за инициализацию.
+    """
+    global yolo_model, batch_engine, result_cache
+    try:
+        if NATIVE_TEXT:
+            # Без PyMuPDF гибридный режим недоступен: сообщаем об этом при запуске, а не на первом документе
+            load_fitz()
+        start = time.perf_counter()
+        if MODEL_SERVER:
+            # Подключение ждет, пока сервер модели загрузит и прогреет модель
+            yolo_model = await executors.run_io(YOLOModel.connect, MODEL_SERVER, connect_timeout=MODEL_SERVER_TIMEOUT)
+        else:
+            yolo_model = await executors.run_inference(
+                load_model, MODEL_WEIGHTS, backend=MODEL_BACKEND, imgsz=MODEL_IMGSZ, threads=MODEL_THREADS
+            )
+        startup["model_load_s"] = time.perf_counter() - start
+
+        if RESULT_CACHE:
+            result_cache = await executors.run_io(open_result_cache)
+
+        # Сервер модели прогревается сам
+        if WARMUP_RUNS > 0 and WARMUP_SIZES and not MODEL_SERVER:
+            startup["warmup_s"] = await executors.run_inference(
+                yolo_model.warm_up, WARMUP_SIZES, batch_size=BATCH_MAX_SIZE, runs=WARMUP_RUNS
+            )
+
+        # С сервером модели батчи по BATCH_MAX_WAIT_MS собирает сервер: воркер не ждет
+        # наполнения батча, а сразу отправляет все страницы, накопившиеся в очереди
+        batch_engine = BatchingEngine(
+            yolo_model,
+            max_batch_size=BATCH_MAX_SIZE,
+            max_wait_ms=0 if MODEL_SERVER else BATCH_MAX_WAIT_MS,
+            max_queue_size=BATCH_MAX_QUEUE,
+            executor=executors.inference
+        )
+        startup["spawn_to_ready_s"] = time.time() - STARTED_AT
+        startup["status"] = "ready"
+    except Exception as e:
+        startup["status"] = "failed"
+        startup["error"] = str(e)
+        print(f"Ошибка при загрузке модели: {e}")
+
+def ensure_ready() -> None:
+    """
+    Проверяет, что модель загружена и прогрета.
+
+    Raises:
+        HTTPException: Если сервис еще не готов к обработке (503).
+    """
+    if startup["status"] != "ready":
+        raise HTTPException(status_code=503, detail="Сервис запускается, повторите запрос позже")
+
 # Создаем директории, если они не существуют
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 os.makedirs(RESULT_DIR, exist_ok=True)
@@ -49,132 +307,1267 @@ os.makedirs(JSON_DIR, exist_ok=True)
 
 # Монтируем статические файлы
 app.mount("/results", StaticFiles(directory="data/results"), name="results")
+app.mount("/json", StaticFiles(directory="data/json"), name="json")
+
+def annotation_space(page: Page, annotation_dpi: float) -> tuple:
+    """
+    Возвращает размер страницы и масштаб рамок в координатах JSON-аннотации.
+
+    Args:
+        page (Page): Страница с декодированным изображением.
+        annotation_dpi (float): Разрешение координат аннотации; 0 — пиксели изображения страницы.
+
+    Returns:
+        tuple: Ширина и высота страницы и множитель для рамок модели.
+    """
+    if not annotation_dpi or page.points is None:
+        # Изображения, загруженные напрямую, не имеют разрешения: координаты в их пикселях
+        return page.image.width, page.image.height, 1.0
+    width, height = points_to_pixels(page.points, annotation_dpi)
+    return width, height, annotation_dpi / page.dpi
+
+def write_outputs(page: Page, results: list, output_path: str, json_path: str,
+                  annotation_dpi: float = ANNOTATION_DPI) -> tuple:
+    """
+    Сохраняет JSON-аннотацию и аннотированное изображение для одной страницы.
+
+    Args:
+        page (Page): Страница с декодированным изображением.
+        results (list): Результаты предсказания модели.
+        output_path (str | None): Путь для сохранения аннотированного изображения,
+            None — без отрисовки.
+        json_path (str | None): Путь для сохранения JSON-аннотации, None — без JSON-файла.
+        annotation_dpi (float): Разрешение координат JSON-аннотации страниц PDF.
+
+    Returns:
+        tuple: JSON-аннотация страницы и найденные объекты в ее координатах.
+    """
+    # Переводим результаты в массивы один раз для JSON и для рисования
+    detections = Detections.from_results(results)
+
+    # Создаем JSON-аннотацию в запрошенных координатах
+    with metrics.stage("json"):
+        image_width, image_height, scale = annotation_space(page, annotation_dpi)
+        json_detections = detections.scaled(scale)
+        json_annotation = yolo_model.create_json_annotation(
+            page.path or page.name, image_height, image_width, json_detections
+        )
+        if json_path is not None:
+            with open(json_path, 'w', encoding='utf-8') as f:
+                json.dump(json_annotation, f, ensure_ascii=False, indent=4)
+
+    # Аннотируем изображение, рисуя прямо на декодированной странице
+    # или на странице PDF, заново отрендеренной с разрешением OUTPUT_DPI
+    if output_path is not None:
+        with metrics.stage("draw"):
+            if OUTPUT_DPI and page.source is not None:
+                image = render_pdf_page(*page.source, OUTPUT_DPI)
+                renderer.render(image, detections.scaled(OUTPUT_DPI / page.dpi), output_path)
+            else:
+                renderer.render(page.image, detections, output_path)
+    return json_annotation, json_detections
+
+def write_cached_outputs(image_path: str, cached: tuple, output_path: str, json_path: str) -> tuple:
+    """
+    Сохраняет результаты страницы, взятые из кеша.
+
+    Args:
+        image_path (str): Путь или имя исходного изображения для JSON-аннотации.
+        cached (tuple): JSON-аннотация, байты аннотированного изображения и объекты страницы из кеша.
+        output_path (str | None): Путь для сохранения аннотированного изображения,
+            None — без изображения.
+        json_path (str | None): Путь для сохранения JSON-аннотации, None — без JSON-файла.
+
+    Returns:
+        tuple: JSON-аннотация страницы и найденные объекты.
+    """
+    annotation, image, detections = cached
+    json_annotation = dict(annotation, image_path=str(image_path))
+    # В записях кеша, сохраненных до появления объектов, нет уверенности
+    detections = Detections.from_array(detections) if detections is not None else Detections.from_annotation(annotation, CLASS_NAMES)
+    if json_path is not None:
+        with open(json_path, 'w', encoding='utf-8') as f:
+            json.dump(json_annotation, f, ensure_ascii=False, indent=4)
+    if output_path is not None:
+        with open(output_path, 'wb') as f:
+            f.write(image)
+    return json_annotation, detections
+
+def output_paths(name: str, workspace: Workspace, render: bool = True) -> tuple:
+    """
+    Возвращает пути к результатам страницы.
+
+    Args:
+        name (str): Имя страницы.
+        workspace (Workspace): Рабочее пространство запроса.
+        render (bool): Нужно ли аннотированное изображение.
+
+    Returns:
+        tuple: Путь к аннотированному изображению (None без отрисовки) и путь к JSON-аннотации
+            (None, если JSON-файлы страниц не сохраняются).
+    """
+    output_path = os.path.join(workspace.result_dir, renderer.output_name(f"annotated_{name}")) if render else None
+    json_path = os.path.join(workspace.json_dir, f"annotated_{name}.json") if ANNOTATION_OUTPUT != "columnar" else None
+    return output_path, json_path
+
+def cache_variant(render: bool, annotation_dpi: float = ANNOTATION_DPI) -> str:
+    """
+    Возвращает вариант результатов для ключей кеша: с изображением в текущих
+    параметрах отрисовки или только JSON, в координатах аннотации.
+
+    Args:
+        render (bool): Нужно ли аннотированное изображение.
+        annotation_dpi (float): Разрешение координат JSON-аннотации.
+
+    Returns:
+        str: Вариант результатов.
+    """
+    variant = f"{renderer.signature}:{OUTPUT_DPI:g}" if render else "json"
+    return f"{variant}:{annotation_dpi:g}"
+
+def page_cache_variant(page: Page, render: bool, annotation_dpi: float = ANNOTATION_DPI) -> str:
+    """
+    Возвращает вариант результатов для ключа страницы в кеше.
+
+    Одинаковые пиксели дают разные JSON-аннотации у изображения, загруженного
+    напрямую, и у страницы PDF: координаты страницы PDF переводятся в
+    разрешение аннотации. Поэтому в вариант входит пространство координат страницы.
+
+    Args:
+        page (Page): Страница с декодированным изображением.
+        render (bool): Нужно ли аннотированное изображение.
+        annotation_dpi (float): Разрешение координат JSON-аннотации.
+
+    Returns:
+        str: Вариант результатов страницы.
+    """
+    width, height, scale = annotation_space(page, annotation_dpi)
+    return f"{cache_variant(render, annotation_dpi)}:{width}x{height}:{scale!r}"
+
+def submit_image(image):
+    """
+    Ставит изображение в общий батч модели.
+
+    Args:
+        image (Image.Image): Изображение страницы или окна.
+
+    Returns:
+        Future: Результаты предсказания.
+
+    Raises:
+        HTTPException: Если очередь инференса переполнена.
+    """
+    try:
+        return batch_engine.submit(image, CONF_THRESHOLD)
+    except queue.Full:
+        raise HTTPException(status_code=503, detail="Очередь инференса переполнена, повторите запрос позже")
+
+async def predict_page(image):
+    """
+    Получает предсказания модели для страницы, при необходимости по окнам.
+
+    Args:
+        image (Image.Image): Изображение страницы.
+
+    Returns:
+        list | Detections: Результаты предсказания.
+    """
+    if not TILE_SIZE or max(image.size) <= TILE_SIZE:
+        return await asyncio.wrap_future(submit_image(image))
+    return await predict_tiles(image)
+
+async def predict_tiles(image) -> Detections:
+    """
+    Получает предсказания по перекрывающимся окнам страницы и объединяет их.
+
+    Единственный путь инференса по окнам: нарезка окон, перевод рамок в координаты
+    страницы и подавление повторов берутся из model.tiling. Окна попадают
+    в общий батч вместе со страницами других запросов. Одновременно
+    в обработке не больше TILE_BATCH окон страницы, поэтому память ограничена
+    независимо от размера страницы.
+
+    Args:
+        image (Image.Image): Изображение страницы.
+
+    Returns:
+        Detections: Объекты страницы.
+    """
+    full_page = submit_image(image) if TILE_FULL_PAGE else None
+    parts = []
+    windows = tile_windows(image.width, image.height, TILE_SIZE, TILE_OVERLAP)
+    batches = iter_tiles(image, windows, TILE_BATCH)
+    while True:
+        # Окна вырезаются в пуле ввода-вывода, не блокируя цикл событий
+        batch = await executors.run_io(next, batches, None)
+        if batch is None:
+            break
+        group, tiles = batch
+        futures = [asyncio.wrap_future(submit_image(tile)) for tile in tiles]
+        for window, results in zip(group, await asyncio.gather(*futures)):
+            parts.append(shift_detections(Detections.from_results(results), window, image.size))
+    if full_page is not None:
+        parts.append(Detections.from_results(await asyncio.wrap_future(full_page)))
+    return await executors.run_io(merge_detections, parts, TILE_NMS_IOU)
+
+async def process_page(page: Page, workspace: Workspace, render: bool = True,
+                       annotation_dpi: float = ANNOTATION_DPI) -> tuple:
+    """
+    Обрабатывает одну страницу: предсказание, JSON-аннотация и отрисовка.
+
+    Если такая же страница уже обрабатывалась, результаты берутся из кеша без обращения к модели.
+
+    Args:
+        page (Page): Страница с декодированным изображением.
+        workspace (Workspace): Рабочее пространство запроса.
+        render (bool): Нужно ли аннотированное изображение.
+        annotation_dpi (float): Разрешение координат JSON-аннотации страниц PDF.
+
+    Returns:
+        tuple: Пути к аннотированному изображению и к JSON-аннотации, сама JSON-аннотация,
+            найденные объекты и ключ страницы в кеше (None, если кеш отключен).
+    """
+    output_path, json_path = output_paths(page.name, workspace, render)
+
+    try:
+        page_key = None
+        if result_cache is not None:
+            with metrics.stage("cache"):
+                # Ключ страницы строится по ее пикселям, поэтому совпадает у одинаковых страниц разных файлов
+                page_key = result_cache.key(
+                    await executors.run_io(image_digest, page.image), CONF_THRESHOLD,
+                    page_cache_variant(page, render, annotation_dpi)
+                )
+                cached = await executors.run_io(result_cache.get_page, page_key)
+            # Без изображения в записи кеша аннотированное изображение пришлось бы писать пустым
+            if cached is not None and (cached[1] is not None or output_path is None):
+                json_annotation, detections = await executors.run_io(
+                    write_cached_outputs, page.path or page.name, cached, output_path, json_path
+                )
+                metrics.count_page(len(detections), "cache")
+                return output_path, json_path, json_annotation, detections, page_key
+
+        if page.detections is not None:
+            # Страница уже размечена по текстовому слою
+            results, source = page.detections, "native"
+        else:
+            # Получаем результаты предсказания модели через общий батч
+            submitted_at = time.perf_counter()
+            with metrics.stage("inference"):
+                results = await predict_page(page.image)
+            if startup["first_inference_ms"] is None:
+                startup["first_inference_ms"] = (time.perf_counter() - submitted_at) * 1000
+            source = "model"
+
+        # Сохраняем результаты в пуле ввода-вывода
+        json_annotation, detections = await executors.run_io(
+            write_outputs, page, results, output_path, json_path, annotation_dpi
+        )
+        metrics.count_page(len(detections), source)
+        if page_key is not None:
+            await executors.run_io(result_cache.put_page, page_key, json_annotation, output_path, detections.to_array())
+    finally:
+        # Изображение страницы больше не нужно
+        page.release()
+    return output_path, json_path, json_annotation, detections, page_key
+
+async def process_cached_page(name: str, page_key: str, workspace: Workspace, render: bool = True) -> tuple:
+    """
+    Сохраняет результаты страницы документа, целиком найденного в кеше.
+
+    Args:
+        name (str): Имя страницы.
+        page_key (str): Ключ страницы в кеше.
+        workspace (Workspace): Рабочее пространство запроса.
+        render (bool): Нужно ли аннотированное изображение.
+
+    Returns:
+        tuple: Пути к аннотированному изображению и к JSON-аннотации, сама JSON-аннотация,
+            найденные объекты и ключ страницы в кеше.
+    """
+    output_path, json_path = output_paths(name, workspace, render)
+    cached = await executors.run_io(result_cache.get_page, page_key)
+    if cached is None or (cached[1] is None and output_path is not None):
+        raise RuntimeError(f"Результат страницы {name} был вытеснен из кеша")
+    json_annotation, detections = await executors.run_io(write_cached_outputs, name, cached, output_path, json_path)
+    metrics.count_page(len(detections), "cache")
+    return output_path, json_path, json_annotation, detections, page_key
+
+def page_names(input_path: str, filename: str, count: int) -> list:
+    """
+    Формирует имена страниц загруженного файла так же, как при рендеринге.
+
+    Args:
+        input_path (str): Путь к сохраненному файлу.
+        filename (str): Исходное имя файла.
+        count (int): Количество страниц.
+
+    Returns:
+        list: Имена страниц.
+    """
+    if not filename.lower().endswith('.pdf'):
+        return [os.path.basename(input_path)]
+    base_name = os.path.splitext(os.path.basename(input_path))[0]
+    return [f"{base_name}_{i + 1}.png" for i in range(count)]
+
+async def iter_pages(input_path: str, filename: str, workspace: Workspace, on_pages=None):
+    """
+    Асинхронно перебирает страницы загруженного файла.
+
+    Страницы PDF рендерятся в фоне не более чем на PDF_PREFETCH страниц вперед,
+    поэтому рендеринг следующей страницы идет параллельно с инференсом текущей.
+    Изображения страниц передаются дальше в памяти и сохраняются в PNG
+    только при включенном PERSIST_PAGES. Изображения и PDF из ZIP-архива
+    читаются из него по одному.
+
+    Args:
+        input_path (str): Путь к сохраненному файлу.
+        filename (str): Исходное имя файла.
+        workspace (Workspace): Рабочее пространство запроса.
+        on_pages (callable, optional): Вызывается со списком имен страниц, как только они известны.
+
+    Yields:
+        Page: Страница с декодированным изображением.
+    """
+    if filename.lower().endswith('.zip'):
+        async for page in iter_zip_pages(input_path, workspace, on_pages):
+            yield page
+        return
+
+    # Если файл не является PDF, он сам является единственной страницей
+    if not filename.lower().endswith('.pdf'):
+        if on_pages is not None:
+            on_pages([os.path.basename(input_path)])
+        with metrics.stage("decode"):
+            page = await executors.run_io(load_page, input_path)
+        yield page
+        return
+
+    async for page in iter_pdf_pages(input_path, filename, workspace, on_pages):
+        yield page
+
+async def iter_zip_pages(input_path: str, workspace: Workspace, on_pages=None):
+    """
+    Асинхронно перебирает страницы изображений и PDF из ZIP-архива.
+
+    Архив не распаковывается: следующий файл читается из него только после того,
+    как предыдущий передан дальше, поэтому вместе с ограничением PAGE_CONCURRENCY
+    память не зависит от размера архива.
+
+    Args:
+        input_path (str): Путь к сохраненному архиву.
+        workspace (Workspace): Рабочее пространство запроса.
+        on_pages (callable, optional): Вызывается со списком имен страниц, как только они известны.
+
+    Yields:
+        Page: Страница с декодированным изображением.
+    """
+    extract_dir = os.path.join(workspace.upload_dir, os.path.splitext(os.path.basename(input_path))[0])
+    members = process_zip(input_path, extract_dir, max_member_bytes=MAX_UPLOAD_MB * 1024 * 1024)
+    try:
+        while True:
+            with metrics.stage("decode"):
+                member = await executors.run_io(next, members, None)
+            if member is None:
+                break
+            name, item = member
+            if isinstance(item, Page):
+                if on_pages is not None:
+                    on_pages([name])
+                yield item
+            else:
+                async for page in iter_pdf_pages(item, name, workspace, on_pages):
+                    yield page
+    finally:
+        await executors.run_io(members.close)
+
+async def iter_pdf_pages(input_path: str, filename: str, workspace: Workspace, on_pages=None):
+    """
+    Асинхронно перебирает страницы PDF-документа.
+
+    Args:
+        input_path (str): Путь к сохраненному PDF.
+        filename (str): Исходное имя файла.
+        workspace (Workspace): Рабочее пространство запроса.
+        on_pages (callable, optional): Вызывается со списком имен страниц, как только они известны.
+
+    Yields:
+        Page: Отрендеренная страница.
+    """
+    # Создаем директорию для изображений из PDF
+    img_dir = os.path.join(workspace.upload_dir, os.path.splitext(filename)[0])
+    try:
+        producer = await executors.run_io(
+            PdfPageProducer, input_path, img_dir, dpi=RENDER_FIXED_DPI, prefetch=PDF_PREFETCH, persist=PERSIST_PAGES,
+            workers=RENDER_WORKERS, chunk_size=RENDER_CHUNK, max_side=RENDER_MAX_SIDE,
+            side_limit=RENDER_SIDE_LIMIT
+        )
+    except Exception as e:
+        print(f"Ошибка при обработке {input_path}: {e}")
+        return
+
+    native = None
+    if NATIVE_TEXT:
+        try:
+            native = await executors.run_io(
+                NativeTextLayer, input_path, CLASS_NAMES, min_chars=NATIVE_TEXT_MIN_CHARS,
+                max_image_coverage=NATIVE_TEXT_MAX_IMAGE_COVERAGE
+            )
+        except Exception as e:
+            # Документ без доступного текстового слоя целиком обрабатывается моделью
+            print(f"Текстовый слой {input_path} недоступен: {e}")
+
+    try:
+        if on_pages is not None:
+            on_pages(producer.names)
+
+        pages = iter(producer)
+        while True:
+            # Ожидаем очередную страницу, не блокируя цикл событий
+            with metrics.stage("render"):
+                page = await executors.run_io(next, pages, None)
+            if page is None:
+                break
+            if native is not None:
+                # Страницы с богатым текстовым слоем размечаются без модели
+                with metrics.stage("native"):
+                    try:
+                        page.detections = await executors.run_io(
+                            native.detections, page.source[1], page.dpi, page.path or page.name
+                        )
+                    except Exception as e:
+                        print(f"Ошибка разметки по текстовому слою {page.name}: {e}")
+            yield page
+    except Exception as e:
+        print(f"Ошибка при обработке {input_path}: {e}")
+    finally:
+        await executors.run_io(producer.close)
+        if native is not None:
+            await executors.run_io(native.close)
+
+def file_type(filename: str) -> str:
+    """
+    Возвращает тип файла для меток метрик.
+
+    Args:
+        filename (str): Имя файла.
+
+    Returns:
+        str: Расширение файла без точки.
+    """
+    return os.path.splitext(filename or "")[1].lower().lstrip(".") or "unknown"
+
+async def save_uploads(files: List[UploadFile], workspace: Workspace) -> list:
+    """
+    Сохраняет загруженные файлы, вычисляя хеш содержимого при записи.
+
+    Args:
+        files (List[UploadFile]): Список загруженных файлов.
+        workspace (Workspace): Рабочее пространство запроса.
+
+    Returns:
+        list: Тройки (путь к сохраненному файлу, имя сохраненного файла, SHA-256 содержимого).
+    """
+    inputs = []
+    for file in files:
+        metrics.FILE_TYPE.set(file_type(file.filename))
+        with metrics.stage("upload"):
+            input_path, digest = await save_upload(
+                file, workspace.upload_dir, max_bytes=MAX_UPLOAD_MB * 1024 * 1024, executor=executors.io
+            )
+        # Имя сохраненного файла: без каталогов и с номером при совпадении имен
+        inputs.append((input_path, os.path.basename(input_path), digest))
+    return inputs
+
+async def process_files(inputs: list, workspace: Workspace, on_pages=None, on_page=None, render: bool = True,
+                        annotation_dpi: float = ANNOTATION_DPI) -> tuple:
+    """
+    Обрабатывает сохраненные файлы: PDF разбивается на страницы, каждая страница аннотируется.
+
+    Одновременно обрабатывается не более PAGE_CONCURRENCY страниц, чтобы страницы
+    одного документа попадали в общий батч модели, а память оставалась ограниченной.
+    ZIP-архивы изображений и PDF обрабатываются без распаковки на диск.
+    Файлы, уже обработанные ранее, берутся из кеша без рендеринга и инференса.
+    При ANNOTATION_OUTPUT columnar или both аннотации всех страниц запроса
+    дополнительно сохраняются в один колоночный файл.
+
+    Args:
+        inputs (list): Тройки (путь к сохраненному файлу, исходное имя файла, SHA-256 содержимого).
+        workspace (Workspace): Рабочее пространство запроса.
+        on_pages (callable, optional): Вызывается со списком имен страниц, как только они известны.
+        on_page (callable, optional): Вызывается с именем страницы, путями к результатам
+            и JSON-аннотацией после ее обработки.
+        render (bool): Нужны ли аннотированные изображения. Без них сохраняются только JSON-аннотации.
+        annotation_dpi (float): Разрешение координат JSON-аннотаций страниц PDF; 0 — пиксели рендеринга.
+
+    Returns:
+        tuple: Списки путей к аннотированным изображениям и к JSON-аннотациям.
+    """
+    semaphore = asyncio.Semaphore(PAGE_CONCURRENCY)
+    tasks = []
+    # Документы, которые будут добавлены в кеш после обработки всех страниц
+    documents = []
+
+    async def run(name: str, pending) -> tuple:
+        try:
+            output_path, json_path, json_annotation, detections, page_key = await pending
+            if on_page is not None:
+                on_page(name, output_path, json_path, json_annotation)
+            return output_path, json_path, page_key, (name, json_annotation, detections)
+        finally:
+            semaphore.release()
+
+    try:
+        # Обрабатываем каждый загруженный файл
+        for input_path, filename, digest in inputs:
+            # Задачи страниц наследуют тип файла для меток метрик
+            metrics.FILE_TYPE.set(file_type(filename))
+            doc_key = None
+            # Имена страниц архива известны только после его чтения, поэтому архивы кешируются только постранично
+            if result_cache is not None and not filename.lower().endswith('.zip'):
+                doc_key = result_cache.key(digest, CONF_THRESHOLD, cache_variant(render, annotation_dpi))
+                cached_pages = await executors.run_io(result_cache.get_document, doc_key)
+                if cached_pages is not None:
+                    # Документ уже обрабатывался: результаты всех страниц есть в кеше
+                    names = page_names(input_path, filename, len(cached_pages))
+                    if on_pages is not None:
+                        on_pages(names)
+                    for name, page_key in zip(names, cached_pages):
+                        await semaphore.acquire()
+                        tasks.append(asyncio.create_task(run(name, process_cached_page(name, page_key, workspace, render))))
+                    continue
+
+            names = []
+
+            def register_pages(page_names: list) -> None:
+                names.extend(page_names)
+                if on_pages is not None:
+                    on_pages(page_names)
+
+            first_task = len(tasks)
+            async for page in iter_pages(input_path, filename, workspace, register_pages):
+                await semaphore.acquire()
+                tasks.append(asyncio.create_task(run(page.name, process_page(page, workspace, render, annotation_dpi))))
+
+            # В кеш попадают только документы, все страницы которых удалось получить
+            doc_tasks = tasks[first_task:]
+            if doc_key is not None and names and len(doc_tasks) == len(names):
+                documents.append((doc_key, doc_tasks))
+
+        # Результаты возвращаем в порядке страниц, независимо от порядка завершения
+        outputs = await asyncio.gather(*tasks)
+    except BaseException:
+        for task in tasks:
+            task.cancel()
+        raise
+
+    for doc_key, doc_tasks in documents:
+        pages = [task.result()[2] for task in doc_tasks]
+        await executors.run_io(result_cache.put_document, doc_key, pages)
+
+    if ANNOTATION_OUTPUT != "json":
+        await executors.run_io(write_columnar, os.path.join(workspace.json_dir, COLUMNAR_FILENAME), [
+            record for _, _, _, record in outputs
+        ])
+
+    processed_files = [output_path for output_path, _, _, _ in outputs if output_path is not None]
+    json_files = [json_path for _, json_path, _, _ in outputs if json_path is not None]
+    return processed_files, json_files
+
+def write_columnar(path: str, records: list) -> None:
+    """
+    Сохраняет аннотации страниц запроса в колоночный файл.
+
+    Args:
+        path (str): Путь к файлу.
+        records (list): Тройки (имя страницы, JSON-аннотация, найденные объекты) в порядке страниц.
+    """
+    with ColumnarWriter(path, CLASS_NAMES) as writer:
+        for name, annotation, detections in records:
+            writer.add_page(
+                name, annotation["image_height"], annotation["image_width"], detections, annotation["image_path"]
+            )
+
+def request_annotation_dpi(annotation_dpi: float) -> float:
+    """
+    Возвращает разрешение координат JSON-аннотаций, запрошенное клиентом.
+
+    Args:
+        annotation_dpi (float | None): Значение параметра запроса; None — ANNOTATION_DPI.
+
+    Returns:
+        float: Разрешение координат; 0 — пиксели изображения, по которому работала модель.
+
+    Raises:
+        HTTPException: Если разрешение отрицательное (400).
+    """
+    if annotation_dpi is None:
+        return ANNOTATION_DPI
+    if annotation_dpi < 0:
+        raise HTTPException(status_code=400, detail="annotation_dpi не может быть отрицательным")
+    return annotation_dpi
+
+def profile_requested(request: Request) -> bool:
+    """
+    Решает, профилировать ли запрос: по заголовку администратора или случайной выборке.
+
+    Args:
+        request (Request): Запрос клиента.
+
+    Returns:
+        bool: Нужно ли профилировать запрос.
+    """
+    return profiling.should_profile(request.headers.get(PROFILE_HEADER, ""), PROFILE_TOKEN, PROFILE_SAMPLE_RATE)
+
+@asynccontextmanager
+async def profile_request(enabled: bool, workspace: Workspace):
+    """
+    Профилирует обработку запроса и сохраняет профиль в его рабочее пространство,
+    в том числе если обработка завершилась ошибкой.
+
+    Args:
+        enabled (bool): Включено ли профилирование.
+        workspace (Workspace): Рабочее пространство запроса.
+    """
+    profiler = None
+    try:
+        with profiling.profile(enabled, PROFILE_INTERVAL_MS / 1000) as profiler:
+            yield
+    finally:
+        if profiler is not None:
+            await executors.run_io(profiler.save, workspace.json_dir)
+
+def profile_urls(workspace: Workspace) -> dict:
+    """
+    Возвращает ссылки на файлы профиля запроса.
+
+    Args:
+        workspace (Workspace): Рабочее пространство.
+
+    Returns:
+        dict: Ссылки на flame graph и свернутые стеки.
+    """
+    return {
+        "flamegraph": workspace.json_url(profiling.FLAMEGRAPH_FILENAME),
+        "collapsed": workspace.json_url(profiling.COLLAPSED_FILENAME),
+    }
 
 @app.post("/process/")
-async def process_images(files: List[UploadFile] = File(...)):
+async def process_images(request: Request, files: List[UploadFile] = File(...), render: bool = True,
+                         annotation_dpi: float = None):
     """
     Обрабатывает загруженные изображения и сохраняет аннотированные результаты.
 
     Args:
+        request (Request): Запрос клиента.
         files (List[UploadFile]): Список загруженных файлов.
+        render (bool): Нужны ли аннотированные изображения; render=false — только JSON.
+        annotation_dpi (float, optional): Разрешение координат JSON-аннотаций страниц PDF;
+            0 — пиксели изображения, по которому работала модель. По умолчанию ANNOTATION_DPI.
 
     Returns:
-        dict: Словарь с именами обработанных файлов.
+        dict: Словарь с идентификатором рабочего пространства и именами обработанных файлов.
     """
-    processed_files = []
-    json_files = []
+    ensure_ready()
+    metrics.ENDPOINT.set("process")
+    annotation_dpi = request_annotation_dpi(annotation_dpi)
+    profiled = profile_requested(request)
+    # Каждый запрос получает собственное рабочее пространство
+    workspace = await executors.run_io(workspaces.create)
+    workspaces.acquire(workspace)
+    try:
+        async with profile_request(profiled, workspace):
+            with metrics.REQUEST_SECONDS.time(endpoint="process"):
+                # Сохраняем загруженные файлы
+                inputs = await save_uploads(files, workspace)
 
-    # Обрабатываем каждый загруженный файл
-    for file in files:
-        # Сохраняем загруженный файл
-        input_path = await save_upload(file, UPLOAD_DIR)
-
-        # Если файл является PDF
-        if file.filename.lower().endswith('.pdf'):
-            # Создаем директорию для изображений из PDF
-            img_dir = os.path.join(UPLOAD_DIR, os.path.splitext(file.filename)[0])
-            # Преобразуем PDF в изображения
-            img_paths = pdf_to_images(input_path, img_dir)
-
-            # Обрабатываем каждое изображение из PDF
-            for img_path in img_paths:
-                # Путь для сохранения аннотированного изображения
-                output_path = os.path.join(RESULT_DIR, f"annotated_{os.path.basename(img_path)}")
-                # Путь для сохранения JSON-аннотации
-                json_path = os.path.join(JSON_DIR, f"annotated_{os.path.basename(img_path)}.json")
-
-                # Получаем результаты предсказания модели
-                results = yolo_model.predict(img_path)
-
-                # Открываем изображение для получения его размеров
-                image = Image.open(img_path)
-                image_height, image_width = image.size
-
-                # Создаем JSON-аннотацию
-                json_annotation = yolo_model.create_json_annotation(img_path, image_height, image_width, results)
-                with open(json_path, 'w', encoding='utf-8') as f:
-                    json.dump(json_annotation, f, ensure_ascii=False, indent=4)
-
-                # Аннотируем изображение
-                yolo_model.annotate_image(img_path, results, output_path)
-                processed_files.append(output_path)
-                json_files.append(json_path)
+                processed_files, json_files = await process_files(
+                    inputs, workspace, render=render, annotation_dpi=annotation_dpi
+                )
+    finally:
+        workspaces.release(workspace)
+
+    # Возвращаем список имен обработанных файлов и JSON-файлов
+    response = {
+        "workspace_id": workspace.id,
+        "filenames": [os.path.basename(file) for file in processed_files],
+        "json_filenames": [os.path.basename(file) for file in json_files]
+    }
+    if profiled:
+        response["profile"] = profile_urls(workspace)
+    return response
+
+def page_result(output_path: str, json_path: str, workspace: Workspace) -> dict:
+    """
+    Формирует описание результатов страницы для ответа API.
+
+    Args:
+        output_path (str | None): Путь к аннотированному изображению или None без отрисовки.
+        json_path (str | None): Путь к JSON-аннотации или None, если JSON-файлы страниц не сохраняются.
+        workspace (Workspace): Рабочее пространство запроса.
+
+    Returns:
+        dict: Имена файлов результатов и ссылки на них.
+    """
+    filename = os.path.basename(output_path) if output_path is not None else None
+    json_filename = os.path.basename(json_path) if json_path is not None else None
+    return {
+        "filename": filename,
+        "json_filename": json_filename,
+        "result_url": workspace.result_url(filename) if filename is not None else None,
+        "json_url": workspace.json_url(json_filename) if json_filename is not None else None,
+    }
+
+def sse_event(event: str, data) -> str:
+    """
+    Кодирует событие в формате Server-Sent Events.
+
+    Args:
+        event (str): Тип события.
+        data: Данные события, сериализуемые в JSON.
+
+    Returns:
+        str: Событие в текстовом формате SSE.
+    """
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.post("/process/stream")
+async def process_images_stream(request: Request, files: List[UploadFile] = File(...), render: bool = True,
+                                annotation_dpi: float = None):
+    """
+    Обрабатывает загруженные изображения и отдает результаты каждой страницы по мере готовности.
+
+    Ответ передается в формате Server-Sent Events:
+    событие workspace содержит идентификатор рабочего пространства запроса,
+    событие pages — имена страниц документа, событие page — результаты
+    и JSON-аннотацию одной страницы, событие done — итоговые списки файлов.
+    Профиль запроса, если он снимался, сохраняется до события done.
+
+    Args:
+        request (Request): Запрос клиента.
+        files (List[UploadFile]): Список загруженных файлов.
+        render (bool): Нужны ли аннотированные изображения; render=false — только JSON.
+        annotation_dpi (float, optional): Разрешение координат JSON-аннотаций страниц PDF;
+            0 — пиксели изображения, по которому работала модель. По умолчанию ANNOTATION_DPI.
+
+    Returns:
+        StreamingResponse: Поток событий с результатами страниц.
+    """
+    ensure_ready()
+    metrics.ENDPOINT.set("stream")
+    annotation_dpi = request_annotation_dpi(annotation_dpi)
+    profiled = profile_requested(request)
+    started_at = time.perf_counter()
+    workspace = await executors.run_io(workspaces.create)
+    workspaces.acquire(workspace)
+    try:
+        # Сохраняем загруженные файлы
+        inputs = await save_uploads(files, workspace)
+    except BaseException:
+        workspaces.release(workspace)
+        raise
+
+    events = asyncio.Queue()
+    events.put_nowait(sse_event("workspace", {"workspace_id": workspace.id}))
+
+    def on_pages(names: list) -> None:
+        events.put_nowait(sse_event("pages", {"pages": names}))
+
+    def on_page(name: str, output_path: str, json_path: str, json_annotation: dict) -> None:
+        result = page_result(output_path, json_path, workspace)
+        result.update({"name": name, "annotation": json_annotation})
+        events.put_nowait(sse_event("page", result))
+
+    async def run() -> None:
+        # Задача запускается из потока ответа, поэтому метку запроса задаем заново
+        metrics.ENDPOINT.set("stream")
+        try:
+            async with profile_request(profiled, workspace):
+                processed_files, json_files = await process_files(
+                    inputs, workspace, on_pages=on_pages, on_page=on_page, render=render,
+                    annotation_dpi=annotation_dpi
+                )
+            done = {
+                "workspace_id": workspace.id,
+                "filenames": [os.path.basename(file) for file in processed_files],
+                "json_filenames": [os.path.basename(file) for file in json_files],
+            }
+            if profiled:
+                done["profile"] = profile_urls(workspace)
+            events.put_nowait(sse_event("done", done))
+        except Exception as e:
+            events.put_nowait(sse_event("error", {"detail": getattr(e, "detail", None) or str(e)}))
+        finally:
+            workspaces.release(workspace)
+            metrics.REQUEST_SECONDS.observe(time.perf_counter() - started_at, endpoint="stream")
+            events.put_nowait(None)
+
+    async def stream():
+        task = asyncio.create_task(run())
+        try:
+            while (event := await events.get()) is not None:
+                yield event
+        finally:
+            # Клиент отключился: прекращаем обработку оставшихся страниц
+            task.cancel()
+
+    return StreamingResponse(stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+async def run_job(job) -> None:
+    """
+    Обработчик фонового задания: тот же конвейер, что и у /process/, с отчетом о прогрессе.
+
+    Args:
+        job (Job): Задание.
+    """
+    def on_page(name: str, output_path: str, json_path: str, json_annotation: dict) -> None:
+        job.complete_page(name, page_result(output_path, json_path, job.workspace))
+
+    metrics.ENDPOINT.set("jobs")
+    try:
+        async with profile_request(job.profile, job.workspace):
+            with metrics.REQUEST_SECONDS.time(endpoint="jobs"):
+                await process_files(
+                    job.inputs, job.workspace, on_pages=job.add_pages, on_page=on_page, render=job.render,
+                    annotation_dpi=request_annotation_dpi(job.annotation_dpi)
+                )
+    finally:
+        workspaces.release(job.workspace)
+
+# Количество одновременно обрабатываемых фоновых заданий
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+# Очередь фоновых заданий
+job_manager = JobManager(run_job, workers=JOB_WORKERS)
+
+@app.post("/jobs", status_code=202)
+async def create_job(request: Request, files: List[UploadFile] = File(...), render: bool = True,
+                     annotation_dpi: float = None):
+    """
+    Сохраняет загруженные файлы и ставит их обработку в фоновую очередь.
+
+    Args:
+        request (Request): Запрос клиента.
+        files (List[UploadFile]): Список загруженных файлов.
+        render (bool): Нужны ли аннотированные изображения; render=false — только JSON.
+        annotation_dpi (float, optional): Разрешение координат JSON-аннотаций страниц PDF;
+            0 — пиксели изображения, по которому работала модель. По умолчанию ANNOTATION_DPI.
+
+    Returns:
+        dict: Идентификатор и состояние созданного задания.
+    """
+    ensure_ready()
+    metrics.ENDPOINT.set("jobs")
+    annotation_dpi = request_annotation_dpi(annotation_dpi)
+    workspace = await executors.run_io(workspaces.create)
+    # Рабочее пространство не удаляется, пока задание не завершится
+    workspaces.acquire(workspace)
+    try:
+        # Сохраняем загруженные файлы, обработка продолжится в фоне
+        inputs = await save_uploads(files, workspace)
+    except BaseException:
+        workspaces.release(workspace)
+        raise
+
+    job = job_manager.submit(
+        inputs, workspace, render=render, profile=profile_requested(request), annotation_dpi=annotation_dpi
+    )
+    return {"job_id": job.id, "workspace_id": workspace.id, "status": job.status}
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """
+    Возвращает состояние фонового задания и прогресс по страницам.
+
+    Args:
+        job_id (str): Идентификатор задания.
+
+    Returns:
+        dict: Состояние задания.
+    """
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Задание не найдено")
+    return job.to_dict()
+
+def get_workspace(workspace_id: str) -> Workspace:
+    """
+    Возвращает рабочее пространство запроса.
+
+    Args:
+        workspace_id (str): Идентификатор рабочего пространства.
+
+    Returns:
+        Workspace: Рабочее пространство.
+
+    Raises:
+        HTTPException: Если рабочее пространство не найдено или уже удалено (404).
+    """
+    workspace = workspaces.get(workspace_id)
+    if workspace is None:
+        raise HTTPException(status_code=404, detail="Рабочее пространство не найдено")
+    return workspace
+
+async def stream_zip(src_dir: str, extension):
+    """
+    Отдает ZIP-архив с файлами директории по мере его формирования.
+
+    Чтение файлов и упаковка выполняются в пуле ввода-вывода, цикл событий
+    только передает готовые части архива клиенту.
+
+    Args:
+        src_dir (str): Директория с файлами.
+        extension (str | tuple): Расширение или кортеж расширений файлов, попадающих в архив.
+
+    Yields:
+        bytes: Очередная часть архива.
+    """
+    files = await executors.run_io(list_files, src_dir, extension)
+    parts = iter_zip(src_dir, files)
+    try:
+        while (part := await executors.run_io(next, parts, None)) is not None:
+            yield part
+    finally:
+        parts.close()
+
+def zip_response(src_dir: str, extension, filename: str) -> StreamingResponse:
+    """
+    Формирует потоковый ответ с ZIP-архивом.
+
+    Args:
+        src_dir (str): Директория с файлами.
+        extension (str | tuple): Расширение или кортеж расширений файлов, попадающих в архив.
+        filename (str): Имя архива для скачивания.
+
+    Returns:
+        StreamingResponse: Ответ с ZIP-архивом.
+    """
+    return StreamingResponse(
+        stream_zip(src_dir, extension),
+        media_type="application/zip",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+# Собранные архивы результатов с манифестами для повторных скачиваний
+archives = ArchiveCache()
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """
+    Проверяет, совпадает ли ETag с одним из значений заголовка If-None-Match.
+
+    Args:
+        request (Request): Запрос клиента.
+        etag (str): Текущий ETag ресурса.
+
+    Returns:
+        bool: True, если у клиента уже есть актуальная версия.
+    """
+    header = request.headers.get("if-none-match")
+    if header is None:
+        return False
+    tags = [tag.strip().removeprefix("W/") for tag in header.split(",")]
+    return "*" in tags or etag in tags
+
+def byte_range(request: Request, etag: str, size: int):
+    """
+    Разбирает заголовки Range и If-Range запроса на докачку архива.
+
+    Поддерживается один диапазон байтов; запрос нескольких диапазонов, запрос
+    с устаревшим If-Range и некорректный заголовок получают архив целиком.
+
+    Args:
+        request (Request): Запрос клиента.
+        etag (str): ETag отдаваемой версии архива.
+        size (int): Размер архива в байтах.
+
+    Returns:
+        tuple | None: Первый и последний байт диапазона или None, если отдается весь архив.
+
+    Raises:
+        HTTPException: Если диапазон лежит за пределами архива (416).
+    """
+    header = request.headers.get("range")
+    if header is None or not header.startswith("bytes="):
+        return None
+    # Докачка диапазона допустима, только если у клиента та же версия архива
+    if_range = request.headers.get("if-range")
+    if if_range is not None and if_range != etag:
+        return None
+    spec = header[len("bytes="):].strip()
+    if "," in spec:
+        return None
+    first, _, last = spec.partition("-")
+    try:
+        if first:
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
         else:
-            # Путь для сохранения аннотированного изображения
-            output_path = os.path.join(RESULT_DIR, f"annotated_{file.filename}")
-            # Путь для сохранения JSON-аннотации
-            json_path = os.path.join(JSON_DIR, f"annotated_{file.filename}.json")
+            # Диапазон вида -N — последние N байт
+            start, end = max(size - int(last), 0), size - 1
+    except ValueError:
+        return None
+    if start < 0 or start > end:
+        raise HTTPException(status_code=416, headers={"Content-Range": f"bytes */{size}"})
+    return start, end
 
-            # Получаем результаты предсказания модели
-            results = yolo_model.predict(input_path)
+async def read_archive(file, start: int, length: int, chunk_size: int = 1024 * 1024):
+    """
+    Читает диапазон открытого файла архива блоками в пуле ввода-вывода.
 
-            # Открываем изображение для получения его размеров
-            image = Image.open(input_path)
-            image_height, image_width = image.size
+    Args:
+        file: Открытый на чтение файл архива.
+        start (int): Первый байт диапазона.
+        length (int): Длина диапазона в байтах.
+        chunk_size (int): Размер блока чтения в байтах.
 
-            # Создаем JSON-аннотацию
-            json_annotation = yolo_model.create_json_annotation(input_path, image_height, image_width, results)
-            with open(json_path, 'w', encoding='utf-8') as f:
-                json.dump(json_annotation, f, ensure_ascii=False, indent=4)
+    Yields:
+        bytes: Очередной блок архива.
+    """
+    await executors.run_io(file.seek, start)
+    while length > 0:
+        chunk = await executors.run_io(file.read, min(chunk_size, length))
+        if not chunk:
+            break
+        length -= len(chunk)
+        yield chunk
+
+async def download_archive(request: Request, workspace: Workspace, src_dir: str, extension, filename: str):
+    """
+    Отдает архив результатов рабочего пространства.
 
-            # Аннотируем изображение
-            yolo_model.annotate_image(input_path, results, output_path)
-            processed_files.append(output_path)
-            json_files.append(json_path)
+    Пока в пространстве идет обработка, архив формируется на лету. После ее завершения
+    архив собирается один раз и затем отдается из кеша: при появлении новых файлов
+    в него дописываются только они. Поддерживаются If-None-Match (ответ 304)
+    и запросы диапазонов для докачки.
 
-    # Возвращаем список имен обработанных файлов и JSON-файлов
-    return {"filenames": [os.path.basename(file) for file in processed_files], "json_filenames": [os.path.basename(file) for file in json_files]}
+    Args:
+        request (Request): Запрос клиента.
+        workspace (Workspace): Рабочее пространство.
+        src_dir (str): Директория с файлами.
+        extension (str | tuple): Расширение или кортеж расширений файлов, попадающих в архив.
+        filename (str): Имя архива для скачивания.
+
+    Returns:
+        Response: Архив, потоковый архив или ответ 304.
+    """
+    if workspaces.in_use(workspace):
+        return zip_response(src_dir, extension, filename)
 
-@app.get("/download/pics")
-async def download_results():
+    etag = await executors.run_io(archives.etag, src_dir, extension)
+    if etag_matches(request, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+
+    # Архив хранится вне директории результатов, чтобы не раздаваться как результат
+    archive_path = os.path.join(workspace.upload_dir, filename)
+    # Отдаем тот файл, который был открыт вместе с вычислением ETag: следующая сборка
+    # может заменить архив, но открытый файл останется прежней версией
+    file, etag = await executors.run_io(archives.open, src_dir, extension, archive_path)
+    try:
+        size = os.fstat(file.fileno()).st_size
+        requested = byte_range(request, etag, size)
+    except BaseException:
+        archives.release(archive_path, file)
+        raise
+    start, end = requested if requested is not None else (0, size - 1)
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "no-cache",
+        "Accept-Ranges": "bytes",
+        "Content-Length": str(end - start + 1),
+        "Content-Disposition": f'attachment; filename="{filename}"',
+    }
+    if requested is not None:
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+    return StreamingResponse(
+        read_archive(file, start, end - start + 1),
+        status_code=206 if requested is not None else 200,
+        media_type="application/zip",
+        headers=headers,
+        background=BackgroundTask(archives.release, archive_path, file)
+    )
+
+@app.get("/download/{workspace_id}/pics")
+async def download_results(workspace_id: str, request: Request):
     """
-    Создает ZIP-архив с обработанными изображениями и возвращает его для скачивания.
+    Отдает ZIP-архив с обработанными изображениями рабочего пространства.
+
+    Args:
+        workspace_id (str): Идентификатор рабочего пространства.
+        request (Request): Запрос клиента.
 
     Returns:
-        FileResponse: Ответ с ZIP-архивом.
+        Response: Ответ с ZIP-архивом.
+    """
+    workspace = get_workspace(workspace_id)
+    return await download_archive(request, workspace, workspace.result_dir, STORED_EXTENSIONS, "processed_images.zip")
+
+@app.get("/download/{workspace_id}/json")
+async def download_json(workspace_id: str, request: Request):
     """
-    # Путь для сохранения ZIP-архива
-    zip_path = os.path.join(RESULT_DIR, "processed_images.zip")
+    Отдает ZIP-архив с JSON-файлами рабочего пространства.
 
-    # Создаем ZIP-архив с обработанными изображениями
-    with zipfile.ZipFile(zip_path, "w") as zipf:
-        for file in os.listdir(RESULT_DIR):
-            file_path = os.path.join(RESULT_DIR, file)
-            if file.endswith(".png"):
-                zipf.write(file_path, arcname=file)
+    Args:
+        workspace_id (str): Идентификатор рабочего пространства.
+        request (Request): Запрос клиента.
 
-    # Возвращаем ZIP-архив для скачивания
-    return FileResponse(zip_path, media_type="application/zip", filename="processed_images.zip")
+    Returns:
+        Response: Ответ с ZIP-архивом.
+    """
+    workspace = get_workspace(workspace_id)
+    return await download_archive(request, workspace, workspace.json_dir, ".json", "processed_json.zip")
 
-@app.get("/download/json/")
-async def download_json():
+def columnar_path(workspace: Workspace) -> str:
     """
-    Создает ZIP-архив с JSON-файлами и возвращает его для скачивания.
+    Возвращает путь к колоночному файлу аннотаций рабочего пространства.
+
+    Args:
+        workspace (Workspace): Рабочее пространство.
 
     Returns:
-        FileResponse: Ответ с ZIP-архивом.
+        str: Путь к файлу.
+
+    Raises:
+        HTTPException: Если файла нет.
     """
-    # Путь для сохранения ZIP-архива
-    zip_path = os.path.join(JSON_DIR, "processed_json.zip")
+    path = os.path.join(workspace.json_dir, COLUMNAR_FILENAME)
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Колоночный файл аннотаций не найден")
+    return path
 
-    # Создаем ZIP-архив с JSON-файлами
-    with zipfile.ZipFile(zip_path, "w") as zipf:
-        for file in os.listdir(JSON_DIR):
-            file_path = os.path.join(JSON_DIR, file)
-            if file.endswith(".json"):
-                zipf.write(file_path, arcname=file)
+@app.get("/download/{workspace_id}/columnar")
+async def download_columnar(workspace_id: str):
+    """
+    Отдает колоночный файл аннотаций рабочего пространства.
+
+    Args:
+        workspace_id (str): Идентификатор рабочего пространства.
+
+    Returns:
+        FileResponse: Колоночный файл аннотаций.
+    """
+    path = columnar_path(get_workspace(workspace_id))
+    return FileResponse(path, filename=COLUMNAR_FILENAME, media_type="application/octet-stream")
+
+def read_annotation(path: str, name: str):
+    """
+    Формирует JSON-аннотацию страницы из колоночного файла.
+
+    Args:
+        path (str): Путь к колоночному файлу.
+        name (str): Имя страницы.
+
+    Returns:
+        dict | None: JSON-аннотация или None, если страницы нет в файле.
+    """
+    with ColumnarReader(path) as reader:
+        try:
+            return reader.annotation(reader.index(name))
+        except KeyError:
+            return None
+
+@app.get("/annotations/{workspace_id}/{name}")
+async def get_annotation(workspace_id: str, name: str):
+    """
+    Отдает JSON-аннотацию страницы, сформированную из колоночного файла.
 
-    # Возвращаем ZIP-архив для скачивания
-    return FileResponse(zip_path, media_type="application/zip", filename="processed_json.zip")
+    Args:
+        workspace_id (str): Идентификатор рабочего пространства.
+        name (str): Имя страницы.
+
+    Returns:
+        dict: JSON-аннотация страницы.
+    """
+    path = columnar_path(get_workspace(workspace_id))
+    annotation = await executors.run_io(read_annotation, path, name)
+    if annotation is None:
+        raise HTTPException(status_code=404, detail="Страница не найдена")
+    return annotation
 
-@app.post("/cleanup/")
-async def cleanup():
+@app.post("/cleanup/{workspace_id}")
+async def cleanup(workspace_id: str):
     """
-    Очищает директории с загруженными и обработанными файлами.
+    Удаляет загруженные и обработанные файлы рабочего пространства.
+
+    Args:
+        workspace_id (str): Идентификатор рабочего пространства.
 
     Returns:
         dict: Сообщение об успешной очистке.
+
+    Raises:
+        HTTPException: Если рабочее пространство не найдено (404) или в нем еще идет обработка (409).
+    """
+    workspace = get_workspace(workspace_id)
+    if not await executors.run_io(workspaces.remove, workspace):
+        raise HTTPException(status_code=409, detail="В рабочем пространстве еще идет обработка")
+    return {"message": "Рабочее пространство очищено"}
+
+@app.get("/stats/")
+async def stats():
+    """
+    Возвращает статистику движка батчинга, пулов потоков, заданий, кешей и рабочих пространств.
+
+    Returns:
+        dict: Статистика компонентов сервиса.
+    """
+    return {
+        "startup": startup,
+        "batching": batch_engine.stats() if batch_engine is not None else None,
+        "executors": executors.stats(),
+        "jobs": job_manager.stats(),
+        "cache": result_cache.stats() if result_cache is not None else None,
+        "workspaces": workspaces.stats(),
+        "archives": archives.stats(),
+    }
+
+def collect_metrics() -> list:
+    """
+    Собирает текущие глубины очередей и счетчики кеша для /metrics.
+
+    Returns:
+        list: Семейства метрик (имя, тип, описание, список пар (метки, значение)).
+    """
+    queues = [({"queue": "io"}, executors.io.stats()["queue_depth"]),
+              ({"queue": "inference"}, executors.inference.stats()["queue_depth"]),
+              ({"queue": "jobs"}, job_manager.stats()["queue_depth"])]
+    if batch_engine is not None:
+        queues.append(({"queue": "batching"}, batch_engine.stats()["queue_depth"]))
+    families = [("layout_queue_depth", "gauge", "Количество задач в очереди", queues)]
+    if result_cache is not None:
+        cache_stats = result_cache.stats()
+        families.append(("layout_cache_requests_total", "counter", "Обращения к кешу результатов", [
+            ({"kind": kind, "result": result}, count)
+            for result in ("hits", "misses")
+            for kind, count in cache_stats[result].items()
+        ]))
+    return families
+
+metrics.REGISTRY.collector(collect_metrics)
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """
+    Отдает метрики сервиса в текстовом формате Prometheus.
+
+    Returns:
+        Response: Длительности этапов и запросов, счетчики страниц, глубины очередей и обращения к кешу.
+    """
+    return Response(metrics.REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/health/live")
+async def health_live():
+    """
+    Проверка живости: процесс запущен и обрабатывает запросы.
+
+    Returns:
+        dict: Статус процесса.
+    """
+    return {"status": "alive"}
+
+@app.get("/health/ready")
+async def health_ready():
+    """
+    Проверка готовности: модель загружена и прогрета.
+
+    Returns:
+        JSONResponse: Состояние запуска и длительности его этапов; код 503, пока сервис не готов.
     """
-    # Очищаем директории
-    clean_up([UPLOAD_DIR, RESULT_DIR, JSON_DIR])
-    return {"message": "Директории очищены"}
+    return JSONResponse(startup, status_code=200 if startup["status"] == "ready" else 503)
@@ -0,0 +1,409 @@
+import os
+import argparse
+from abc import ABC, abstractmethod
+
+import numpy as np
+from PIL import Image
+
+# Форматы экспорта и соответствующие им среды выполнения
+EXPORT_FORMATS = {"onnx": "onnx", "openvino": "openvino"}
+
+
+class Boxes:
+    def __init__(self, data: np.ndarray) -> None:
+        """
+        Рамки предсказаний в том же виде, что и result.boxes у doclayout_yolo.
+
+        Args:
+            data (np.ndarray): Массив (N, 6): x1, y1, x2, y2, уверенность, класс.
+        """
+        self.data = data
+
+    @property
+    def xyxy(self) -> np.ndarray:
+        return self.data[:, :4]
+
+    @property
+    def conf(self) -> np.ndarray:
+        return self.data[:, 4]
+
+    @property
+    def cls(self) -> np.ndarray:
+        return self.data[:, 5]
+
+    def cpu(self) -> "Boxes":
+        return self
+
+    def numpy(self) -> "Boxes":
+        return self
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def __getitem__(self, index) -> "Boxes":
+        return Boxes(self.data[index:index + 1] if isinstance(index, int) else self.data[index])
+
+    def __iter__(self):
+        for i in range(len(self.data)):
+            yield self[i]
+
+
+class Results:
+    def __init__(self, boxes: Boxes, orig_shape: tuple) -> None:
+        """
+        Результат предсказания для одного изображения, совместимый с результатами doclayout_yolo.
+
+        Args:
+            boxes (Boxes): Рамки предсказаний.
+            orig_shape (tuple): Высота и ширина исходного изображения.
+        """
+        self.boxes = boxes
+        self.orig_shape = orig_shape
+
+
+def letterbox(image: Image.Image, imgsz: int) -> tuple:
+    """
+    Вписывает изображение в квадрат imgsz x imgsz с сохранением пропорций, как при обучении модели.
+
+    Args:
+        image (Image.Image): RGB-изображение.
+        imgsz (int): Размер стороны входа модели.
+
+    Returns:
+        tuple: Массив (3, imgsz, imgsz) float32, коэффициент масштабирования и отступы (left, top).
+    """
+    width, height = image.size
+    ratio = min(imgsz / height, imgsz / width)
+    new_width, new_height = round(width * ratio), round(height * ratio)
+    left = round((imgsz - new_width) / 2 - 0.1)
+    top = round((imgsz - new_height) / 2 - 0.1)
+
+    canvas = Image.new("RGB", (imgsz, imgsz), (114, 114, 114))
+    canvas.paste(image.resize((new_width, new_height), Image.BILINEAR), (left, top))
+    array = np.asarray(canvas, dtype=np.float32).transpose(2, 0, 1) / 255.0
+    return array, ratio, (left, top)
+
+
+class RuntimeBackend(ABC):
+    def __init__(self, model_path: str, imgsz: int = 1024, threads: int = None) -> None:
+        """
+        Инференс экспортированной модели через отдельную среду выполнения на CPU.
+
+        Изображения приводятся к квадрату imgsz, выход модели YOLOv10 (N, 300, 6)
+        переводится обратно в координаты исходного изображения.
+
+        Args:
+            model_path (str): Путь к экспортированной модели.
+            imgsz (int): Размер стороны входа модели.
+            threads (int, optional): Количество потоков внутри одной операции. По умолчанию выбирает среда выполнения.
+        """
+        self.model_path = model_path
+        self.imgsz = imgsz
+        self.threads = threads
+
+    def predict(self, sources: list, conf_threshold: float = 0.5) -> list:
+        """
+        Делает предсказание для нескольких изображений за один проход модели.
+
+        Args:
+            sources (list): Список путей к изображениям или самих изображений.
+            conf_threshold (float): Порог уверенности для предсказаний.
+
+        Returns:
+            list: Результаты предсказаний в порядке sources.
+        """
+        images = [source if isinstance(source, Image.Image) else Image.open(source).convert("RGB") for source in sources]
+        inputs, transforms = [], []
+        for image in images:
+            array, ratio, pad = letterbox(image, self.imgsz)
+            inputs.append(array)
+            transforms.append((ratio, pad, image.size))
+
+        outputs = self._run(np.stack(inputs))
+
+        results = []
+        for output, (ratio, (left, top), (width, height)) in zip(outputs, transforms):
+            detections = output[output[:, 4] > conf_threshold].astype(np.float32)
+            # Переводим рамки из координат входа модели в координаты исходного изображения
+            detections[:, [0, 2]] = ((detections[:, [0, 2]] - left) / ratio).clip(0, width)
+            detections[:, [1, 3]] = ((detections[:, [1, 3]] - top) / ratio).clip(0, height)
+            results.append(Results(Boxes(detections), (height, width)))
+        return results
+
+    @abstractmethod
+    def _run(self, batch: np.ndarray) -> np.ndarray:
+        """
+        Выполняет модель на батче (B, 3, imgsz, imgsz) и возвращает выход (B, N, 6).
+        """
+
+
+class OnnxBackend(RuntimeBackend):
+    def __init__(self, model_path: str, imgsz: int = 1024, threads: int = None) -> None:
+        try:
+            import onnxruntime as ort
+        except ImportError as e:
+            raise ImportError("Для бэкенда onnx установите пакет onnxruntime") from e
+        super().__init__(model_path, imgsz, threads)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        # Параллелизм между запросами обеспечивает пул инференса, поэтому поток на граф один
+        options.inter_op_num_threads = 1
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(model_path, sess_options=options, providers=["CPUExecutionProvider"])
+        self.input_name = self.session.get_inputs()[0].name
+
+    def _run(self, batch: np.ndarray) -> np.ndarray:
+        return self.session.run(None, {self.input_name: batch})[0]
+
+
+class OpenVinoBackend(RuntimeBackend):
+    def __init__(self, model_path: str, imgsz: int = 1024, threads: int = None) -> None:
+        try:
+            import openvino as ov
+        except ImportError as e:
+            raise ImportError("Для бэкенда openvino установите пакет openvino") from e
+        super().__init__(model_path, imgsz, threads)
+
+        config = {"PERFORMANCE_HINT": "LATENCY"}
+        if threads:
+            config["INFERENCE_NUM_THREADS"] = threads
+        self.compiled = ov.Core().compile_model(model_path, "CPU", config)
+        self.output = self.compiled.output(0)
+
+    def _run(self, batch: np.ndarray) -> np.ndarray:
+        return self.compiled([batch])[self.output]
+
+
+BACKENDS = {"onnx": OnnxBackend, "onnx-int8": OnnxBackend, "openvino": OpenVinoBackend}
+
+
+def exported_path(weights_path: str, backend: str) -> str:
+    """
+    Возвращает путь, по которому лежит экспортированная модель.
+
+    Args:
+        weights_path (str): Путь к весам PyTorch.
+        backend (str): Среда выполнения (onnx, onnx-int8 или openvino).
+
+    Returns:
+        str: Путь к файлу экспортированной модели.
+    """
+    stem = os.path.splitext(weights_path)[0]
+    if backend == "onnx-int8":
+        return f"{stem}.int8.onnx"
+    if backend == "openvino":
+        return os.path.join(f"{stem}_openvino_model", f"{os.path.basename(stem)}.xml")
+    return f"{stem}.onnx"
+
+def export_model(weights_path: str, backend: str, imgsz: int = 1024) -> str:
+    """
+    Экспортирует веса PyTorch в формат среды выполнения, если это еще не сделано.
+
+    Повторный экспорт выполняется, только если веса новее экспортированной модели.
+
+    Args:
+        weights_path (str): Путь к весам PyTorch.
+        backend (str): Среда выполнения (onnx или openvino).
+        imgsz (int): Размер стороны входа модели.
+
+    Returns:
+        str: Путь к экспортированной модели.
+    """
+    path = exported_path(weights_path, backend)
+    if os.path.exists(path) and os.path.getmtime(path) >= os.path.getmtime(weights_path):
+        return path
+
+    from doclayout_yolo import YOLOv10
+    # Динамическая размерность батча нужна движку батчинга
+    YOLOv10(weights_path).export(format=EXPORT_FORMATS[backend], imgsz=imgsz, dynamic=True, simplify=True)
+    return path
+
+def load_backend(weights_path: str, backend: str, imgsz: int = 1024, threads: int = None) -> RuntimeBackend:
+    """
+    Экспортирует модель при необходимости и создает среду выполнения для нее.
+
+    Args:
+        weights_path (str): Путь к весам PyTorch.
+        backend (str): Среда выполнения (onnx или openvino).
+        imgsz (int): Размер стороны входа модели.
+        threads (int, optional): Количество потоков внутри одной операции.
+
+    Returns:
+        RuntimeBackend: Среда выполнения модели.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Неизвестный бэкенд модели: {backend}")
+    if backend == "onnx-int8":
+        # Квантование требует калибровки и проверки точности, поэтому выполняется заранее
+        path = exported_path(weights_path, backend)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Квантованная модель {path} не найдена, создайте ее скриптом scripts/quantize.py")
+        return OnnxBackend(path, imgsz=imgsz, threads=threads)
+    return BACKENDS[backend](export_model(weights_path, backend, imgsz), imgsz=imgsz, threads=threads)
+
+
+class CalibrationReader:
+    def __init__(self, input_name: str, images: list, imgsz: int = 1024) -> None:
+        """
+        Источник данных калибровки для статического квантования: страницы, приведенные к входу модели.
+
+        Args:
+            input_name (str): Имя входа модели.
+            images (list): Пути к изображениям страниц.
+            imgsz (int): Размер стороны входа модели.
+        """
+        self.input_name = input_name
+        self.images = list(images)
+        self.imgsz = imgsz
+        self._iterator = iter(self.images)
+
+    def get_next(self):
+        image_path = next(self._iterator, None)
+        if image_path is None:
+            return None
+        array, _, _ = letterbox(Image.open(image_path).convert("RGB"), self.imgsz)
+        return {self.input_name: array[np.newaxis]}
+
+    def rewind(self) -> None:
+        """
+        Начинает выдачу страниц калибровки сначала.
+        """
+        self._iterator = iter(self.images)
+
+def quantize_model(weights_path: str, calibration_images: list, imgsz: int = 1024) -> str:
+    """
+    Создает INT8-вариант модели статическим квантованием ONNX-модели.
+
+    Квантуются только свертки и матричные умножения (формат QDQ, веса по каналам),
+    остальные операции, включая постобработку YOLOv10, остаются в float32.
+    Диапазоны активаций калибруются на страницах calibration_images.
+
+    Args:
+        weights_path (str): Путь к весам PyTorch.
+        calibration_images (list): Пути к изображениям страниц для калибровки.
+        imgsz (int): Размер стороны входа модели.
+
+    Returns:
+        str: Путь к квантованной модели.
+    """
+    try:
+        import onnxruntime as ort
+        from onnxruntime.quantization import CalibrationMethod, QuantFormat, QuantType, quantize_static
+        from onnxruntime.quantization.shape_inference import quant_pre_process
+    except ImportError as e:
+        raise ImportError("Для квантования установите пакет onnxruntime") from e
+
+    onnx_path = export_model(weights_path, "onnx", imgsz)
+    output_path = exported_path(weights_path, "onnx-int8")
+    prepared_path = f"{os.path.splitext(onnx_path)[0]}.prep.onnx"
+
+    # Вывод форм и оптимизация графа перед квантованием
+    quant_pre_process(onnx_path, prepared_path)
+    input_name = ort.InferenceSession(prepared_path, providers=["CPUExecutionProvider"]).get_inputs()[0].name
+    try:
+        quantize_static(
+            prepared_path,
+            output_path,
+            CalibrationReader(input_name, calibration_images, imgsz),
+            quant_format=QuantFormat.QDQ,
+            op_types_to_quantize=["Conv", "MatMul"],
+            per_channel=True,
+            activation_type=QuantType.QUInt8,
+            weight_type=QuantType.QInt8,
+            calibrate_method=CalibrationMethod.MinMax,
+        )
+    finally:
+        os.remove(prepared_path)
+    return output_path
+
+
+def box_iou(box1: np.ndarray, box2: np.ndarray) -> float:
+    """
+    Вычисляет IoU двух рамок в формате xyxy.
+    """
+    x1, y1 = max(box1[0], box2[0]), max(box1[1], box2[1])
+    x2, y2 = min(box1[2], box2[2]), min(box1[3], box2[3])
+    intersection = max(0.0, x2 - x1) * max(0.0, y2 - y1)
+    union = (box1[2] - box1[0]) * (box1[3] - box1[1]) + (box2[2] - box2[0]) * (box2[3] - box2[1]) - intersection
+    return float(intersection / union) if union > 0 else 0.0
+
+def check_parity(reference, candidate, sources: list, conf_threshold: float = 0.5, iou_threshold: float = 0.5) -> dict:
+    """
+    Сравнивает предсказания двух моделей на одних и тех же изображениях.
+
+    Рамки сопоставляются жадно внутри каждого класса по убыванию IoU.
+
+    Args:
+        reference (YOLOModel): Эталонная модель (обычно PyTorch).
+        candidate (YOLOModel): Проверяемая модель.
+        sources (list): Пути к изображениям.
+        conf_threshold (float): Порог уверенности для предсказаний.
+        iou_threshold (float): Минимальный IoU, при котором рамки считаются совпавшими.
+
+    Returns:
+        dict: Количество совпавших и непарных рамок, средний IoU совпавших рамок
+            и максимальное расхождение уверенности.
+    """
+    matched, reference_only, candidate_only = 0, 0, 0
+    ious, conf_diffs = [], []
+
+    for source in sources:
+        expected = np.concatenate([r.boxes.cpu().numpy().data for r in reference.predict(source, conf_threshold)])
+        actual = np.concatenate([r.boxes.cpu().numpy().data for r in candidate.predict(source, conf_threshold)])
+
+        for cls_id in np.union1d(expected[:, 5], actual[:, 5]):
+            exp = expected[expected[:, 5] == cls_id]
+            act = actual[actual[:, 5] == cls_id]
+            pairs = sorted(
+                ((box_iou(e[:4], a[:4]), i, j) for i, e in enumerate(exp) for j, a in enumerate(act)),
+                reverse=True
+            )
+            used_exp, used_act = set(), set()
+            for iou, i, j in pairs:
+                if iou < iou_threshold:
+                    break
+                if i in used_exp or j in used_act:
+                    continue
+                used_exp.add(i)
+                used_act.add(j)
+                ious.append(iou)
+                conf_diffs.append(abs(float(exp[i, 4]) - float(act[j, 4])))
+            matched += len(used_exp)
+            reference_only += len(exp) - len(used_exp)
+            candidate_only += len(act) - len(used_act)
+
+    total = matched + reference_only
+    return {
+        "images": len(sources),
+        "matched": matched,
+        "reference_only": reference_only,
+        "candidate_only": candidate_only,
+        "recall": matched / total if total else 1.0,
+        "mean_iou": float(np.mean(ious)) if ious else None,
+        "max_conf_diff": max(conf_diffs) if conf_diffs else None,
+    }
+
+
+if __name__ == "__main__":
+    from model.model import YOLOModel
+
+    parser = argparse.ArgumentParser(description="Экспорт модели и проверка совпадения с PyTorch")
+    parser.add_argument("--weights", default="model/best_model.pt")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default="onnx")
+    parser.add_argument("--imgsz", type=int, default=1024)
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--images", default="../../data/image", help="Директория изображений для проверки")
+    parser.add_argument("--limit", type=int, default=20)
+    parser.add_argument("--conf", type=float, default=0.5)
+    args = parser.parse_args()
+
+    images = sorted(
+        os.path.join(args.images, file) for file in os.listdir(args.images)
+        if file.lower().endswith((".png", ".jpg", ".jpeg"))
+    )[:args.limit]
+    reference = YOLOModel(args.weights)
+    candidate = YOLOModel(args.weights, backend=args.backend, imgsz=args.imgsz, threads=args.threads)
+    print(check_parity(reference, candidate, images, conf_threshold=args.conf))
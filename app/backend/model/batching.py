@@ -0,0 +1,254 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class _BatchItem:
+    """
+    Элемент очереди батчинга: одно изображение и Future для результата.
+    """
+    __slots__ = ("source", "conf_threshold", "future", "enqueued_at")
+
+    def __init__(self, source, conf_threshold: float) -> None:
+        self.source = source
+        self.conf_threshold = conf_threshold
+        self.future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class BatchingEngine:
+    def __init__(self, model, max_batch_size: int = 8, max_wait_ms: float = 10.0, max_queue_size: int = 256, executor=None) -> None:
+        """
+        Движок динамического микро-батчинга поверх YOLOModel.
+
+        Собирает страницы от всех одновременно выполняющихся запросов в одну очередь
+        и отправляет их в модель одним батчем. Батч отправляется, как только набрано
+        max_batch_size изображений или истекло max_wait_ms с момента поступления первого.
+
+        Args:
+            model (YOLOModel): Модель, у которой есть метод predict_batch.
+            max_batch_size (int): Максимальный размер батча.
+            max_wait_ms (float): Максимальное время ожидания наполнения батча в миллисекундах.
+            max_queue_size (int): Максимальная длина очереди ожидающих изображений.
+            executor (TrackedExecutor, optional): Пул, в котором выполняются батчи.
+                Если не задан, батчи выполняются в фоновом потоке движка.
+        """
+        self.model = model
+        self.executor = executor
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.max_queue_size = max_queue_size
+
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._lock = threading.Lock()
+        self._closed = False
+        # Сигнал остановки извлечен из очереди при наборе батча
+        self._stopping = False
+        # Не формируем новый батч, пока все потоки инференса заняты:
+        # страницы в это время копятся в очереди, и следующий батч получается полнее
+        self._slots = threading.Semaphore(executor.max_workers if executor is not None else 1)
+
+        # Счетчики для подбора параметров батчинга
+        self._batches = 0
+        self._items = 0
+        self._errors = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        self._total_inference = 0.0
+        self._last_batch_size = 0
+
+        # Запускаем фоновый поток, который формирует батчи
+        self._worker = threading.Thread(target=self._run, name="batching-engine", daemon=True)
+        self._worker.start()
+
+    def submit(self, source, conf_threshold: float = 0.5) -> Future:
+        """
+        Ставит изображение в очередь на предсказание.
+
+        Args:
+            source: Путь к изображению или само изображение.
+            conf_threshold (float): Порог уверенности для предсказаний.
+
+        Returns:
+            Future: Future, который завершится списком результатов для этого изображения.
+
+        Raises:
+            queue.Full: Если очередь движка переполнена.
+        """
+        if self._closed:
+            raise RuntimeError("Движок батчинга остановлен")
+
+        item = _BatchItem(source, conf_threshold)
+        # Не блокируем вызывающего при переполнении очереди, чтобы не остановить цикл событий
+        self._queue.put_nowait(item)
+        return item.future
+
+    def predict(self, source, conf_threshold: float = 0.5) -> list:
+        """
+        Синхронный аналог YOLOModel.predict, выполняемый через общий батч.
+
+        Args:
+            source: Путь к изображению или само изображение.
+            conf_threshold (float): Порог уверенности для предсказаний.
+
+        Returns:
+            list: Результаты предсказаний.
+        """
+        return self.submit(source, conf_threshold).result()
+
+    def stats(self) -> dict:
+        """
+        Возвращает текущие параметры и статистику батчинга.
+
+        Returns:
+            dict: Размер батча, глубина очереди, время ожидания и инференса.
+        """
+        with self._lock:
+            batches = self._batches
+            items = self._items
+            return {
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait_ms,
+                "max_queue_size": self.max_queue_size,
+                "queue_depth": self._queue.qsize(),
+                "batches": batches,
+                "items": items,
+                "errors": self._errors,
+                "last_batch_size": self._last_batch_size,
+                "avg_batch_size": items / batches if batches else 0.0,
+                "avg_wait_ms": self._total_wait / items * 1000 if items else 0.0,
+                "max_observed_wait_ms": self._max_wait * 1000,
+                "avg_batch_inference_ms": self._total_inference / batches * 1000 if batches else 0.0,
+            }
+
+    def close(self) -> None:
+        """
+        Останавливает фоновый поток после обработки уже поставленных изображений.
+
+        Если фоновый поток уже завершился, изображения, оставшиеся в очереди,
+        получают ошибку, а не ждут результата бесконечно.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        # Полная очередь освобождается фоновым потоком, поэтому ждем места, пока он жив
+        while self._worker.is_alive():
+            try:
+                self._queue.put(None, timeout=0.1)
+                break
+            except queue.Full:
+                continue
+        self._worker.join()
+
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None and item.future.set_running_or_notify_cancel():
+                item.future.set_exception(RuntimeError("Движок батчинга остановлен"))
+
+    def _collect(self, first: _BatchItem) -> list:
+        """
+        Добирает батч до max_batch_size или до истечения max_wait_ms.
+
+        Args:
+            first (_BatchItem): Первый элемент батча.
+
+        Returns:
+            list: Элементы батча.
+        """
+        batch = [first]
+        deadline = first.enqueued_at + self.max_wait_ms / 1000
+
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - time.perf_counter()
+            try:
+                item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                # Завершаемся после этого батча
+                self._stopping = True
+                break
+            batch.append(item)
+
+        return batch
+
+    def _run_batch(self, batch: list) -> None:
+        """
+        Выполняет предсказание для батча и раздает результаты вызывающим.
+
+        Args:
+            batch (list): Элементы батча.
+        """
+        try:
+            self._predict_batch(batch)
+        finally:
+            self._slots.release()
+
+    def _predict_batch(self, batch: list) -> None:
+        """
+        Группирует батч по порогу уверенности и вызывает модель.
+
+        Args:
+            batch (list): Элементы батча.
+        """
+        started = time.perf_counter()
+
+        # Изображения с разными порогами уверенности нельзя смешивать в одном вызове модели.
+        # Отмененные вызывающим изображения пропускаем.
+        groups = {}
+        for item in batch:
+            if item.future.set_running_or_notify_cancel():
+                groups.setdefault(item.conf_threshold, []).append(item)
+
+        errors = 0
+        for conf_threshold, items in groups.items():
+            try:
+                results = self.model.predict_batch([item.source for item in items], conf_threshold)
+            except Exception as e:
+                errors += len(items)
+                for item in items:
+                    item.future.set_exception(e)
+                continue
+
+            # Каждый вызывающий получает список результатов, как от YOLOModel.predict
+            for item, result in zip(items, results):
+                item.future.set_result([result])
+
+        finished = time.perf_counter()
+        with self._lock:
+            self._batches += 1
+            self._items += len(batch)
+            self._errors += errors
+            self._last_batch_size = len(batch)
+            self._total_inference += finished - started
+            for item in batch:
+                wait = started - item.enqueued_at
+                self._total_wait += wait
+                self._max_wait = max(self._max_wait, wait)
+
+    def _run(self) -> None:
+        """
+        Основной цикл фонового потока.
+        """
+        while True:
+            self._slots.acquire()
+            first = self._queue.get()
+            if first is None:
+                break
+            batch = self._collect(first)
+            if self.executor is None:
+                self._run_batch(batch)
+            else:
+                self.executor.submit(self._run_batch, batch)
+            if self._stopping:
+                self._slots.acquire()
+                break
+
+        # Дожидаемся завершения батчей, уже переданных в пул
+        slots = self.executor.max_workers if self.executor is not None else 1
+        for _ in range(slots - 1):
+            self._slots.acquire()
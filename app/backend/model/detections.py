@@ -0,0 +1,120 @@
+import numpy as np
+
+
+class Detections:
+    def __init__(self, xyxy: np.ndarray, conf: np.ndarray, cls: np.ndarray) -> None:
+        """
+        Найденные на странице объекты в виде компактных массивов.
+
+        Args:
+            xyxy (np.ndarray): Рамки (N, 4) [x1, y1, x2, y2].
+            conf (np.ndarray): Уверенности (N,).
+            cls (np.ndarray): Номера классов (N,).
+        """
+        self.xyxy = xyxy
+        self.conf = conf
+        self.cls = cls
+
+    @classmethod
+    def from_results(cls, results) -> "Detections":
+        """
+        Переводит результаты модели в массивы за одно копирование на страницу.
+
+        Args:
+            results (list | Detections): Результаты предсказания модели или уже готовые Detections.
+
+        Returns:
+            Detections: Объекты всех результатов.
+        """
+        if isinstance(results, Detections):
+            return results
+        # Переносим с устройства модели весь тензор рамок сразу, а не каждую рамку отдельно
+        arrays = [np.asarray(result.boxes.cpu().numpy().data, dtype=np.float32) for result in results]
+        data = np.concatenate(arrays) if arrays else np.empty((0, 6), dtype=np.float32)
+        # Последние два столбца — уверенность и класс (у ultralytics перед ними может быть номер трека)
+        return cls(
+            np.ascontiguousarray(data[:, :4]),
+            np.ascontiguousarray(data[:, -2]),
+            data[:, -1].astype(np.int64)
+        )
+
+    @classmethod
+    def from_array(cls, data: np.ndarray) -> "Detections":
+        """
+        Создает объекты из массива (N, 6) [x1, y1, x2, y2, conf, cls].
+
+        Args:
+            data (np.ndarray): Массив объектов.
+
+        Returns:
+            Detections: Объекты страницы.
+        """
+        data = np.asarray(data, dtype=np.float32).reshape(-1, 6)
+        return cls(np.ascontiguousarray(data[:, :4]), np.ascontiguousarray(data[:, 4]), data[:, 5].astype(np.int64))
+
+    @classmethod
+    def from_annotation(cls, annotation: dict, class_names: list, conf: float = float("nan")) -> "Detections":
+        """
+        Создает объекты из JSON-аннотации страницы.
+
+        В JSON-аннотации нет уверенности, поэтому она заполняется значением conf.
+
+        Args:
+            annotation (dict): JSON-аннотация со списками рамок для каждого класса.
+            class_names (list): Имена классов по их номерам.
+            conf (float): Уверенность, присваиваемая всем рамкам.
+
+        Returns:
+            Detections: Объекты страницы.
+        """
+        groups = [np.asarray(annotation.get(name) or [], dtype=np.float32).reshape(-1, 4) for name in class_names]
+        counts = [len(group) for group in groups]
+        xyxy = np.concatenate(groups) if groups else np.empty((0, 4), dtype=np.float32)
+        return cls(
+            xyxy,
+            np.full(len(xyxy), conf, dtype=np.float32),
+            np.repeat(np.arange(len(class_names), dtype=np.int64), counts)
+        )
+
+    def __len__(self) -> int:
+        return len(self.cls)
+
+    def scaled(self, factor: float) -> "Detections":
+        """
+        Переводит рамки в другое разрешение той же страницы.
+
+        Args:
+            factor (float): Отношение нового разрешения к текущему.
+
+        Returns:
+            Detections: Объекты с масштабированными рамками.
+        """
+        if factor == 1:
+            return self
+        return Detections((self.xyxy * factor).astype(np.float32), self.conf, self.cls)
+
+    def to_array(self) -> np.ndarray:
+        """
+        Собирает объекты в один массив.
+
+        Returns:
+            np.ndarray: Массив (N, 6) [x1, y1, x2, y2, conf, cls].
+        """
+        return np.column_stack([self.xyxy, self.conf, self.cls.astype(np.float32)]).astype(np.float32)
+
+    def by_class(self, class_names: list) -> dict:
+        """
+        Группирует рамки по классам.
+
+        Порядок рамок внутри класса сохраняется.
+
+        Args:
+            class_names (list): Имена классов по их номерам.
+
+        Returns:
+            dict: Имя класса -> массив рамок (M, 4), для каждого класса из class_names.
+        """
+        order = np.argsort(self.cls, kind="stable")
+        counts = np.bincount(self.cls, minlength=len(class_names))
+        groups = np.split(self.xyxy[order], np.cumsum(counts)[:-1])
+        return dict(zip(class_names, groups))
@@ -1,6 +1,10 @@
-import torch
-from PIL import Image, ImageDraw, ImageFont
-from doclayout_yolo import YOLOv10
+import time
+
+from PIL import Image, ImageDraw
+
+from model.backends import load_backend
+from model.detections import Detections
+from model.renderer import Renderer
 
 # Список имен классов для аннотации
 CLASS_NAMES = [
@@ -18,30 +22,71 @@ COLORS = {
     'footnote': (128, 0, 128), 'formula': (0, 128, 128)
 }
 
+# Отрисовка с параметрами по умолчанию
+DEFAULT_RENDERER = Renderer(CLASS_NAMES, COLORS)
+
 class YOLOModel:
-    def __init__(self, weights_path: str) -> None:
+    def __init__(self, weights_path: str, backend: str = "torch", imgsz: int = 1024, threads: int = None) -> None:
         """
         Инициализация и загрузка модели YOLO.
 
         Args:
             weights_path (str): Путь к весам модели.
+            backend (str): Среда выполнения: torch, onnx, onnx-int8 или openvino. Для onnx и openvino
+                веса один раз экспортируются в соответствующий формат рядом с исходными,
+                onnx-int8 использует заранее квантованную модель (scripts/quantize.py).
+            imgsz (int): Размер стороны входа модели для onnx и openvino.
+            threads (int, optional): Количество потоков внутри одной операции для onnx и openvino.
         """
+        self.backend = backend
+        self.runtime = None
+        if backend != "torch":
+            # Экспортированная модель выполняется на CPU своей средой выполнения
+            self.device = 'cpu'
+            self.runtime = load_backend(weights_path, backend, imgsz=imgsz, threads=threads)
+            return
+        # torch и doclayout_yolo импортируются только при загрузке модели: импорт занимает секунды
+        import torch
+        from doclayout_yolo import YOLOv10
+
         # Определяем устройство для вычислений (GPU, если доступно)
         self.device = 'cuda' if torch.cuda.is_available() else 'cpu'
         # Загружаем модель YOLOv10 с указанными весами
         self.model = YOLOv10(weights_path).to(self.device)
 
-    def predict(self, image_path: str, conf_threshold: float = 0.5) -> list:
+    @classmethod
+    def connect(cls, address: str, connect_timeout: float = 60.0) -> "YOLOModel":
+        """
+        Создает модель, которая выполняет предсказания на сервере модели (python -m model.server).
+
+        Args:
+            address (str): Путь к unix-сокету или host:port сервера модели.
+            connect_timeout (float): Сколько секунд ждать запуска сервера.
+
+        Returns:
+            YOLOModel: Модель без собственных весов.
+        """
+        from model.server import RemoteBackend
+
+        model = cls.__new__(cls)
+        model.backend = "remote"
+        model.device = 'cpu'
+        model.runtime = RemoteBackend(address, connect_timeout=connect_timeout)
+        return model
+
+    def predict(self, image_path, conf_threshold: float = 0.5) -> list:
         """
         Делает предсказание для одного изображения.
 
         Args:
-            image_path (str): Путь к изображению.
+            image_path (str | Image.Image): Путь к изображению или декодированное изображение.
             conf_threshold (float): Порог уверенности для предсказаний.
 
         Returns:
             list: Результаты предсказаний.
         """
+        if self.runtime is not None:
+            return self.runtime.predict([image_path], conf_threshold)
         # Выполняем предсказание с использованием модели
         results = self.model.predict(
             source=image_path,
@@ -51,44 +96,69 @@ class YOLOModel:
         )
         return results
 
-    def annotate_image(self, image_path: str, results: list, output_path: str) -> None:
+    def predict_batch(self, sources: list, conf_threshold: float = 0.5) -> list:
+        """
+        Делает предсказание для нескольких изображений за один проход модели.
+
+        Args:
+            sources (list): Список путей к изображениям или самих изображений.
+            conf_threshold (float): Порог уверенности для предсказаний.
+
+        Returns:
+            list: Результаты предсказаний, по одному на каждое изображение в порядке sources.
+        """
+        if self.runtime is not None:
+            return self.runtime.predict(sources, conf_threshold)
+        # Выполняем предсказание для всего батча сразу
+        results = self.model.predict(
+            source=list(sources),
+            conf=conf_threshold,
+            save=False,
+            device=self.device,
+            batch=len(sources)
+        )
+        return results
+
+    def warm_up(self, sizes: list, batch_size: int = 1, runs: int = 1) -> float:
+        """
+        Прогревает модель на синтетических страницах, чтобы первый запрос не тратил время
+        на инициализацию ядер и выделение памяти.
+
+        Args:
+            sizes (list): Размеры страниц (ширина, высота), на которых выполняется прогрев.
+            batch_size (int): Размер батча прогрева.
+            runs (int): Количество проходов для каждого размера.
+
+        Returns:
+            float: Длительность прогрева в секундах.
+        """
+        start = time.perf_counter()
+        for width, height in sizes:
+            # Белая страница с блоками, похожими на текст, чтобы отработала и постобработка
+            page = Image.new("RGB", (width, height), (255, 255, 255))
+            draw = ImageDraw.Draw(page)
+            for i in range(8):
+                top = height // 10 + i * height // 10
+                draw.rectangle([width // 10, top, width * 9 // 10, top + height // 25], fill=(40, 40, 40))
+            for _ in range(runs):
+                self.predict_batch([page] * batch_size)
+        return time.perf_counter() - start
+
+    def annotate_image(self, image, results, output_path: str, renderer: Renderer = None) -> None:
         """
         Аннотирует изображение на основе предсказаний и сохраняет результат.
 
         Args:
-            image_path (str): Путь к исходному изображению.
-            results (list): Результаты предсказаний.
+            image (str | Image.Image): Путь к исходному изображению или уже декодированное
+                RGB-изображение, на котором рисование выполняется без копирования.
+            results (list | Detections): Результаты предсказаний.
             output_path (str): Путь для сохранения аннотированного изображения.
+            renderer (Renderer, optional): Параметры отрисовки. По умолчанию — полноразмерное
+                изображение в формате по расширению output_path.
         """
-        # Открываем исходное изображение
-        image = Image.open(image_path).convert("RGB")
-        # Создаем объект для рисования на изображении
-        draw = ImageDraw.Draw(image)
-        # Устанавливаем размер шрифта
-        font_size = 40
-        font = ImageFont.load_default(size=font_size)
-
-        # Обрабатываем каждый результат предсказания
-        for result in results:
-            # Получаем координаты ограничивающих рамок
-            boxes = result.boxes.cpu().numpy()
-            for box in boxes:
-                x1, y1, x2, y2 = box.xyxy[0]
-                cls_id = int(box.cls[0])
-                class_name = CLASS_NAMES[cls_id]
-                color = COLORS[class_name]
-
-                # Рисуем ограничивающую рамку
-                draw.rectangle([x1, y1, x2, y2], outline=color, width=3)
-
-                # Рисуем текст класса
-                text_position = (x1, y1 - font_size - 5)
-                draw.text(text_position, class_name, fill=color, font=font)
-
-        # Сохраняем аннотированное изображение
-        image.save(output_path)
-
-    def create_json_annotation(self, image_path: str, image_height: int, image_width: int, results: list) -> dict:
+        (renderer or DEFAULT_RENDERER).render(image, results, output_path)
+
+    def create_json_annotation(self, image_path: str, image_height: int, image_width: int, results) -> dict:
         """
         Создание JSON-аннотации из результатов предсказания.
 
@@ -96,7 +166,7 @@ class YOLOModel:
             image_path (str): Путь к изображению.
             image_height (int): Высота изображения.
             image_width (int): Ширина изображения.
-            results (list): Результаты предсказания.
+            results (list | Detections): Результаты предсказания.
 
         Returns:
             dict: JSON-аннотация с координатами для каждого класса.
@@ -108,28 +178,24 @@ class YOLOModel:
             "image_path": str(image_path),
         }
 
-        # Инициализируем списки координат для каждого класса
+        # Списки координат для каждого класса, в том числе пустые
+        groups = Detections.from_results(results).by_class(CLASS_NAMES)
         for class_name in CLASS_NAMES:
-            annotation[class_name] = []
-
-        # Обрабатываем каждый результат предсказания
-        for result in results:
-            boxes = result.boxes.cpu().numpy()
-            for box in boxes:
-                coords = box.xyxy[0].tolist()
-                class_name = CLASS_NAMES[int(box.cls[0])]
-                annotation[class_name].append(coords)
+            annotation[class_name] = groups[class_name].tolist()
 
         return annotation
 
-def load_model(weights_path: str) -> YOLOModel:
+def load_model(weights_path: str, backend: str = "torch", imgsz: int = 1024, threads: int = None) -> YOLOModel:
     """
     Фабрика для создания экземпляра YOLOModel.
 
     Args:
         weights_path (str): Путь к весам модели.
+        backend (str): Среда выполнения: torch, onnx, onnx-int8 или openvino.
+        imgsz (int): Размер стороны входа модели для onnx и openvino.
+        threads (int, optional): Количество потоков внутри одной операции для onnx и openvino.
 
     Returns:
         YOLOModel: Экземпляр модели YOLO.
     """
-    return YOLOModel(weights_path)
+    return YOLOModel(weights_path, backend=backend, imgsz=imgsz, threads=threads)
@@ -0,0 +1,135 @@
+import os
+import functools
+
+from PIL import Image, ImageDraw, ImageFont
+
+from model.detections import Detections
+
+# Формат результата -> формат PIL и расширение файла
+FORMATS = {
+    "png": ("PNG", ".png"),
+    "jpeg": ("JPEG", ".jpg"),
+    "webp": ("WEBP", ".webp"),
+}
+# Расширение файла -> формат результата, если формат не задан явно
+_EXTENSION_FORMATS = {".png": "png", ".jpg": "jpeg", ".jpeg": "jpeg", ".webp": "webp"}
+
+
+@functools.lru_cache(maxsize=None)
+def load_font(size: int) -> ImageFont.ImageFont:
+    """
+    Загружает шрифт подписей один раз для каждого размера.
+
+    Args:
+        size (int): Размер шрифта.
+
+    Returns:
+        ImageFont.ImageFont: Шрифт.
+    """
+    return ImageFont.load_default(size=size)
+
+
+class Renderer:
+    def __init__(self, class_names: list, colors: dict, image_format: str = "", quality: int = 85,
+                 compress_level: int = 6, max_side: int = 0, font_size: int = 40, line_width: int = 3) -> None:
+        """
+        Отрисовка найденных объектов на странице.
+
+        Рисование выполняется прямо на декодированной странице. Если задан max_side,
+        рисуется уменьшенное превью: рамки и подписи масштабируются вместе со страницей.
+
+        Args:
+            class_names (list): Имена классов по их номерам.
+            colors (dict): Имя класса -> цвет RGB.
+            image_format (str): Формат результата: png, jpeg или webp. Пустая строка —
+                формат по расширению исходной страницы.
+            quality (int): Качество JPEG и WebP (1-100).
+            compress_level (int): Уровень сжатия PNG (0-9): меньше — быстрее и крупнее файл.
+            max_side (int): Максимальная сторона результата в пикселях, 0 — исходный размер.
+            font_size (int): Размер шрифта подписей для страницы исходного размера.
+            line_width (int): Толщина рамок для страницы исходного размера.
+
+        Raises:
+            ValueError: Если формат не поддерживается.
+        """
+        if image_format and image_format not in FORMATS:
+            raise ValueError(f"Неподдерживаемый формат результата: {image_format}")
+        self.class_names = class_names
+        # Таблица цветов по номеру класса
+        self.colors = [colors[name] for name in class_names]
+        self.image_format = image_format
+        self.quality = quality
+        self.compress_level = compress_level
+        self.max_side = max_side
+        self.font_size = font_size
+        self.line_width = line_width
+
+    @property
+    def signature(self) -> str:
+        """
+        Параметры, влияющие на результат отрисовки, для ключей кеша.
+        """
+        return f"{self.image_format}:{self.quality}:{self.compress_level}:{self.max_side}"
+
+    def output_name(self, name: str) -> str:
+        """
+        Возвращает имя файла результата с расширением выбранного формата.
+
+        Args:
+            name (str): Имя файла страницы.
+
+        Returns:
+            str: Имя файла результата.
+        """
+        if not self.image_format:
+            return name
+        return os.path.splitext(name)[0] + FORMATS[self.image_format][1]
+
+    def render(self, image, results, output_path: str) -> None:
+        """
+        Рисует рамки и подписи классов и сохраняет результат.
+
+        Args:
+            image (str | Image.Image): Путь к исходному изображению или уже декодированное
+                RGB-изображение, на котором рисование выполняется без копирования.
+            results (list | Detections): Результаты предсказаний.
+            output_path (str): Путь для сохранения аннотированного изображения.
+        """
+        if not isinstance(image, Image.Image):
+            image = Image.open(image).convert("RGB")
+        detections = Detections.from_results(results)
+
+        scale = 1.0
+        if self.max_side and max(image.size) > self.max_side:
+            # Превью: уменьшаем страницу до рисования, чтобы не рисовать и не сжимать лишние пиксели
+            scale = self.max_side / max(image.size)
+            size = (max(round(image.width * scale), 1), max(round(image.height * scale), 1))
+            image = image.resize(size, Image.Resampling.BILINEAR, reducing_gap=2.0)
+
+        draw = ImageDraw.Draw(image)
+        font_size = max(round(self.font_size * scale), 8)
+        font = load_font(font_size)
+        line_width = max(round(self.line_width * scale), 1)
+
+        boxes = (detections.xyxy * scale).tolist()
+        for (x1, y1, x2, y2), cls_id in zip(boxes, detections.cls.tolist()):
+            color = self.colors[cls_id]
+            class_name = self.class_names[cls_id]
+            # Рисуем ограничивающую рамку и подпись класса над ней
+            draw.rectangle([x1, y1, x2, y2], outline=color, width=line_width)
+            draw.text((x1, y1 - font_size - 5), class_name, fill=color, font=font)
+
+        image.save(output_path, **self._save_options(output_path))
+
+    def _save_options(self, output_path: str) -> dict:
+        """
+        Параметры сохранения для формата результата.
+        """
+        image_format = self.image_format or _EXTENSION_FORMATS.get(os.path.splitext(output_path)[1].lower())
+        if image_format == "png":
+            return {"format": "PNG", "compress_level": self.compress_level}
+        if image_format == "jpeg":
+            return {"format": "JPEG", "quality": self.quality}
+        if image_format == "webp":
+            return {"format": "WEBP", "quality": self.quality, "method": 4}
+        return {}
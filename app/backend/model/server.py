@@ -0,0 +1,397 @@
+import os
+import time
+import argparse
+import threading
+from concurrent.futures import Future
+from multiprocessing import shared_memory, resource_tracker
+from multiprocessing.connection import Listener, Client
+
+import numpy as np
+from PIL import Image
+
+from model.backends import Boxes, Results
+from model.batching import BatchingEngine
+from model.detections import Detections
+
+# Ключ, которым сервер модели и HTTP-воркеры подтверждают друг друга при соединении.
+# Соединение передает объекты pickle, поэтому общеизвестного ключа по умолчанию нет:
+# без ключа сервер слушает только unix-сокет, доступный владельцу процесса
+DEFAULT_AUTHKEY = os.getenv("MODEL_SERVER_AUTHKEY", "")
+
+
+def parse_address(address: str):
+    """
+    Разбирает адрес сервера модели.
+
+    Args:
+        address (str): Путь к unix-сокету или host:port.
+
+    Returns:
+        str | tuple: Адрес в формате multiprocessing.connection.
+    """
+    host, sep, port = address.rpartition(":")
+    if sep and port.isdigit() and "/" not in address:
+        return (host or "127.0.0.1", int(port))
+    return address
+
+
+def connection_key(address, authkey: str):
+    """
+    Проверяет, что соединение с сервером модели защищено, и возвращает ключ.
+
+    Args:
+        address (str | tuple): Адрес в формате multiprocessing.connection.
+        authkey (str): Ключ аутентификации.
+
+    Returns:
+        bytes | None: Ключ для multiprocessing.connection или None для unix-сокета без ключа.
+
+    Raises:
+        ValueError: Если для адреса host:port не задан ключ.
+    """
+    if isinstance(address, tuple) and not authkey:
+        raise ValueError("Для адреса host:port сервера модели задайте ключ MODEL_SERVER_AUTHKEY")
+    return authkey.encode() if authkey else None
+
+
+def result_arrays(result) -> tuple:
+    """
+    Переводит результат модели в компактный вид для передачи между процессами.
+
+    Args:
+        result: Результат предсказания для одного изображения.
+
+    Returns:
+        tuple: Массив (N, 6) [x1, y1, x2, y2, conf, cls] и размер исходного изображения (высота, ширина).
+    """
+    return Detections.from_results([result]).to_array(), tuple(result.orig_shape)
+
+
+class RemoteBackend:
+    def __init__(self, address: str, authkey: str = DEFAULT_AUTHKEY, connect_timeout: float = 60.0) -> None:
+        """
+        Клиент сервера модели для HTTP-воркера.
+
+        Пиксели страниц передаются через разделяемую память: воркер копирует
+        изображение в блок multiprocessing.shared_memory и отправляет серверу
+        только имя блока и размер, а в ответ получает рамки (N, 6).
+        Веса и среда выполнения модели в процесс воркера не загружаются.
+
+        Args:
+            address (str): Путь к unix-сокету или host:port сервера модели.
+            authkey (str): Ключ аутентификации соединения; обязателен для host:port.
+            connect_timeout (float): Сколько секунд ждать запуска сервера.
+
+        Raises:
+            ValueError: Если для адреса host:port не задан ключ.
+            ConnectionError: Если сервер не принял соединение за connect_timeout.
+        """
+        self.address = parse_address(address)
+        self.authkey = connection_key(self.address, authkey)
+        self.connect_timeout = connect_timeout
+
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock()
+        self._conn = None
+        self._reader = None
+        # Идентификатор запроса -> Future с его результатами
+        self._pending = {}
+        self._next_id = 0
+        self.model_id = None
+
+        self._connect()
+
+    def predict(self, sources: list, conf_threshold: float = 0.5) -> list:
+        """
+        Делает предсказание для нескольких изображений на сервере модели.
+
+        Args:
+            sources (list): Список путей к изображениям или самих изображений.
+            conf_threshold (float): Порог уверенности для предсказаний.
+
+        Returns:
+            list: Результаты предсказаний в порядке sources.
+        """
+        blocks = []
+        try:
+            pages = []
+            for source in sources:
+                image = source if isinstance(source, Image.Image) else Image.open(source)
+                pixels = np.asarray(image.convert("RGB") if image.mode != "RGB" else image)
+                block = shared_memory.SharedMemory(create=True, size=max(pixels.nbytes, 1))
+                blocks.append(block)
+                np.ndarray(pixels.shape, dtype=np.uint8, buffer=block.buf)[...] = pixels
+                pages.append((block.name, pixels.shape))
+
+            future = self._send(conf_threshold, pages)
+            return [Results(Boxes(data), orig_shape) for data, orig_shape in future.result()]
+        finally:
+            # Сервер копирует пиксели до ответа, поэтому блоки можно сразу освободить
+            for block in blocks:
+                block.close()
+                block.unlink()
+
+    def close(self) -> None:
+        """
+        Закрывает соединение с сервером модели.
+        """
+        with self._lock:
+            conn, self._conn = self._conn, None
+        if conn is not None:
+            conn.close()
+
+    def _connect(self) -> None:
+        """
+        Подключается к серверу, дожидаясь его запуска.
+        """
+        deadline = time.monotonic() + self.connect_timeout
+        while True:
+            try:
+                conn = Client(self.address, authkey=self.authkey)
+                break
+            except (FileNotFoundError, ConnectionRefusedError):
+                # Сервер начинает принимать соединения только после загрузки и прогрева модели
+                if time.monotonic() > deadline:
+                    raise ConnectionError(f"Сервер модели {self.address} недоступен")
+                time.sleep(0.5)
+
+        handshake = conn.recv()
+        self.model_id = handshake["model_id"]
+        self._conn = conn
+        self._reader = threading.Thread(target=self._read, args=(conn,), name="model-client", daemon=True)
+        self._reader.start()
+
+    def _send(self, conf_threshold: float, pages: list) -> Future:
+        """
+        Отправляет запрос серверу, при необходимости переподключаясь.
+        """
+        future = Future()
+        with self._lock:
+            if self._conn is None:
+                self._connect()
+            conn = self._conn
+            request_id = self._next_id
+            self._next_id += 1
+            self._pending[request_id] = future
+        try:
+            with self._send_lock:
+                conn.send((request_id, conf_threshold, pages))
+        except OSError as e:
+            self._fail(conn, e)
+        return future
+
+    def _read(self, conn) -> None:
+        """
+        Раздает ответы сервера ожидающим запросам.
+        """
+        while True:
+            try:
+                request_id, results, error = conn.recv()
+            except (EOFError, OSError) as e:
+                self._fail(conn, ConnectionError(f"Соединение с сервером модели потеряно: {e}"))
+                return
+            with self._lock:
+                future = self._pending.pop(request_id, None)
+            if future is None:
+                continue
+            if error is not None:
+                future.set_exception(RuntimeError(error))
+            else:
+                future.set_result(results)
+
+    def _fail(self, conn, error: Exception) -> None:
+        """
+        Завершает ошибкой все ожидающие запросы и сбрасывает соединение.
+        """
+        with self._lock:
+            if self._conn is conn:
+                self._conn = None
+            pending, self._pending = self._pending, {}
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(error)
+
+
+class ModelServer:
+    def __init__(self, model, address: str, authkey: str = DEFAULT_AUTHKEY, model_id: str = "",
+                 max_batch_size: int = 8, max_wait_ms: float = 10.0, max_queue_size: int = 256, executor=None) -> None:
+        """
+        Процесс, который владеет моделью и обслуживает HTTP-воркеры.
+
+        Страницы от всех подключенных воркеров попадают в общий движок батчинга,
+        поэтому батчи собираются поверх всех воркеров сразу. Unix-сокет
+        создается с правами 0600; адрес host:port допускается только с ключом
+        аутентификации.
+
+        Args:
+            model (YOLOModel): Загруженная модель.
+            address (str): Путь к unix-сокету или host:port.
+            authkey (str): Ключ аутентификации соединений; обязателен для host:port.
+            model_id (str): Идентификатор модели для ключей кеша результатов воркеров.
+            max_batch_size (int): Максимальный размер батча.
+            max_wait_ms (float): Максимальное время ожидания наполнения батча в миллисекундах.
+            max_queue_size (int): Максимальная длина очереди ожидающих изображений.
+            executor (TrackedExecutor, optional): Пул, в котором выполняются батчи.
+
+        Raises:
+            ValueError: Если для адреса host:port не задан ключ.
+        """
+        self.address = parse_address(address)
+        self.authkey = connection_key(self.address, authkey)
+        self.model_id = model_id
+        self.engine = BatchingEngine(
+            model,
+            max_batch_size=max_batch_size,
+            max_wait_ms=max_wait_ms,
+            max_queue_size=max_queue_size,
+            executor=executor
+        )
+        self._listener = None
+
+    def serve_forever(self) -> None:
+        """
+        Принимает соединения воркеров, каждое обслуживается в своем потоке.
+        """
+        if isinstance(self.address, str):
+            if os.path.exists(self.address):
+                # Сокет остался от предыдущего запуска
+                os.unlink(self.address)
+            # Сокет сразу создается доступным только владельцу процесса
+            umask = os.umask(0o177)
+            try:
+                self._listener = Listener(self.address, authkey=self.authkey)
+            finally:
+                os.umask(umask)
+        else:
+            self._listener = Listener(self.address, authkey=self.authkey)
+        print(f"Сервер модели слушает {self.address}")
+        try:
+            while True:
+                try:
+                    conn = self._listener.accept()
+                except OSError:
+                    break
+                threading.Thread(target=self._handle, args=(conn,), name="model-server", daemon=True).start()
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        """
+        Перестает принимать соединения и останавливает движок батчинга.
+        """
+        if self._listener is not None:
+            self._listener.close()
+            self._listener = None
+        self.engine.close()
+
+    def _handle(self, conn) -> None:
+        """
+        Обслуживает соединение одного HTTP-воркера.
+        """
+        send_lock = threading.Lock()
+
+        def reply(message) -> None:
+            with send_lock:
+                try:
+                    conn.send(message)
+                except OSError:
+                    pass
+
+        conn.send({"model_id": self.model_id})
+        while True:
+            try:
+                request_id, conf_threshold, pages = conn.recv()
+            except (EOFError, OSError):
+                break
+            try:
+                futures = [self.engine.submit(self._load_page(name, shape), conf_threshold) for name, shape in pages]
+            except Exception as e:
+                reply((request_id, None, str(e)))
+                continue
+            self._reply_when_done(request_id, futures, reply)
+        conn.close()
+
+    @staticmethod
+    def _load_page(name: str, shape: tuple) -> Image.Image:
+        """
+        Копирует страницу из разделяемой памяти воркера.
+        """
+        block = shared_memory.SharedMemory(name=name)
+        # Блоком владеет воркер: без этого трекер ресурсов сервера удалил бы его при выходе
+        resource_tracker.unregister(block._name, "shared_memory")
+        try:
+            return Image.fromarray(np.ndarray(shape, dtype=np.uint8, buffer=block.buf))
+        finally:
+            block.close()
+
+    @staticmethod
+    def _reply_when_done(request_id: int, futures: list, reply) -> None:
+        """
+        Отправляет ответ, когда готовы результаты всех страниц запроса.
+        """
+        remaining = [len(futures)]
+        lock = threading.Lock()
+
+        def on_done(_) -> None:
+            with lock:
+                remaining[0] -= 1
+                if remaining[0]:
+                    return
+            try:
+                results = [result_arrays(future.result()[0]) for future in futures]
+            except Exception as e:
+                reply((request_id, None, str(e)))
+                return
+            reply((request_id, results, None))
+
+        if not futures:
+            reply((request_id, [], None))
+        for future in futures:
+            future.add_done_callback(on_done)
+
+
+def main() -> None:
+    from model.model import load_model
+    from utils.cache import file_digest
+    from utils.executors import TrackedExecutor
+
+    parser = argparse.ArgumentParser(description="Сервер модели для нескольких HTTP-воркеров")
+    parser.add_argument("--address", default=os.getenv("MODEL_SERVER", "/tmp/layout-model.sock"),
+                        help="Путь к unix-сокету или host:port")
+    parser.add_argument("--weights", default="model/best_model.pt", help="Путь к весам модели")
+    parser.add_argument("--backend", default=os.getenv("MODEL_BACKEND", "torch"))
+    parser.add_argument("--imgsz", type=int, default=int(os.getenv("MODEL_IMGSZ", "1024")))
+    parser.add_argument("--threads", type=int, default=int(os.getenv("MODEL_THREADS", "0")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("INFERENCE_WORKERS", "1")),
+                        help="Количество потоков инференса")
+    parser.add_argument("--batch-size", type=int, default=int(os.getenv("BATCH_MAX_SIZE", "8")))
+    parser.add_argument("--max-wait-ms", type=float, default=float(os.getenv("BATCH_MAX_WAIT_MS", "10")))
+    parser.add_argument("--max-queue", type=int, default=int(os.getenv("BATCH_MAX_QUEUE", "256")))
+    parser.add_argument("--warmup-sizes", default=os.getenv("WARMUP_SIZES", "2550x3300"),
+                        help="Размеры страниц прогрева через запятую, пустая строка отключает прогрев")
+    args = parser.parse_args()
+    # Проверяем адрес до загрузки и прогрева модели
+    connection_key(parse_address(args.address), DEFAULT_AUTHKEY)
+
+    model = load_model(args.weights, backend=args.backend, imgsz=args.imgsz, threads=args.threads or None)
+    sizes = [tuple(int(side) for side in size.split("x")) for size in args.warmup_sizes.split(",") if size]
+    if sizes:
+        print(f"Прогрев модели: {model.warm_up(sizes, batch_size=args.batch_size):.2f} с")
+
+    server = ModelServer(
+        model,
+        args.address,
+        model_id=f"{file_digest(args.weights)}:{args.backend}:{args.imgsz}",
+        max_batch_size=args.batch_size,
+        max_wait_ms=args.max_wait_ms,
+        max_queue_size=args.max_queue,
+        executor=TrackedExecutor(args.workers, "inference")
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+import numpy as np
+from PIL import Image
+
+from model.detections import Detections
+
+# Рамка, подходящая к внутренней границе окна ближе чем на столько пикселей, считается обрезанной
+EDGE_MARGIN = 2
+
+
+def tile_windows(width: int, height: int, tile_size: int, overlap: int) -> list:
+    """
+    Разбивает страницу на перекрывающиеся окна.
+
+    Окна идут с шагом tile_size - overlap, последнее окно в ряду и в столбце
+    прижимается к краю страницы, поэтому вся страница покрыта окнами одного размера.
+
+    Args:
+        width (int): Ширина страницы.
+        height (int): Высота страницы.
+        tile_size (int): Сторона окна в пикселях.
+        overlap (int): Перекрытие соседних окон в пикселях.
+
+    Returns:
+        list: Окна (x0, y0, x1, y1).
+    """
+    def starts(length: int) -> list:
+        if length <= tile_size:
+            return [0]
+        stride = max(tile_size - overlap, 1)
+        positions = list(range(0, length - tile_size, stride))
+        positions.append(length - tile_size)
+        return positions
+
+    return [
+        (x, y, min(x + tile_size, width), min(y + tile_size, height))
+        for y in starts(height)
+        for x in starts(width)
+    ]
+
+
+def iter_tiles(image: Image.Image, windows: list, batch_size: int):
+    """
+    Вырезает окна страницы группами, чтобы в памяти одновременно было не больше batch_size окон.
+
+    Args:
+        image (Image.Image): Страница.
+        windows (list): Окна (x0, y0, x1, y1).
+        batch_size (int): Количество окон в группе.
+
+    Yields:
+        tuple: Окна группы и их изображения.
+    """
+    for start in range(0, len(windows), batch_size):
+        group = windows[start:start + batch_size]
+        yield group, [image.crop(window) for window in group]
+
+
+def shift_detections(detections: Detections, window: tuple, page_size: tuple) -> Detections:
+    """
+    Переводит объекты окна в координаты страницы.
+
+    Рамки, касающиеся внутренней границы окна, отбрасываются: это части объектов,
+    разрезанных окном. Целиком такие объекты видны в соседнем окне за счет
+    перекрытия или на проходе по всей странице.
+
+    Args:
+        detections (Detections): Объекты окна в его координатах.
+        window (tuple): Окно (x0, y0, x1, y1).
+        page_size (tuple): Размер страницы (ширина, высота).
+
+    Returns:
+        Detections: Объекты в координатах страницы.
+    """
+    x0, y0, x1, y1 = window
+    width, height = page_size
+    xyxy = detections.xyxy + np.array([x0, y0, x0, y0], dtype=np.float32)
+
+    keep = np.ones(len(detections), dtype=bool)
+    if x0 > 0:
+        keep &= xyxy[:, 0] > x0 + EDGE_MARGIN
+    if y0 > 0:
+        keep &= xyxy[:, 1] > y0 + EDGE_MARGIN
+    if x1 < width:
+        keep &= xyxy[:, 2] < x1 - EDGE_MARGIN
+    if y1 < height:
+        keep &= xyxy[:, 3] < y1 - EDGE_MARGIN
+    return Detections(xyxy[keep], detections.conf[keep], detections.cls[keep])
+
+
+def nms(detections: Detections, iou_threshold: float = 0.5) -> Detections:
+    """
+    Подавляет повторяющиеся рамки одного класса, оставляя самые уверенные.
+
+    Args:
+        detections (Detections): Объекты страницы.
+        iou_threshold (float): Порог IoU, выше которого рамки считаются одним объектом.
+
+    Returns:
+        Detections: Объекты без повторов.
+    """
+    if len(detections) == 0:
+        return detections
+    # Разносим классы по непересекающимся областям, чтобы одна проверка IoU учитывала класс
+    offset = detections.cls.astype(np.float32)[:, None] * (float(detections.xyxy.max()) + 1)
+    boxes = detections.xyxy + offset
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+
+    order = np.argsort(-detections.conf, kind="stable")
+    keep = []
+    while order.size:
+        best, rest = order[0], order[1:]
+        keep.append(best)
+        left = np.maximum(boxes[best, 0], boxes[rest, 0])
+        top = np.maximum(boxes[best, 1], boxes[rest, 1])
+        right = np.minimum(boxes[best, 2], boxes[rest, 2])
+        bottom = np.minimum(boxes[best, 3], boxes[rest, 3])
+        intersection = np.clip(right - left, 0, None) * np.clip(bottom - top, 0, None)
+        iou = intersection / (areas[best] + areas[rest] - intersection + 1e-9)
+        order = rest[iou <= iou_threshold]
+
+    keep = np.array(keep)
+    return Detections(detections.xyxy[keep], detections.conf[keep], detections.cls[keep])
+
+
+def merge_detections(parts: list, iou_threshold: float = 0.5) -> Detections:
+    """
+    Объединяет объекты окон и прохода по всей странице.
+
+    Args:
+        parts (list): Объекты в координатах страницы.
+        iou_threshold (float): Порог IoU для подавления повторов.
+
+    Returns:
+        Detections: Объекты страницы.
+    """
+    if not parts:
+        return Detections.from_results([])
+    merged = Detections(
+        np.concatenate([part.xyxy for part in parts]),
+        np.concatenate([part.conf for part in parts]),
+        np.concatenate([part.cls for part in parts])
+    )
+    return nms(merged, iou_threshold)
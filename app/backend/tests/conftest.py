@@ -0,0 +1,41 @@
+import os
+import sys
+import time
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+
+@pytest.fixture(scope="session")
+def service(tmp_path_factory):
+    """
+    Запускает сервис в отдельной рабочей директории и возвращает модуль main и клиент.
+
+    Нужны зависимости модели и веса model/best_model.pt; без них тесты сервиса пропускаются.
+    """
+    pytest.importorskip("torch")
+    pytest.importorskip("doclayout_yolo")
+    weights = os.path.join(BACKEND_DIR, "model", "best_model.pt")
+    if not os.path.exists(weights):
+        pytest.skip("Нет весов модели model/best_model.pt")
+    from fastapi.testclient import TestClient
+
+    # Сервис хранит данные по относительным путям, поэтому запускаем его во временной директории
+    workdir = tmp_path_factory.mktemp("service")
+    os.makedirs(workdir / "model")
+    os.symlink(weights, workdir / "model" / "best_model.pt")
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    os.environ.setdefault("WARMUP_RUNS", "0")
+    try:
+        import main
+        with TestClient(main.app) as client:
+            while main.startup["status"] == "starting":
+                time.sleep(0.05)
+            if main.startup["status"] != "ready":
+                pytest.fail(f"Сервис не запустился: {main.startup['error']}")
+            yield main, client
+    finally:
+        os.chdir(cwd)
@@ -0,0 +1,50 @@
+import io
+import os
+import json
+
+import pypdfium2 as pdfium
+from PIL import Image, ImageDraw
+
+from utils.file_handling import render_page, points_to_pixels
+
+
+def make_pdf() -> bytes:
+    """
+    Одностраничный PDF формата Letter (612×792 пт).
+    """
+    image = Image.new("RGB", (612, 792), "white")
+    ImageDraw.Draw(image).rectangle((72, 72, 540, 200), fill="black")
+    buffer = io.BytesIO()
+    image.save(buffer, "PDF", resolution=72)
+    return buffer.getvalue()
+
+
+def process(client, main, filename: str, content: bytes, media_type: str) -> dict:
+    response = client.post("/process/", files=[("files", (filename, content, media_type))])
+    assert response.status_code == 200, response.text
+    body = response.json()
+    json_path = os.path.join(main.JSON_DIR, body["workspace_id"], body["json_filenames"][0])
+    with open(json_path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def test_same_raster_as_image_and_pdf_page(service, tmp_path):
+    main, client = service
+    pdf = make_pdf()
+    pdf_path = tmp_path / "page.pdf"
+    pdf_path.write_bytes(pdf)
+
+    # PNG, совпадающий по пикселям со страницей PDF в том виде, в каком ее рендерит сервис
+    document = pdfium.PdfDocument(str(pdf_path))
+    image, _, points = render_page(document[0], main.RENDER_FIXED_DPI, main.RENDER_MAX_SIDE)
+    document.close()
+    png = io.BytesIO()
+    image.save(png, "PNG")
+
+    from_image = process(client, main, "page.png", png.getvalue(), "image/png")
+    from_pdf = process(client, main, "page.pdf", pdf, "application/pdf")
+
+    # Изображение размечается в своих пикселях, страница PDF — в координатах ANNOTATION_DPI
+    assert (from_image["image_width"], from_image["image_height"]) == image.size
+    width, height = points_to_pixels(points, main.ANNOTATION_DPI)
+    assert (from_pdf["image_width"], from_pdf["image_height"]) == (width, height)
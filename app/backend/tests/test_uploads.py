@@ -0,0 +1,49 @@
+import io
+import os
+import asyncio
+
+import pytest
+from fastapi import UploadFile, HTTPException
+
+from utils.file_handling import save_upload
+
+
+def upload(filename: str, content: bytes = b"data") -> UploadFile:
+    return UploadFile(io.BytesIO(content), filename=filename)
+
+
+def save(file: UploadFile, upload_dir) -> str:
+    path, _ = asyncio.run(save_upload(file, str(upload_dir)))
+    return path
+
+
+@pytest.mark.parametrize("filename", ["../../escaped.png", "..\\..\\escaped.png", "/tmp/escaped.png"])
+def test_traversal_name_stays_in_upload_dir(tmp_path, filename):
+    upload_dir = tmp_path / "workspace" / "uploads"
+    upload_dir.mkdir(parents=True)
+
+    path = save(upload(filename), upload_dir)
+
+    assert os.path.dirname(path) == str(upload_dir)
+    assert os.path.basename(path) == "escaped.png"
+    assert os.listdir(tmp_path) == ["workspace"]
+
+
+def test_duplicate_names_do_not_overwrite(tmp_path):
+    first = save(upload("page.png", b"first"), tmp_path)
+    second = save(upload("dir/page.png", b"second"), tmp_path)
+
+    assert os.path.basename(first) == "page.png"
+    assert os.path.basename(second) == "page_1.png"
+    with open(first, "rb") as f:
+        assert f.read() == b"first"
+    with open(second, "rb") as f:
+        assert f.read() == b"second"
+
+
+@pytest.mark.parametrize("filename", ["", "..", "dir/"])
+def test_empty_name_is_rejected(tmp_path, filename):
+    with pytest.raises(HTTPException) as error:
+        save(upload(filename), tmp_path)
+    assert error.value.status_code == 400
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,317 @@
+import os
+import json
+import shutil
+import hashlib
+import zipfile
+import threading
+import zlib
+
+# Форматы, которые уже сжаты: повторное сжатие только тратит процессор
+STORED_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp")
+# Количество блокировок сборки архивов: архив получает блокировку по хешу пути,
+# поэтому их число не растет с количеством рабочих пространств
+ARCHIVE_LOCKS = 64
+
+
+class _StreamBuffer:
+    """
+    Несмещаемый поток для ZipFile: накапливает записанные байты до выдачи клиенту.
+    """
+    def __init__(self) -> None:
+        self._chunks = []
+
+    def write(self, data: bytes) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self) -> None:
+        pass
+
+    def take(self) -> bytes:
+        """
+        Забирает накопленные байты.
+        """
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def list_files(src_dir: str, extension) -> list:
+    """
+    Возвращает отсортированный список файлов директории с указанным расширением.
+
+    Args:
+        src_dir (str): Директория с файлами.
+        extension (str | tuple): Расширение или кортеж расширений файлов.
+
+    Returns:
+        list: Имена файлов.
+    """
+    return sorted(file for file in os.listdir(src_dir) if file.endswith(extension))
+
+
+def add_file(zipf: zipfile.ZipFile, src_dir: str, file: str, chunk_size: int = 1024 * 1024) -> bool:
+    """
+    Добавляет файл в архив, копируя его блоками.
+
+    Args:
+        zipf (zipfile.ZipFile): Открытый на запись архив.
+        src_dir (str): Директория с файлом.
+        file (str): Имя файла.
+        chunk_size (int): Размер блока чтения в байтах.
+
+    Returns:
+        bool: False, если файл был удален до архивации.
+    """
+    try:
+        for _ in _write_file(zipf, src_dir, file, chunk_size):
+            pass
+    except FileNotFoundError:
+        return False
+    return True
+
+def _write_file(zipf: zipfile.ZipFile, src_dir: str, file: str, chunk_size: int):
+    """
+    Записывает файл в архив, уступая управление после каждого блока.
+    """
+    file_path = os.path.join(src_dir, file)
+    info = zipfile.ZipInfo.from_file(file_path, arcname=file)
+    if file.lower().endswith(STORED_EXTENSIONS):
+        info.compress_type = zipfile.ZIP_STORED
+    else:
+        info.compress_type = zipfile.ZIP_DEFLATED
+
+    with open(file_path, "rb") as src, zipf.open(info, "w") as dst:
+        while chunk := src.read(chunk_size):
+            dst.write(chunk)
+            yield
+
+def iter_zip(src_dir: str, files: list, chunk_size: int = 1024 * 1024):
+    """
+    Формирует ZIP-архив по частям, не сохраняя его на диск.
+
+    Архив пишется в несмещаемый поток: размеры и контрольные суммы записей
+    передаются в дескрипторах данных после содержимого, поэтому каждый файл
+    читается один раз блоками по chunk_size и память не зависит от размера архива.
+    Уже сжатые изображения сохраняются без сжатия.
+
+    Args:
+        src_dir (str): Директория с файлами.
+        files (list): Имена файлов, попадающих в архив.
+        chunk_size (int): Размер блока чтения в байтах.
+
+    Yields:
+        bytes: Очередная часть архива.
+    """
+    buffer = _StreamBuffer()
+    with zipfile.ZipFile(buffer, "w") as zipf:
+        for file in files:
+            try:
+                for _ in _write_file(zipf, src_dir, file, chunk_size):
+                    if data := buffer.take():
+                        yield data
+            except FileNotFoundError:
+                # Файл удален между составлением списка и архивацией
+                continue
+            if data := buffer.take():
+                yield data
+    # Центральный каталог архива
+    yield buffer.take()
+
+
+def manifest_entries(src_dir: str, files: list) -> list:
+    """
+    Описывает файлы результата: имя, размер и время изменения.
+
+    Args:
+        src_dir (str): Директория с файлами.
+        files (list): Имена файлов.
+
+    Returns:
+        list: Тройки [имя, размер, время изменения в наносекундах].
+    """
+    entries = []
+    for file in files:
+        try:
+            stat = os.stat(os.path.join(src_dir, file))
+        except FileNotFoundError:
+            continue
+        entries.append([file, stat.st_size, stat.st_mtime_ns])
+    return entries
+
+def manifest_etag(entries: list) -> str:
+    """
+    Вычисляет ETag набора файлов по его манифесту.
+
+    Args:
+        entries (list): Манифест набора файлов.
+
+    Returns:
+        str: ETag в кавычках.
+    """
+    return '"' + hashlib.sha256(json.dumps(entries).encode()).hexdigest()[:32] + '"'
+
+
+class ArchiveCache:
+    def __init__(self) -> None:
+        """
+        Кеш собранных ZIP-архивов с манифестом входящих в них файлов.
+
+        Рядом с архивом хранится манифест (имя, размер и время изменения каждого файла).
+        Если набор файлов не изменился, архив отдается как есть. Если файлы только
+        добавлялись, в архив дописываются лишь новые записи: на месте, если архив
+        сейчас никто не скачивает, иначе в копию, чтобы не менять байты открытой
+        версии. Иначе архив собирается заново.
+        """
+        self._lock = threading.Lock()
+        # Блокировки сборки архивов, выбираемые по хешу пути
+        self._locks = [threading.Lock() for _ in range(ARCHIVE_LOCKS)]
+        # Путь к архиву -> количество открытых скачиваний; пути без скачиваний удаляются
+        self._readers = {}
+        self.hits = 0
+        self.appends = 0
+        self.rebuilds = 0
+
+    def etag(self, src_dir: str, extension) -> str:
+        """
+        Вычисляет ETag текущего набора файлов без сборки архива.
+
+        Args:
+            src_dir (str): Директория с файлами.
+            extension (str | tuple): Расширение или кортеж расширений файлов, попадающих в архив.
+
+        Returns:
+            str: ETag в кавычках.
+        """
+        return manifest_etag(manifest_entries(src_dir, list_files(src_dir, extension)))
+
+    def ensure(self, src_dir: str, extension, archive_path: str) -> str:
+        """
+        Приводит архив в соответствие с текущим набором файлов.
+
+        Новые записи дописываются в архив на месте. Если архив в это время
+        скачивается, новая версия записывается во временный файл и атомарно
+        заменяет старую, поэтому открытые скачивания дочитывают прежнюю версию.
+
+        Args:
+            src_dir (str): Директория с файлами.
+            extension (str | tuple): Расширение или кортеж расширений файлов, попадающих в архив.
+            archive_path (str): Путь к архиву.
+
+        Returns:
+            str: ETag собранного архива.
+        """
+        with self._archive_lock(archive_path):
+            return self._build(src_dir, extension, archive_path)
+
+    def open(self, src_dir: str, extension, archive_path: str) -> tuple:
+        """
+        Приводит архив в соответствие с текущим набором файлов и открывает его на чтение.
+
+        Архив открывается под той же блокировкой, что и сборка, поэтому открытый
+        файл — ровно та версия, которой соответствует ETag, даже если следующая
+        сборка заменит архив до окончания скачивания.
+
+        Args:
+            src_dir (str): Директория с файлами.
+            extension (str | tuple): Расширение или кортеж расширений файлов, попадающих в архив.
+            archive_path (str): Путь к архиву.
+
+        Returns:
+            tuple: Открытый на чтение файл архива и его ETag. После скачивания
+                файл нужно закрыть вызовом release.
+        """
+        with self._archive_lock(archive_path):
+            etag = self._build(src_dir, extension, archive_path)
+            file = open(archive_path, "rb")
+            with self._lock:
+                self._readers[archive_path] = self._readers.get(archive_path, 0) + 1
+            return file, etag
+
+    def release(self, archive_path: str, file) -> None:
+        """
+        Закрывает файл архива, открытый методом open.
+
+        Args:
+            archive_path (str): Путь к архиву.
+            file: Открытый файл архива.
+        """
+        file.close()
+        with self._lock:
+            count = self._readers.get(archive_path, 0) - 1
+            if count > 0:
+                self._readers[archive_path] = count
+            else:
+                self._readers.pop(archive_path, None)
+
+    def _build(self, src_dir: str, extension, archive_path: str) -> str:
+        """
+        Собирает или дописывает архив. Вызывается под блокировкой архива.
+        """
+        entries = manifest_entries(src_dir, list_files(src_dir, extension))
+        manifest_path = archive_path + ".manifest.json"
+        previous = self._load_manifest(manifest_path) if os.path.exists(archive_path) else None
+
+        if previous == entries:
+            with self._lock:
+                self.hits += 1
+            return manifest_etag(entries)
+
+        tmp_path = archive_path + ".tmp"
+        target = tmp_path
+        current = {tuple(entry) for entry in entries}
+        # Дописывать можно, только если все файлы старого архива остались без изменений
+        if previous is not None and all(tuple(entry) in current for entry in previous):
+            with self._lock:
+                reading = archive_path in self._readers
+            if reading:
+                # Дописывание перезаписывает центральный каталог, который дочитывают открытые скачивания
+                shutil.copyfile(archive_path, tmp_path)
+            else:
+                # Без манифеста недописанный архив будет собран заново
+                os.unlink(manifest_path)
+                target = archive_path
+            mode = "a"
+            archived = {tuple(entry) for entry in previous}
+            new_entries = [entry for entry in entries if tuple(entry) not in archived]
+            with self._lock:
+                self.appends += 1
+        else:
+            mode = "w"
+            new_entries = entries
+            with self._lock:
+                self.rebuilds += 1
+
+        missing = set()
+        with zipfile.ZipFile(target, mode) as zipf:
+            for entry in new_entries:
+                if not add_file(zipf, src_dir, entry[0]):
+                    missing.add(entry[0])
+        entries = [entry for entry in entries if entry[0] not in missing]
+
+        if target == tmp_path:
+            os.replace(tmp_path, archive_path)
+        with open(manifest_path, "w", encoding="utf-8") as f:
+            json.dump(entries, f)
+        return manifest_etag(entries)
+
+    def stats(self) -> dict:
+        """
+        Возвращает статистику кеша архивов.
+
+        Returns:
+            dict: Количество отдач без изменений, дописываний и полных пересборок.
+        """
+        with self._lock:
+            return {"hits": self.hits, "appends": self.appends, "rebuilds": self.rebuilds}
+
+    def _archive_lock(self, archive_path: str) -> threading.Lock:
+        return self._locks[zlib.crc32(archive_path.encode()) % len(self._locks)]
+
+    @staticmethod
+    def _load_manifest(manifest_path: str):
+        try:
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
@@ -0,0 +1,330 @@
+import os
+import json
+import shutil
+import hashlib
+import threading
+from collections import OrderedDict
+
+def file_digest(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """
+    Вычисляет SHA-256 содержимого файла.
+
+    Args:
+        path (str): Путь к файлу.
+        chunk_size (int): Размер блока чтения в байтах.
+
+    Returns:
+        str: Хеш содержимого в шестнадцатеричном виде.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def image_digest(image) -> str:
+    """
+    Вычисляет SHA-256 декодированного изображения с учетом его режима и размеров.
+
+    Args:
+        image (Image.Image): Изображение.
+
+    Returns:
+        str: Хеш изображения в шестнадцатеричном виде.
+    """
+    digest = hashlib.sha256(f"{image.mode}:{image.size}".encode())
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+
+class ResultCache:
+    def __init__(self, cache_dir: str, model_id: str, max_disk_bytes: int, max_memory_bytes: int,
+                 max_memory_entries: int = 10000) -> None:
+        """
+        Кеш результатов обработки, адресуемый по содержимому.
+
+        Ключ записи строится из хеша содержимого (загруженного файла или страницы),
+        идентификатора весов модели и порога уверенности. Записи страниц хранят
+        JSON-аннотацию и аннотированное изображение, записи документов — список
+        ключей их страниц. Размер кеша ограничен и на диске, и в памяти,
+        вытесняются давно не использованные записи. Размер записи — JSON вместе
+        с изображением, а количество записей в памяти ограничено отдельно, чтобы
+        мелкие записи без изображений не копились без предела.
+
+        Args:
+            cache_dir (str): Директория для хранения кеша на диске.
+            model_id (str): Идентификатор весов модели.
+            max_disk_bytes (int): Максимальный размер кеша на диске в байтах.
+            max_memory_bytes (int): Максимальный размер кеша в памяти в байтах.
+            max_memory_entries (int): Максимальное количество записей в памяти.
+        """
+        self.cache_dir = cache_dir
+        self.model_id = model_id
+        self.max_disk_bytes = max_disk_bytes
+        self.max_memory_bytes = max_memory_bytes
+        self.max_memory_entries = max_memory_entries
+
+        self._lock = threading.Lock()
+        # Ключ -> размер записи на диске, в порядке последнего использования
+        self._disk = OrderedDict()
+        self._disk_bytes = 0
+        # Ключ -> (запись, изображение, размер), в порядке последнего использования
+        self._memory = OrderedDict()
+        self._memory_bytes = 0
+
+        self.hits = {"page": 0, "document": 0}
+        self.misses = {"page": 0, "document": 0}
+
+        os.makedirs(cache_dir, exist_ok=True)
+        self._load_index()
+
+    def key(self, content_hash: str, conf_threshold: float, variant: str = "") -> str:
+        """
+        Формирует ключ записи кеша.
+
+        Args:
+            content_hash (str): Хеш содержимого файла или страницы.
+            conf_threshold (float): Порог уверенности для предсказаний.
+            variant (str): Вариант результатов, например параметры отрисовки изображения.
+
+        Returns:
+            str: Ключ записи.
+        """
+        return hashlib.sha256(f"{content_hash}:{self.model_id}:{conf_threshold}:{variant}".encode()).hexdigest()
+
+    def get_page(self, key: str):
+        """
+        Возвращает кешированный результат страницы.
+
+        Args:
+            key (str): Ключ записи.
+
+        Returns:
+            tuple | None: JSON-аннотация, байты аннотированного изображения и объекты
+                страницы (список строк [x1, y1, x2, y2, conf, cls] или None) или None.
+        """
+        found = self._get(key)
+        self._count("page", found is not None)
+        if found is None:
+            return None
+        entry, image = found
+        return entry["annotation"], image, entry.get("detections")
+
+    def put_page(self, key: str, annotation: dict, image_path: str, detections=None) -> None:
+        """
+        Сохраняет результат страницы в кеш.
+
+        Args:
+            key (str): Ключ записи.
+            annotation (dict): JSON-аннотация страницы.
+            image_path (str | None): Путь к аннотированному изображению или None, если его нет.
+            detections (np.ndarray, optional): Объекты страницы (N, 6) вместе с уверенностью,
+                которой нет в JSON-аннотации.
+        """
+        image = None
+        if image_path is not None:
+            with open(image_path, "rb") as f:
+                image = f.read()
+        entry = {"annotation": annotation}
+        if image is not None:
+            # По размеру при чтении отличаем целое изображение от удаленного или недописанного
+            entry["image_size"] = len(image)
+        if detections is not None:
+            entry["detections"] = detections.tolist()
+        self._put(key, entry, image)
+
+    def get_document(self, key: str):
+        """
+        Возвращает страницы кешированного документа, если все они есть в кеше.
+
+        Args:
+            key (str): Ключ записи документа.
+
+        Returns:
+            list | None: Ключи страниц в порядке следования или None.
+        """
+        found = self._get(key)
+        pages = found[0]["pages"] if found is not None else None
+        # Документ полезен, только если в кеше остались все его страницы
+        if pages is not None and not all(self._contains(page_key) for page_key in pages):
+            pages = None
+        self._count("document", pages is not None)
+        return pages
+
+    def put_document(self, key: str, pages: list) -> None:
+        """
+        Сохраняет список страниц документа в кеш.
+
+        Args:
+            key (str): Ключ записи документа.
+            pages (list): Ключи страниц в порядке следования.
+        """
+        self._put(key, {"pages": list(pages)}, None)
+
+    def stats(self) -> dict:
+        """
+        Возвращает статистику кеша.
+
+        Returns:
+            dict: Счетчики попаданий и промахов, размеры кеша на диске и в памяти.
+        """
+        with self._lock:
+            return {
+                "hits": dict(self.hits),
+                "misses": dict(self.misses),
+                "disk_entries": len(self._disk),
+                "disk_bytes": self._disk_bytes,
+                "max_disk_bytes": self.max_disk_bytes,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "max_memory_bytes": self.max_memory_bytes,
+                "max_memory_entries": self.max_memory_entries,
+            }
+
+    def clear(self) -> None:
+        """
+        Полностью очищает кеш.
+        """
+        with self._lock:
+            self._disk.clear()
+            self._memory.clear()
+            self._disk_bytes = 0
+            self._memory_bytes = 0
+            shutil.rmtree(self.cache_dir, ignore_errors=True)
+            os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _paths(self, key: str) -> tuple:
+        """
+        Возвращает пути к файлам записи на диске.
+        """
+        directory = os.path.join(self.cache_dir, key[:2])
+        return os.path.join(directory, f"{key}.json"), os.path.join(directory, f"{key}.bin")
+
+    def _count(self, kind: str, hit: bool) -> None:
+        with self._lock:
+            if hit:
+                self.hits[kind] += 1
+            else:
+                self.misses[kind] += 1
+
+    def _contains(self, key: str) -> bool:
+        with self._lock:
+            return key in self._disk or key in self._memory
+
+    def _load_index(self) -> None:
+        """
+        Восстанавливает индекс кеша на диске, упорядочивая записи по времени использования.
+        """
+        entries = []
+        for directory, _, files in os.walk(self.cache_dir):
+            for file in files:
+                if not file.endswith(".json"):
+                    continue
+                key = file[:-len(".json")]
+                meta_path, image_path = self._paths(key)
+                size = os.path.getsize(meta_path)
+                if os.path.exists(image_path):
+                    size += os.path.getsize(image_path)
+                entries.append((os.path.getmtime(meta_path), key, size))
+
+        for _, key, size in sorted(entries):
+            self._disk[key] = size
+            self._disk_bytes += size
+        with self._lock:
+            self._evict_disk()
+
+    def _get(self, key: str):
+        """
+        Ищет запись сначала в памяти, затем на диске.
+
+        Файлы записи читаются без блокировки, поэтому запись, вытесненная или
+        перезаписанная во время чтения, считается промахом.
+        """
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                if key in self._disk:
+                    self._disk.move_to_end(key)
+                entry, image, _ = self._memory[key]
+                return entry, image
+            if key not in self._disk:
+                return None
+            self._disk.move_to_end(key)
+
+        meta_path, image_path = self._paths(key)
+        try:
+            with open(meta_path, "r", encoding="utf-8") as f:
+                data = f.read()
+            entry = json.loads(data)
+            image = None
+            if os.path.exists(image_path):
+                with open(image_path, "rb") as f:
+                    image = f.read()
+            # Обновляем время использования, чтобы порядок вытеснения пережил перезапуск
+            os.utime(meta_path)
+        except (OSError, ValueError):
+            return None
+        expected = entry.get("image_size")
+        if expected is not None and (image is None or len(image) != expected):
+            # Запись вытеснили или перезаписали во время чтения
+            return None
+
+        size = len(data) + (len(image) if image is not None else 0)
+        with self._lock:
+            if key not in self._disk:
+                # Запись вытеснена во время чтения: файлы могли быть прочитаны частично
+                return None
+            self._remember(key, entry, image, size)
+        return entry, image
+
+    def _put(self, key: str, entry: dict, image) -> None:
+        """
+        Записывает запись на диск и в память.
+        """
+        meta_path, image_path = self._paths(key)
+        os.makedirs(os.path.dirname(meta_path), exist_ok=True)
+        size = 0
+        if image is not None:
+            with open(image_path, "wb") as f:
+                f.write(image)
+            size += len(image)
+        # JSON пишем последним: по нему запись считается существующей
+        data = json.dumps(entry, ensure_ascii=False)
+        with open(meta_path, "w", encoding="utf-8") as f:
+            f.write(data)
+        size += len(data)
+
+        with self._lock:
+            self._disk_bytes += size - self._disk.pop(key, 0)
+            self._disk[key] = size
+            self._evict_disk()
+            self._remember(key, entry, image, size)
+
+    def _remember(self, key: str, entry: dict, image, size: int) -> None:
+        """
+        Помещает запись в кеш в памяти. Вызывается под блокировкой.
+
+        Args:
+            size (int): Размер записи: сериализованный JSON и изображение.
+        """
+        if key in self._memory:
+            _, _, old_size = self._memory.pop(key)
+            self._memory_bytes -= old_size
+        if size > self.max_memory_bytes or self.max_memory_entries <= 0:
+            return
+        self._memory[key] = (entry, image, size)
+        self._memory_bytes += size
+        while self._memory_bytes > self.max_memory_bytes or len(self._memory) > self.max_memory_entries:
+            _, (_, _, old_size) = self._memory.popitem(last=False)
+            self._memory_bytes -= old_size
+
+    def _evict_disk(self) -> None:
+        """
+        Удаляет с диска давно не использованные записи сверх лимита. Вызывается под блокировкой.
+        """
+        while self._disk_bytes > self.max_disk_bytes and self._disk:
+            key, size = self._disk.popitem(last=False)
+            self._disk_bytes -= size
+            for path in self._paths(key):
+                if os.path.exists(path):
+                    os.unlink(path)
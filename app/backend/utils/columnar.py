@@ -0,0 +1,265 @@
+import os
+import json
+import mmap
+import struct
+import argparse
+
+import numpy as np
+
+from model.detections import Detections
+
+# Сигнатура и версия формата
+MAGIC = b"LAYOUTC1"
+# Столбцы файла: имя и тип элементов (little-endian)
+COLUMNS = [
+    ("page", "<u4"),
+    ("cls", "u1"),
+    ("x1", "<f4"),
+    ("y1", "<f4"),
+    ("x2", "<f4"),
+    ("y2", "<f4"),
+    ("conf", "<f4"),
+]
+# Выравнивание начала каждого столбца, чтобы массивы читались из файла без копирования
+_ALIGN = 8
+
+
+def _aligned(offset: int) -> int:
+    return (offset + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+class ColumnarWriter:
+    def __init__(self, path: str, class_names: list) -> None:
+        """
+        Запись аннотаций документа или группы документов в один колоночный файл.
+
+        Файл состоит из заголовка и столбцов page, cls, x1, y1, x2, y2, conf,
+        каждый из которых — непрерывный типизированный массив. Строки упорядочены
+        по страницам, а индекс страниц в заголовке хранит для каждой страницы
+        имя, размеры и диапазон ее строк.
+
+        Args:
+            path (str): Путь к файлу.
+            class_names (list): Имена классов по их номерам.
+        """
+        self.path = path
+        self.class_names = list(class_names)
+        self._pages = []
+        self._chunks = []
+        self._rows = 0
+
+    def add_page(self, name: str, height: int, width: int, detections: Detections, image_path: str = None) -> None:
+        """
+        Добавляет страницу.
+
+        Args:
+            name (str): Имя страницы.
+            height (int): Высота изображения страницы.
+            width (int): Ширина изображения страницы.
+            detections (Detections): Объекты страницы.
+            image_path (str, optional): Путь к изображению для JSON-аннотации. По умолчанию — имя страницы.
+        """
+        count = len(detections)
+        self._pages.append({
+            "name": name,
+            "image_path": str(image_path if image_path is not None else name),
+            "height": int(height),
+            "width": int(width),
+            "start": self._rows,
+            "count": count,
+        })
+        self._chunks.append((len(self._pages) - 1, detections))
+        self._rows += count
+
+    def add_annotation(self, name: str, annotation: dict, conf: float = float("nan")) -> None:
+        """
+        Добавляет страницу по ее JSON-аннотации.
+
+        Args:
+            name (str): Имя страницы.
+            annotation (dict): JSON-аннотация страницы.
+            conf (float): Уверенность, присваиваемая всем рамкам.
+        """
+        self.add_page(
+            name,
+            annotation["image_height"],
+            annotation["image_width"],
+            Detections.from_annotation(annotation, self.class_names, conf),
+            annotation.get("image_path")
+        )
+
+    def close(self) -> None:
+        """
+        Записывает файл. Файл появляется атомарно: читатели не видят недописанную версию.
+        """
+        columns = {name: [] for name, _ in COLUMNS}
+        for page_id, detections in self._chunks:
+            columns["page"].append(np.full(len(detections), page_id))
+            columns["cls"].append(detections.cls)
+            for i, name in enumerate(("x1", "y1", "x2", "y2")):
+                columns[name].append(detections.xyxy[:, i])
+            columns["conf"].append(detections.conf)
+
+        arrays, layout, offset = [], [], 0
+        for name, dtype in COLUMNS:
+            array = np.concatenate(columns[name]).astype(dtype) if columns[name] else np.empty(0, dtype=dtype)
+            arrays.append((offset, array))
+            layout.append({"name": name, "dtype": dtype, "offset": offset})
+            offset = _aligned(offset + array.nbytes)
+
+        header = json.dumps({
+            "class_names": self.class_names,
+            "rows": self._rows,
+            "columns": layout,
+            "pages": self._pages,
+        }, ensure_ascii=False).encode("utf-8")
+        data_start = _aligned(len(MAGIC) + 8 + len(header))
+
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(MAGIC)
+            f.write(struct.pack("<Q", len(header)))
+            f.write(header)
+            for column_offset, array in arrays:
+                f.write(b"\0" * (data_start + column_offset - f.tell()))
+                f.write(array.tobytes())
+        os.replace(tmp_path, self.path)
+
+    def __enter__(self) -> "ColumnarWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+
+
+class ColumnarReader:
+    def __init__(self, path: str) -> None:
+        """
+        Чтение колоночного файла аннотаций.
+
+        Файл отображается в память, столбцы читаются без разбора и копирования,
+        объекты одной страницы — срезы столбцов по индексу страниц.
+
+        Args:
+            path (str): Путь к файлу.
+
+        Raises:
+            ValueError: Если файл не является колоночным файлом аннотаций.
+        """
+        self.path = path
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+        if self._mmap is None or self._mmap[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f"{path} не является колоночным файлом аннотаций")
+
+        header_length, = struct.unpack_from("<Q", self._mmap, len(MAGIC))
+        header_start = len(MAGIC) + 8
+        header = json.loads(self._mmap[header_start:header_start + header_length].decode("utf-8"))
+        data_start = _aligned(header_start + header_length)
+
+        self.class_names = header["class_names"]
+        self.pages = header["pages"]
+        self._index = {page["name"]: i for i, page in enumerate(self.pages)}
+        self.columns = {
+            column["name"]: np.frombuffer(
+                self._mmap, dtype=column["dtype"], count=header["rows"], offset=data_start + column["offset"]
+            )
+            for column in header["columns"]
+        }
+
+    def __len__(self) -> int:
+        return len(self.pages)
+
+    def index(self, name: str) -> int:
+        """
+        Возвращает номер страницы по имени.
+
+        Args:
+            name (str): Имя страницы.
+
+        Returns:
+            int: Номер страницы.
+
+        Raises:
+            KeyError: Если страницы нет в файле.
+        """
+        return self._index[name]
+
+    def detections(self, page_id: int) -> Detections:
+        """
+        Возвращает объекты страницы.
+
+        Args:
+            page_id (int): Номер страницы.
+
+        Returns:
+            Detections: Объекты страницы.
+        """
+        page = self.pages[page_id]
+        rows = slice(page["start"], page["start"] + page["count"])
+        xyxy = np.column_stack([self.columns[name][rows] for name in ("x1", "y1", "x2", "y2")])
+        return Detections(
+            xyxy.reshape(-1, 4), self.columns["conf"][rows].copy(), self.columns["cls"][rows].astype(np.int64)
+        )
+
+    def annotation(self, page_id: int) -> dict:
+        """
+        Формирует JSON-аннотацию страницы в том же виде, что и при обработке.
+
+        Args:
+            page_id (int): Номер страницы.
+
+        Returns:
+            dict: JSON-аннотация с координатами для каждого класса.
+        """
+        page = self.pages[page_id]
+        annotation = {
+            "image_height": page["height"],
+            "image_width": page["width"],
+            "image_path": page["image_path"],
+        }
+        groups = self.detections(page_id).by_class(self.class_names)
+        for class_name in self.class_names:
+            annotation[class_name] = groups[class_name].tolist()
+        return annotation
+
+    def close(self) -> None:
+        """
+        Освобождает отображение файла. Полученные массивы после этого использовать нельзя.
+        """
+        if getattr(self, "_mmap", None) is not None:
+            self.columns = {}
+            try:
+                self._mmap.close()
+            except BufferError:
+                # На столбцы еще есть ссылки: отображение освободится вместе с ними
+                pass
+            self._mmap = None
+
+    def __enter__(self) -> "ColumnarReader":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Выгрузка JSON-аннотаций из колоночного файла")
+    parser.add_argument("path", help="Путь к колоночному файлу")
+    parser.add_argument("--output", required=True, help="Директория для JSON-аннотаций")
+    args = parser.parse_args()
+
+    os.makedirs(args.output, exist_ok=True)
+    with ColumnarReader(args.path) as reader:
+        for page_id, page in enumerate(reader.pages):
+            json_path = os.path.join(args.output, f"{os.path.splitext(page['name'])[0]}.json")
+            with open(json_path, "w", encoding="utf-8") as f:
+                json.dump(reader.annotation(page_id), f, ensure_ascii=False, indent=4)
+    print(f"Выгружено страниц: {len(reader)}")
+
+
+if __name__ == "__main__":
+    main()
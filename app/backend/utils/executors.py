@@ -0,0 +1,154 @@
+import asyncio
+import functools
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+
+from utils import profiling
+
+
+class TrackedExecutor:
+    def __init__(self, max_workers: int, name: str) -> None:
+        """
+        Пул потоков, отслеживающий глубину своей очереди.
+
+        Args:
+            max_workers (int): Количество потоков в пуле.
+            name (str): Имя пула, используется как префикс имен потоков.
+        """
+        self.name = name
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._active = 0
+        self._completed = 0
+
+    def submit(self, fn, *args, **kwargs) -> Future:
+        """
+        Ставит задачу в пул.
+
+        Args:
+            fn: Вызываемый объект.
+            *args: Позиционные аргументы.
+            **kwargs: Именованные аргументы.
+
+        Returns:
+            Future: Future с результатом задачи.
+        """
+        with self._lock:
+            self._pending += 1
+        # Задача выполняется в контексте вызывающего, чтобы ей были видны метки метрик и профилировщик запроса
+        context = contextvars.copy_context()
+        future = self._executor.submit(context.run, self._run, fn, *args, **kwargs)
+        future.add_done_callback(self._on_done)
+        return future
+
+    def _on_done(self, future: Future) -> None:
+        """
+        Снимает с учета задачи, отмененные до начала выполнения.
+        """
+        if future.cancelled():
+            with self._lock:
+                self._pending -= 1
+
+    def _run(self, fn, *args, **kwargs):
+        """
+        Обертка задачи, обновляющая счетчики очереди.
+        """
+        with self._lock:
+            self._pending -= 1
+            self._active += 1
+        try:
+            with profiling.track():
+                return fn(*args, **kwargs)
+        finally:
+            with self._lock:
+                self._active -= 1
+                self._completed += 1
+
+    def stats(self) -> dict:
+        """
+        Возвращает состояние пула.
+
+        Returns:
+            dict: Размер пула, количество ожидающих, выполняющихся и завершенных задач.
+        """
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "queue_depth": self._pending,
+                "active": self._active,
+                "completed": self._completed,
+            }
+
+    def shutdown(self, wait: bool = True) -> None:
+        """
+        Останавливает пул.
+
+        Args:
+            wait (bool): Дождаться ли завершения поставленных задач.
+        """
+        self._executor.shutdown(wait=wait)
+
+
+class ExecutionLayer:
+    def __init__(self, io_workers: int = 8, inference_workers: int = 1) -> None:
+        """
+        Слой выполнения блокирующей работы вне цикла событий asyncio.
+
+        Args:
+            io_workers (int): Количество потоков для ввода-вывода и работы с PIL.
+            inference_workers (int): Количество одновременно выполняемых батчей модели.
+        """
+        # Пул для чтения/записи файлов, рендеринга PDF и отрисовки аннотаций
+        self.io = TrackedExecutor(io_workers, "io")
+        # Выделенный пул для прогонов модели
+        self.inference = TrackedExecutor(inference_workers, "inference")
+
+    async def run_io(self, fn, *args, **kwargs):
+        """
+        Выполняет блокирующую функцию в пуле ввода-вывода.
+
+        Args:
+            fn: Вызываемый объект.
+            *args: Позиционные аргументы.
+            **kwargs: Именованные аргументы.
+
+        Returns:
+            Результат вызова fn.
+        """
+        return await asyncio.wrap_future(self.io.submit(functools.partial(fn, *args, **kwargs)))
+
+    async def run_inference(self, fn, *args, **kwargs):
+        """
+        Выполняет функцию в пуле инференса.
+
+        Args:
+            fn: Вызываемый объект.
+            *args: Позиционные аргументы.
+            **kwargs: Именованные аргументы.
+
+        Returns:
+            Результат вызова fn.
+        """
+        return await asyncio.wrap_future(self.inference.submit(functools.partial(fn, *args, **kwargs)))
+
+    def stats(self) -> dict:
+        """
+        Возвращает состояние всех пулов для планирования мощностей.
+
+        Returns:
+            dict: Статистика пулов ввода-вывода и инференса.
+        """
+        return {"io": self.io.stats(), "inference": self.inference.stats()}
+
+    def shutdown(self, wait: bool = True) -> None:
+        """
+        Останавливает все пулы.
+
+        Args:
+            wait (bool): Дождаться ли завершения поставленных задач.
+        """
+        self.io.shutdown(wait=wait)
+        self.inference.shutdown(wait=wait)
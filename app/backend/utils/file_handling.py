@@ -1,87 +1,558 @@
+import io
 import os
+import math
+import queue
 import shutil
-from zipfile import ZipFile
+import asyncio
+import hashlib
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from zipfile import ZipFile, BadZipFile
 
 import pypdfium2 as pdfium
-from fastapi import UploadFile
+from PIL import Image
+from fastapi import UploadFile, HTTPException
 
-async def save_upload(file: UploadFile, upload_dir: str) -> str:
+# pdfium не потокобезопасен: все обращения к нему из потоков сервиса сериализуются
+PDFIUM_LOCK = threading.Lock()
+
+# Общий пул процессов для параллельного рендеринга PDF
+_render_pool = None
+_render_pool_lock = threading.Lock()
+
+def get_render_pool(workers: int) -> ProcessPoolExecutor:
+    """
+    Возвращает общий пул процессов для рендеринга, создавая его при первом обращении.
+
+    Args:
+        workers (int): Количество процессов в пуле.
+
+    Returns:
+        ProcessPoolExecutor: Пул процессов.
+    """
+    global _render_pool
+    with _render_pool_lock:
+        if _render_pool is None:
+            # spawn не наследует потоки и состояние torch родительского процесса
+            _render_pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        return _render_pool
+
+def shutdown_render_pool() -> None:
+    """
+    Останавливает общий пул процессов рендеринга.
+    """
+    global _render_pool
+    with _render_pool_lock:
+        if _render_pool is not None:
+            _render_pool.shutdown(cancel_futures=True)
+            _render_pool = None
+
+def render_page(page, dpi: float, max_side: int = 0, side_limit: int = 0) -> tuple:
+    """
+    Рендерит страницу PDF с фиксированным разрешением или по длинной стороне.
+
+    Args:
+        page (PdfPage): Страница документа.
+        dpi (float): Разрешение в точках на дюйм, если max_side не задан.
+        max_side (int): Длинная сторона изображения в пикселях; 0 — рендеринг с разрешением dpi.
+        side_limit (int): Предел длинной стороны изображения в пикселях: крупные страницы
+            рендерятся с меньшим разрешением, чтобы растр помещался в память; 0 — без предела.
+
+    Returns:
+        tuple: Изображение, разрешение рендеринга в точках на дюйм и размер страницы
+            в пунктах (ширина, высота).
+    """
+    # pdfium возвращает размер уже с учетом поворота страницы
+    width, height = page.get_size()
+    scale = max_side / max(width, height) if max_side else dpi / 72
+    if side_limit:
+        scale = min(scale, side_limit / max(width, height))
+    return page.render(scale=scale).to_pil(), scale * 72, (width, height)
+
+def render_pdf_page(pdf_path: str, index: int, dpi: float):
+    """
+    Рендерит одну страницу PDF-документа с заданным разрешением.
+
+    Args:
+        pdf_path (str): Путь к PDF-файлу.
+        index (int): Индекс страницы.
+        dpi (float): Разрешение в точках на дюйм.
+
+    Returns:
+        Image.Image: Изображение страницы.
+    """
+    with PDFIUM_LOCK:
+        pdf = pdfium.PdfDocument(pdf_path)
+        try:
+            page = pdf[index]
+            image = page.render(scale=dpi / 72).to_pil()
+            page.close()
+            return image
+        finally:
+            pdf.close()
+
+def points_to_pixels(points: tuple, dpi: float) -> tuple:
+    """
+    Возвращает размер изображения страницы при рендеринге с разрешением dpi.
+
+    Args:
+        points (tuple): Размер страницы в пунктах (ширина, высота).
+        dpi (float): Разрешение в точках на дюйм.
+
+    Returns:
+        tuple: Ширина и высота в пикселях, как их вычисляет pdfium.
+    """
+    scale = dpi / 72
+    return math.ceil(points[0] * scale), math.ceil(points[1] * scale)
+
+def render_page_range(pdf_path: str, start: int, stop: int, dpi: float, names: list, img_dir: str = None,
+                      max_side: int = 0, side_limit: int = 0) -> list:
+    """
+    Рендерит диапазон страниц PDF. Выполняется в отдельном процессе со своим PdfDocument.
+
+    Args:
+        pdf_path (str): Путь к PDF-файлу.
+        start (int): Индекс первой страницы диапазона.
+        stop (int): Индекс страницы, следующей за последней.
+        dpi (float): Разрешение для рендеринга изображений в точках на дюйм.
+        names (list): Имена изображений страниц диапазона.
+        img_dir (str, optional): Директория для сохранения PNG. Если не задана, PNG не сохраняются.
+        max_side (int, optional): Длинная сторона изображения в пикселях вместо фиксированного разрешения.
+        side_limit (int, optional): Предел длинной стороны изображения в пикселях.
+
+    Returns:
+        list: Страницы диапазона в порядке следования.
+    """
+    pdf = pdfium.PdfDocument(pdf_path)
+    try:
+        pages = []
+        for i, img_filename in zip(range(start, stop), names):
+            page = pdf[i]
+            img, page_dpi, points = render_page(page, dpi, max_side, side_limit)
+            page.close()
+
+            img_path = None
+            if img_dir is not None:
+                img_path = os.path.join(img_dir, img_filename)
+                img.save(img_path)
+            pages.append(Page(img_filename, img, img_path, dpi=page_dpi, points=points, source=(pdf_path, i)))
+        return pages
+    finally:
+        pdf.close()
+
+def _write_chunk(buffer, digest, chunk: bytes) -> None:
+    """
+    Записывает блок загружаемого файла и добавляет его в хеш.
+    """
+    digest.update(chunk)
+    buffer.write(chunk)
+
+def upload_name(filename: str) -> str:
+    """
+    Возвращает безопасное имя загруженного файла: без каталогов, чтобы путь
+    не выходил за пределы рабочего пространства.
+
+    Args:
+        filename (str): Имя файла, переданное клиентом.
+
+    Returns:
+        str: Имя файла без каталогов.
+
+    Raises:
+        HTTPException: Если имя файла пустое (400).
+    """
+    name = os.path.basename((filename or "").replace("\\", "/")).strip()
+    if name in ("", ".", ".."):
+        raise HTTPException(status_code=400, detail="Не указано имя загружаемого файла")
+    return name
+
+def _open_unique(directory: str, name: str):
+    """
+    Создает новый файл в директории, добавляя к имени номер, если файл с таким именем уже есть.
+
+    Returns:
+        tuple: Путь к файлу и открытый на запись файл.
+    """
+    stem, extension = os.path.splitext(name)
+    candidate, number = name, 1
+    while True:
+        path = os.path.join(directory, candidate)
+        try:
+            return path, open(path, "xb")
+        except FileExistsError:
+            candidate = f"{stem}_{number}{extension}"
+            number += 1
+
+async def save_upload(file: UploadFile, upload_dir: str, max_bytes: int = None,
+                      executor=None, chunk_size: int = 1024 * 1024) -> tuple:
     """
     Сохраняет загруженный файл во временное хранилище.
 
+    Файл читается блоками и за один проход записывается на диск, хешируется
+    и проверяется на превышение максимального размера. Из имени файла
+    убираются каталоги, а к совпадающим именам добавляется номер, поэтому
+    файлы одного запроса не перезаписывают друг друга. Запись и хеширование
+    выполняются в пуле потоков и не блокируют цикл событий.
+
     Args:
         file (UploadFile): Загружаемый файл.
         upload_dir (str): Директория для сохранения файла.
+        max_bytes (int, optional): Максимальный размер файла в байтах. Если не задан, размер не ограничен.
+        executor (Executor, optional): Пул потоков для записи. По умолчанию пул цикла событий.
+        chunk_size (int): Размер блока чтения в байтах.
 
     Returns:
-        str: Путь к сохраненному файлу.
+        tuple: Путь к сохраненному файлу и SHA-256 его содержимого.
+
+    Raises:
+        HTTPException: Если имя файла пустое (400) или файл превышает максимальный размер (413).
     """
+    loop = asyncio.get_running_loop()
     # Формируем полный путь для сохранения файла
-    filepath = os.path.join(upload_dir, file.filename)
+    name = upload_name(file.filename)
+    digest = hashlib.sha256()
+    size = 0
+
+    filepath, buffer = await loop.run_in_executor(executor, _open_unique, upload_dir, name)
+    try:
+        while chunk := await file.read(chunk_size):
+            size += len(chunk)
+            if max_bytes is not None and size > max_bytes:
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"Файл {name} превышает допустимый размер {max_bytes // (1024 * 1024)} МБ"
+                )
+            await loop.run_in_executor(executor, _write_chunk, buffer, digest, chunk)
+    except BaseException:
+        # Недописанный файл не должен остаться в хранилище
+        await loop.run_in_executor(executor, buffer.close)
+        os.unlink(filepath)
+        raise
+    await loop.run_in_executor(executor, buffer.close)
 
-    # Открываем файл для записи в бинарном режиме
-    with open(filepath, "wb") as buffer:
-        # Копируем содержимое загруженного файла в буфер
-        shutil.copyfileobj(file.file, buffer)
+    # Возвращаем путь к сохраненному файлу и хеш содержимого
+    return filepath, digest.hexdigest()
 
-    # Возвращаем путь к сохраненному файлу
-    return filepath
+class Page:
+    def __init__(self, name: str, image: Image.Image, path: str = None, dpi: float = None,
+                 points: tuple = None, source: tuple = None, detections=None) -> None:
+        """
+        Страница, передаваемая по конвейеру обработки в памяти.
 
-def process_zip(zip_path: str, extract_dir: str) -> list:
+        Args:
+            name (str): Имя страницы, из которого формируются имена результатов.
+            image (Image.Image): Декодированное изображение страницы в RGB.
+            path (str, optional): Путь к изображению на диске, если оно сохранено.
+            dpi (float, optional): Разрешение рендеринга страницы PDF в точках на дюйм.
+            points (tuple, optional): Размер страницы PDF в пунктах (ширина, высота).
+            source (tuple, optional): Путь к PDF-файлу и индекс страницы для повторного рендеринга.
+            detections (Detections, optional): Объекты страницы, найденные без модели (по текстовому слою).
+        """
+        self.name = name
+        self.image = image
+        self.path = path
+        self.dpi = dpi
+        self.points = points
+        self.source = source
+        self.detections = detections
+
+    def release(self) -> None:
+        """
+        Освобождает изображение после обработки страницы.
+        """
+        self.image = None
+
+def load_page(image_path: str) -> Page:
     """
-    Распаковывает ZIP-файл и возвращает список изображений.
+    Декодирует загруженное изображение в страницу для конвейера.
 
     Args:
-        zip_path (str): Путь к ZIP-файлу.
-        extract_dir (str): Директория для распаковки файлов.
+        image_path (str): Путь к изображению.
 
     Returns:
-        list: Список путей к изображениям.
+        Page: Страница с декодированным изображением.
     """
-    # Открываем ZIP-файл для чтения
-    with ZipFile(zip_path, "r") as zip_ref:
-        # Распаковываем все файлы из ZIP-архива в указанную директорию
-        zip_ref.extractall(extract_dir)
+    with Image.open(image_path) as image:
+        rgb = image.convert("RGB")
+    return Page(os.path.basename(image_path), rgb, image_path)
 
-    # Возвращаем список путей к изображениям с расширением .png
-    return [os.path.join(extract_dir, f) for f in os.listdir(extract_dir) if f.endswith(".png")]
+# Расширения файлов архива, которые обрабатываются как страницы или документы
+ZIP_IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".tif", ".tiff", ".bmp", ".webp")
+ZIP_DOCUMENT_EXTENSIONS = (".pdf",)
 
-def pdf_to_images(pdf_path: str, img_dir: str, dpi=300) -> list:
+def zip_member_name(name: str) -> str:
     """
-    Преобразует каждую страницу PDF-документа в изображение и сохраняет его в указанную директорию.
+    Формирует плоское имя файла архива: каталоги входят в имя, чтобы одинаковые
+    имена из разных каталогов не совпадали, а путь не выходил за пределы директории.
 
     Args:
-        pdf_path (str): Путь к PDF-файлу.
-        img_dir (str): Директория, в которую будут сохранены изображения.
-        dpi (int, optional): Разрешение для рендеринга изображений в точках на дюйм.
+        name (str): Имя файла в архиве.
 
     Returns:
-        list: Список путей к сохраненным изображениям.
+        str: Имя без разделителей каталогов.
+    """
+    parts = [part for part in name.replace("\\", "/").split("/") if part not in ("", ".", "..")]
+    return "_".join(parts)
+
+def process_zip(zip_path: str, extract_dir: str, max_member_bytes: int = None):
     """
-    # Создаем директорию для сохранения изображений, если она не существует
-    os.makedirs(img_dir, exist_ok=True)
+    Перебирает изображения и PDF-документы ZIP-архива, не распаковывая архив целиком.
+
+    Изображения читаются из архива по одному и сразу декодируются в страницы.
+    PDF-документы по одному копируются потоком в extract_dir, так как рендеринг
+    требует произвольного доступа к файлу. Остальные файлы пропускаются.
+
+    Args:
+        zip_path (str): Путь к ZIP-файлу.
+        extract_dir (str): Директория для PDF-документов из архива.
+        max_member_bytes (int, optional): Максимальный размер файла архива после распаковки в байтах.
 
+    Yields:
+        tuple: Имя файла и страница (Page) для изображения или путь к сохраненному PDF.
+
+    Raises:
+        HTTPException: Если файл не является ZIP-архивом (400) или файл архива превышает максимальный размер (413).
+    """
     try:
-        # Открываем PDF-документ
-        pdf = pdfium.PdfDocument(pdf_path)
-        img_paths = []
+        zip_ref = ZipFile(zip_path, "r")
+    except BadZipFile:
+        raise HTTPException(status_code=400, detail=f"{os.path.basename(zip_path)} не является ZIP-архивом")
+    with zip_ref:
+        for info in zip_ref.infolist():
+            name = zip_member_name(info.filename)
+            extension = os.path.splitext(name)[1].lower()
+            if info.is_dir() or name.startswith("__MACOSX") or extension not in ZIP_IMAGE_EXTENSIONS + ZIP_DOCUMENT_EXTENSIONS:
+                continue
+            if max_member_bytes is not None and info.file_size > max_member_bytes:
+                raise HTTPException(
+                    status_code=413,
+                    detail=f"Файл {info.filename} в архиве превышает допустимый размер {max_member_bytes // (1024 * 1024)} МБ"
+                )
 
-        # Итерируемся по каждой странице в PDF
-        for i in range(len(pdf)):
-            # Рендерим страницу в изображение
-            page = pdf[i]
-            img = page.render(scale=dpi / 72).to_pil()
+            if extension in ZIP_DOCUMENT_EXTENSIONS:
+                os.makedirs(extract_dir, exist_ok=True)
+                pdf_path = os.path.join(extract_dir, name)
+                with zip_ref.open(info) as src, open(pdf_path, "wb") as dst:
+                    shutil.copyfileobj(src, dst, 1024 * 1024)
+                yield name, pdf_path
+            else:
+                # Файл архива читается в память целиком: PIL требует произвольного доступа
+                try:
+                    with Image.open(io.BytesIO(zip_ref.read(info))) as image:
+                        rgb = image.convert("RGB")
+                except OSError as e:
+                    # Поврежденное изображение не должно останавливать обработку всего архива
+                    print(f"Ошибка при обработке {info.filename} из {zip_path}: {e}")
+                    continue
+                yield name, Page(name, rgb)
+
+class PdfPageProducer:
+    def __init__(self, pdf_path: str, img_dir: str, dpi: float = 300, prefetch: int = 2, persist: bool = True,
+                 workers: int = 1, chunk_size: int = 4, max_side: int = 0, side_limit: int = 0) -> None:
+        """
+        Ограниченный производитель страниц PDF-документа.
+
+        Страницы рендерятся в фоновом потоке не более чем на prefetch страниц вперед,
+        поэтому рендеринг следующей страницы идет параллельно с обработкой текущей,
+        а объем памяти не зависит от числа страниц. При workers > 1 диапазоны
+        по chunk_size страниц рендерятся параллельно в пуле процессов, а страницы
+        по-прежнему выдаются в порядке следования.
+
+        Args:
+            pdf_path (str): Путь к PDF-файлу.
+            img_dir (str): Директория, в которую будут сохранены изображения.
+            dpi (int, optional): Разрешение для рендеринга изображений в точках на дюйм.
+            prefetch (int, optional): Сколько отрендеренных страниц может ожидать обработки.
+            persist (bool, optional): Сохранять ли изображения страниц в PNG на диск.
+            workers (int, optional): Количество процессов для параллельного рендеринга.
+            chunk_size (int, optional): Количество страниц в одной задаче процесса.
+            max_side (int, optional): Длинная сторона изображения страницы в пикселях;
+                если задана, разрешение подбирается для каждой страницы вместо dpi.
+            side_limit (int, optional): Предел длинной стороны изображения страницы в пикселях;
+                крупные страницы рендерятся с меньшим разрешением.
+        """
+        self.pdf_path = pdf_path
+        self.img_dir = img_dir
+        self.dpi = dpi
+        self.prefetch = max(1, prefetch)
+        self.persist = persist
+        self.workers = workers
+        self.chunk_size = max(1, chunk_size)
+        self.max_side = max_side
+        self.side_limit = side_limit
 
-            # Генерируем имя файла для изображения
-            img_filename = f"{os.path.splitext(os.path.basename(pdf_path))[0]}_{i + 1}.png"
-            img_path = os.path.join(img_dir, img_filename)
+        # Создаем директорию для сохранения изображений, если она не существует
+        if persist:
+            os.makedirs(img_dir, exist_ok=True)
 
-            # Сохраняем изображение в указанную директорию
-            img.save(img_path)
-            img_paths.append(img_path)
+        # Открываем PDF-документ, количество страниц известно сразу
+        with PDFIUM_LOCK:
+            self._pdf = pdfium.PdfDocument(pdf_path)
+            self.page_count = len(self._pdf)
 
-        # Возвращаем список путей к изображениям
-        return img_paths
+        base_name = os.path.splitext(os.path.basename(pdf_path))[0]
+        # Имена изображений страниц в порядке следования
+        self.names = [f"{base_name}_{i + 1}.png" for i in range(self.page_count)]
+
+        self._queue = queue.Queue(maxsize=self.prefetch)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def __len__(self) -> int:
+        return self.page_count
+
+    def __iter__(self):
+        """
+        Возвращает страницы по мере их готовности.
+
+        Yields:
+            Page: Отрендеренная страница.
+        """
+        target = self._produce_parallel if self.workers > 1 else self._produce
+        self._thread = threading.Thread(target=target, name="pdf-producer", daemon=True)
+        self._thread.start()
+        try:
+            while True:
+                try:
+                    item = self._queue.get(timeout=0.1)
+                except queue.Empty:
+                    # Производитель остановлен из другого потока
+                    if self._stop.is_set():
+                        break
+                    continue
+                if item is None:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        """
+        Останавливает рендеринг и закрывает документ.
+        """
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            # Освобождаем место в очереди, чтобы фоновый поток мог завершиться
+            while self._thread.is_alive():
+                try:
+                    self._queue.get_nowait()
+                except queue.Empty:
+                    pass
+                self._thread.join(timeout=0.05)
+            self._thread = None
+        if self._pdf is not None:
+            with PDFIUM_LOCK:
+                self._pdf.close()
+            self._pdf = None
+
+    def _put(self, item) -> bool:
+        """
+        Кладет элемент в очередь, пока потребитель не остановил производителя.
+
+        Returns:
+            bool: False, если производитель остановлен.
+        """
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _produce(self) -> None:
+        """
+        Цикл фонового потока: рендерит страницы и при необходимости сохраняет их на диск.
+        """
+        try:
+            # Итерируемся по каждой странице в PDF
+            for i, img_filename in enumerate(self.names):
+                if self._stop.is_set():
+                    return
+
+                # Рендерим страницу в изображение
+                with PDFIUM_LOCK:
+                    page = self._pdf[i]
+                    img, page_dpi, points = render_page(page, self.dpi, self.max_side, self.side_limit)
+                    page.close()
+
+                # Сохраняем изображение в указанную директорию, только если это запрошено
+                img_path = None
+                if self.persist:
+                    img_path = os.path.join(self.img_dir, img_filename)
+                    img.save(img_path)
+
+                page = Page(img_filename, img, img_path, dpi=page_dpi, points=points, source=(self.pdf_path, i))
+                if not self._put(page):
+                    return
+        except Exception as e:
+            self._put(e)
+            return
+        self._put(None)
+
+    def _produce_parallel(self) -> None:
+        """
+        Цикл фонового потока для параллельного рендеринга в пуле процессов.
+
+        Одновременно в работе не более workers диапазонов, поэтому память
+        по-прежнему ограничена, а не растет с числом страниц.
+        """
+        pool = get_render_pool(self.workers)
+        img_dir = self.img_dir if self.persist else None
+        ranges = iter(
+            (start, min(start + self.chunk_size, self.page_count))
+            for start in range(0, self.page_count, self.chunk_size)
+        )
+        pending = deque()
+
+        def submit_next() -> None:
+            page_range = next(ranges, None)
+            if page_range is not None:
+                start, stop = page_range
+                pending.append(pool.submit(
+                    render_page_range, self.pdf_path, start, stop, self.dpi, self.names[start:stop], img_dir,
+                    self.max_side, self.side_limit
+                ))
+
+        try:
+            for _ in range(self.workers):
+                submit_next()
+
+            # Забираем диапазоны в порядке страниц
+            while pending:
+                pages = pending.popleft().result()
+                submit_next()
+                for page in pages:
+                    if not self._put(page):
+                        return
+        except Exception as e:
+            self._put(e)
+            return
+        finally:
+            for future in pending:
+                future.cancel()
+        self._put(None)
+
+def pdf_to_images(pdf_path: str, img_dir: str, dpi=300, workers: int = 1, max_side: int = 0) -> list:
+    """
+    Преобразует каждую страницу PDF-документа в изображение и сохраняет его в указанную директорию.
+
+    Args:
+        pdf_path (str): Путь к PDF-файлу.
+        img_dir (str): Директория, в которую будут сохранены изображения.
+        dpi (int, optional): Разрешение для рендеринга изображений в точках на дюйм.
+        workers (int, optional): Количество процессов для параллельного рендеринга.
+        max_side (int, optional): Длинная сторона изображений в пикселях вместо фиксированного разрешения.
+
+    Returns:
+        list: Список путей к сохраненным изображениям.
+    """
+    try:
+        return [page.path for page in PdfPageProducer(pdf_path, img_dir, dpi=dpi, workers=workers, max_side=max_side)]
 
     except Exception as e:
         # Выводим сообщение об ошибке, если произошло исключение
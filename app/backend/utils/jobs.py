@@ -0,0 +1,187 @@
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+
+
+class Job:
+    def __init__(self, inputs: list, workspace=None, render: bool = True, profile: bool = False,
+                 annotation_dpi: float = None) -> None:
+        """
+        Фоновое задание на обработку загруженных файлов.
+
+        Args:
+            inputs (list): Тройки (путь к сохраненному файлу, исходное имя файла, SHA-256 содержимого).
+            workspace (Workspace, optional): Рабочее пространство, в которое сохраняются результаты.
+            render (bool): Нужны ли аннотированные изображения.
+            profile (bool): Профилировать ли обработку задания.
+            annotation_dpi (float, optional): Разрешение координат JSON-аннотаций; None — по умолчанию сервиса.
+        """
+        self.id = uuid.uuid4().hex
+        self.inputs = inputs
+        self.workspace = workspace
+        self.render = render
+        self.profile = profile
+        self.annotation_dpi = annotation_dpi
+        self.status = "queued"
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        # Прогресс по страницам: имя страницы -> состояние и результаты
+        self.pages = OrderedDict()
+
+    def add_pages(self, names: list) -> None:
+        """
+        Регистрирует страницы, которые предстоит обработать.
+
+        Args:
+            names (list): Имена страниц.
+        """
+        for name in names:
+            self.pages.setdefault(name, {"name": name, "status": "pending"})
+
+    def complete_page(self, name: str, result: dict) -> None:
+        """
+        Отмечает страницу как обработанную.
+
+        Args:
+            name (str): Имя страницы.
+            result (dict): Результаты обработки страницы (имена и URL файлов).
+        """
+        page = self.pages.setdefault(name, {"name": name})
+        page.update(result)
+        page["status"] = "done"
+
+    def to_dict(self) -> dict:
+        """
+        Формирует описание задания для ответа API.
+
+        Returns:
+            dict: Состояние задания и прогресс по страницам.
+        """
+        pages = list(self.pages.values())
+        return {
+            "job_id": self.id,
+            "workspace_id": self.workspace.id if self.workspace is not None else None,
+            "status": self.status,
+            "profiled": self.profile,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "total_pages": len(pages),
+            "done_pages": sum(1 for page in pages if page["status"] == "done"),
+            "pages": pages,
+        }
+
+
+class JobManager:
+    def __init__(self, handler, workers: int = 2, history_size: int = 1000) -> None:
+        """
+        Очередь фоновых заданий с пулом обработчиков.
+
+        Args:
+            handler: Корутина handler(job), выполняющая обработку задания.
+            workers (int): Количество одновременно обрабатываемых заданий.
+            history_size (int): Сколько последних заданий хранить в памяти.
+        """
+        self.handler = handler
+        self.workers = workers
+        self.history_size = history_size
+        self._jobs = OrderedDict()
+        self._queue = None
+        self._tasks = []
+
+    async def start(self) -> None:
+        """
+        Запускает обработчики заданий в текущем цикле событий.
+        """
+        self._queue = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        """
+        Останавливает обработчики заданий.
+        """
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def submit(self, inputs: list, workspace=None, render: bool = True, profile: bool = False,
+               annotation_dpi: float = None) -> Job:
+        """
+        Создает задание и ставит его в очередь.
+
+        Args:
+            inputs (list): Тройки (путь к сохраненному файлу, исходное имя файла, SHA-256 содержимого).
+            workspace (Workspace, optional): Рабочее пространство, в которое сохраняются результаты.
+            render (bool): Нужны ли аннотированные изображения.
+            profile (bool): Профилировать ли обработку задания.
+            annotation_dpi (float, optional): Разрешение координат JSON-аннотаций; None — по умолчанию сервиса.
+
+        Returns:
+            Job: Созданное задание.
+        """
+        job = Job(inputs, workspace, render, profile, annotation_dpi)
+        self._jobs[job.id] = job
+        self._evict()
+        self._queue.put_nowait(job)
+        return job
+
+    def get(self, job_id: str):
+        """
+        Возвращает задание по идентификатору.
+
+        Args:
+            job_id (str): Идентификатор задания.
+
+        Returns:
+            Job | None: Задание или None, если оно не найдено.
+        """
+        return self._jobs.get(job_id)
+
+    def stats(self) -> dict:
+        """
+        Возвращает состояние очереди заданий.
+
+        Returns:
+            dict: Количество обработчиков, ожидающих и выполняющихся заданий.
+        """
+        statuses = [job.status for job in self._jobs.values()]
+        return {
+            "workers": self.workers,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "running": statuses.count("running"),
+            "done": statuses.count("done"),
+            "failed": statuses.count("failed"),
+        }
+
+    def _evict(self) -> None:
+        """
+        Удаляет из истории самые старые завершенные задания.
+        """
+        for job_id in list(self._jobs):
+            if len(self._jobs) <= self.history_size:
+                break
+            if self._jobs[job_id].status in ("done", "failed"):
+                del self._jobs[job_id]
+
+    async def _worker(self) -> None:
+        """
+        Цикл обработчика: берет задания из очереди и выполняет их.
+        """
+        while True:
+            job = await self._queue.get()
+            job.status = "running"
+            job.started_at = time.time()
+            try:
+                await self.handler(job)
+                job.status = "done"
+            except Exception as e:
+                job.status = "failed"
+                job.error = getattr(e, "detail", None) or str(e)
+            finally:
+                job.finished_at = time.time()
+                self._queue.task_done()
@@ -0,0 +1,254 @@
+import time
+import bisect
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# Метки текущего запроса: задаются в обработчике и наследуются задачами и пулами потоков
+ENDPOINT = contextvars.ContextVar("metrics_endpoint", default="")
+FILE_TYPE = contextvars.ContextVar("metrics_file_type", default="")
+
+# Границы корзин гистограмм длительностей в секундах
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _format_labels(labelnames: tuple, values: tuple, extra: str = "") -> str:
+    """
+    Форматирует метки образца в синтаксисе Prometheus.
+    """
+    pairs = [
+        name + '="' + str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+        for name, value in zip(labelnames, values)
+    ]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class Metric:
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()) -> None:
+        """
+        Базовый класс метрики с метками.
+
+        Args:
+            name (str): Имя метрики.
+            documentation (str): Описание метрики.
+            labelnames (tuple): Имена меток.
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        # Значения меток -> состояние
+        self._values = {}
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(labels.get(name, "") for name in self.labelnames)
+
+    def render(self) -> list:
+        """
+        Возвращает строки метрики в текстовом формате Prometheus.
+        """
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        """
+        Увеличивает счетчик.
+
+        Args:
+            amount (float): Приращение.
+            **labels: Значения меток.
+        """
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def render(self) -> list:
+        with self._lock:
+            values = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in values]
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS) -> None:
+        """
+        Гистограмма с фиксированными корзинами.
+
+        Args:
+            name (str): Имя метрики.
+            documentation (str): Описание метрики.
+            labelnames (tuple): Имена меток.
+            buckets (tuple): Верхние границы корзин по возрастанию.
+        """
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels) -> None:
+        """
+        Добавляет наблюдение.
+
+        Args:
+            value (float): Наблюдаемое значение.
+            **labels: Значения меток.
+        """
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Счетчики корзин (последняя — +Inf), сумма и количество
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """
+        Измеряет длительность блока кода.
+
+        Args:
+            **labels: Значения меток.
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self) -> list:
+        with self._lock:
+            values = [(key, list(counts), total, count) for key, (counts, total, count) in self._values.items()]
+        lines = []
+        for key, counts, total, count in values:
+            cumulative = 0
+            for bound, bucket in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self) -> None:
+        """
+        Набор метрик сервиса, отдаваемых в текстовом формате Prometheus.
+
+        Кроме метрик, обновляемых по ходу обработки, регистрируются сборщики —
+        функции, которые вызываются при каждом запросе метрик и возвращают
+        текущие значения (глубины очередей, счетчики кеша).
+        """
+        self._metrics = []
+        self._collectors = []
+
+    def register(self, metric: Metric) -> Metric:
+        """
+        Регистрирует метрику.
+
+        Args:
+            metric (Metric): Метрика.
+
+        Returns:
+            Metric: Та же метрика.
+        """
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: tuple = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def collector(self, fn) -> None:
+        """
+        Регистрирует сборщик.
+
+        Args:
+            fn: Функция без аргументов, возвращающая список кортежей
+                (имя, тип, описание, список пар (метки, значение)).
+        """
+        self._collectors.append(fn)
+
+    def render(self) -> str:
+        """
+        Формирует текст всех метрик.
+
+        Returns:
+            str: Метрики в текстовом формате Prometheus 0.0.4.
+        """
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.render())
+        for collect in self._collectors:
+            try:
+                families = collect()
+            except Exception:
+                continue
+            for name, metric_type, documentation, samples in families:
+                lines.append(f"# HELP {name} {documentation}")
+                lines.append(f"# TYPE {name} {metric_type}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_format_labels(tuple(labels), tuple(labels.values()))} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+
+# Метрики сервиса
+REGISTRY = Registry()
+STAGE_SECONDS = REGISTRY.histogram(
+    "layout_stage_seconds", "Длительность этапов обработки", ("stage", "endpoint", "file_type")
+)
+REQUEST_SECONDS = REGISTRY.histogram(
+    "layout_request_seconds", "Длительность обработки запроса", ("endpoint",)
+)
+PAGES = REGISTRY.counter(
+    "layout_pages_total", "Обработанные страницы", ("endpoint", "file_type", "source")
+)
+BOXES_PER_PAGE = REGISTRY.histogram(
+    "layout_boxes_per_page", "Количество найденных объектов на странице", ("endpoint", "file_type"),
+    buckets=(0, 1, 5, 10, 25, 50, 100, 250, 500, 1000)
+)
+
+
+@contextmanager
+def stage(name: str):
+    """
+    Измеряет длительность этапа обработки с метками текущего запроса.
+
+    Args:
+        name (str): Имя этапа.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.observe(
+            time.perf_counter() - start, stage=name, endpoint=ENDPOINT.get(), file_type=FILE_TYPE.get()
+        )
+
+def count_page(boxes: int, source: str) -> None:
+    """
+    Учитывает обработанную страницу.
+
+    Args:
+        boxes (int): Количество найденных объектов.
+        source (str): Откуда получен результат: model, native или cache.
+    """
+    labels = {"endpoint": ENDPOINT.get(), "file_type": FILE_TYPE.get()}
+    PAGES.inc(source=source, **labels)
+    BOXES_PER_PAGE.observe(boxes, **labels)
@@ -0,0 +1,248 @@
+import os
+import sys
+import time
+import zlib
+import html
+import random
+import threading
+import contextvars
+from collections import Counter
+from contextlib import contextmanager
+
+# Профилировщик текущего запроса: наследуется задачами и пулами потоков
+ACTIVE = contextvars.ContextVar("profiler", default=None)
+
+# Имена файлов профиля в рабочем пространстве
+COLLAPSED_FILENAME = "profile.collapsed"
+FLAMEGRAPH_FILENAME = "profile.svg"
+
+# Кадры, на которых поток простаивает в ожидании работы; такие образцы не учитываются
+_IDLE_FRAMES = {
+    ("threading.py", "wait"),
+    ("queue.py", "get"),
+    ("selectors.py", "select"),
+    ("thread.py", "_worker"),
+}
+
+# Потоки пулов, выполняющие задачи: идентификатор потока -> профилировщик запроса задачи или None
+_owners = {}
+_owners_lock = threading.Lock()
+
+
+def should_profile(header: str, token: str, sample_rate: float) -> bool:
+    """
+    Решает, профилировать ли запрос.
+
+    Args:
+        header (str): Значение заголовка профилирования из запроса.
+        token (str): Токен администратора; пустой токен отключает профилирование по заголовку.
+        sample_rate (float): Доля случайно профилируемых запросов.
+
+    Returns:
+        bool: Нужно ли профилировать запрос.
+    """
+    if token and header == token:
+        return True
+    return sample_rate > 0 and random.random() < sample_rate
+
+
+class SamplingProfiler:
+    def __init__(self, interval: float = 0.01) -> None:
+        """
+        Семплирующий профилировщик CPU для одного запроса.
+
+        Отдельный поток с заданным интервалом снимает стеки потоков процесса.
+        Учитываются поток цикла событий и общие потоки (батчинг, инференс) и
+        потоки пулов, пока они выполняют задачи этого запроса; потоки, занятые
+        задачами других запросов, и простаивающие потоки пропускаются.
+        Стеки C-расширений (PIL, pypdfium2, torch) видны до вызывающей их
+        функции Python.
+
+        Args:
+            interval (float): Интервал между снимками в секундах.
+        """
+        self.interval = interval
+        self.samples = Counter()
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+        self._started_at = None
+
+    def start(self) -> None:
+        """
+        Запускает снятие стеков.
+        """
+        self._started_at = time.perf_counter()
+        self._thread = threading.Thread(target=self._sample, name="profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """
+        Останавливает снятие стеков.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.duration = time.perf_counter() - self._started_at
+
+    def _sample(self) -> None:
+        own = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            with _owners_lock:
+                owners = dict(_owners)
+            for ident, frame in sys._current_frames().items():
+                if ident == own or owners.get(ident, self) is not self:
+                    continue
+                stack = self._stack(frame)
+                if stack:
+                    self.samples[";".join([names.get(ident, str(ident))] + stack)] += 1
+
+    @staticmethod
+    def _stack(frame) -> list:
+        """
+        Переводит стек потока в список кадров от корня к листу.
+
+        Returns:
+            list: Кадры вида "функция (модуль:строка)"; пустой список для простаивающего потока.
+        """
+        code = frame.f_code
+        if (os.path.basename(code.co_filename), code.co_name) in _IDLE_FRAMES:
+            return []
+        stack = []
+        while frame is not None:
+            code = frame.f_code
+            # Модуль, а не имя файла, чтобы были видны библиотеки (PIL.Image, pypdfium2._helpers.page, torch.nn...)
+            module = frame.f_globals.get("__name__") or os.path.basename(code.co_filename)
+            stack.append(f"{code.co_name} ({module}:{code.co_firstlineno})")
+            frame = frame.f_back
+        stack.reverse()
+        return stack
+
+    def collapsed(self) -> str:
+        """
+        Возвращает профиль в формате свернутых стеков (collapsed stacks).
+
+        Returns:
+            str: Строки "поток;кадр;...;кадр количество".
+        """
+        return "".join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+    def flamegraph(self, width: int = 1200, row_height: int = 16) -> str:
+        """
+        Строит flame graph в формате SVG.
+
+        Args:
+            width (int): Ширина изображения в пикселях.
+            row_height (int): Высота строки кадра в пикселях.
+
+        Returns:
+            str: Документ SVG.
+        """
+        # Дерево кадров: имя -> [количество образцов, дочерние кадры]
+        root = [0, {}]
+        for stack, count in self.samples.items():
+            node = root
+            node[0] += count
+            for name in stack.split(";"):
+                node = node[1].setdefault(name, [0, {}])
+                node[0] += count
+
+        total = root[0] or 1
+        rects = []
+        depth = 0
+
+        def walk(children: dict, x: float, level: int) -> None:
+            nonlocal depth
+            depth = max(depth, level + 1)
+            for name, (count, grandchildren) in sorted(children.items()):
+                frame_width = count / total * width
+                if frame_width >= 0.5:
+                    rects.append((x, level, frame_width, name, count))
+                    walk(grandchildren, x, level + 1)
+                x += frame_width
+
+        walk(root[1], 0.0, 0)
+        height = (depth + 2) * row_height
+        lines = [
+            f'<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" font-family="monospace" font-size="11">',
+            f'<text x="4" y="{row_height - 4}">{total} образцов, {self.duration:.2f} с, интервал {self.interval * 1000:g} мс</text>',
+        ]
+        for x, level, frame_width, name, count in rects:
+            y = height - (level + 1) * row_height
+            # Цвет зависит от имени кадра, чтобы одинаковые кадры выглядели одинаково
+            hue = 20 + zlib.crc32(name.split(" (")[0].encode()) % 40
+            label = html.escape(name)
+            lines.append(
+                f'<g><title>{label} — {count} ({count / total:.1%})</title>'
+                f'<rect x="{x:.1f}" y="{y}" width="{frame_width:.1f}" height="{row_height - 1}" fill="hsl({hue},90%,60%)"/>'
+            )
+            # Подпись помещается, если на символ приходится хотя бы 7 пикселей
+            chars = int(frame_width // 7)
+            if chars >= 3:
+                text = label if len(name) <= chars else html.escape(name[:chars - 2]) + ".."
+                lines.append(f'<text x="{x + 2:.1f}" y="{y + row_height - 4}">{text}</text>')
+            lines.append("</g>")
+        lines.append("</svg>")
+        return "\n".join(lines) + "\n"
+
+    def save(self, directory: str) -> list:
+        """
+        Сохраняет профиль в виде свернутых стеков и flame graph.
+
+        Args:
+            directory (str): Директория для файлов профиля.
+
+        Returns:
+            list: Пути к сохраненным файлам.
+        """
+        paths = []
+        for filename, content in ((COLLAPSED_FILENAME, self.collapsed()), (FLAMEGRAPH_FILENAME, self.flamegraph())):
+            path = os.path.join(directory, filename)
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(content)
+            paths.append(path)
+        return paths
+
+
+@contextmanager
+def profile(enabled: bool, interval: float = 0.01):
+    """
+    Профилирует блок кода и задачи, запущенные из него.
+
+    Args:
+        enabled (bool): Включено ли профилирование.
+        interval (float): Интервал между снимками в секундах.
+
+    Yields:
+        SamplingProfiler | None: Профилировщик или None, если профилирование выключено.
+    """
+    if not enabled:
+        yield None
+        return
+    profiler = SamplingProfiler(interval)
+    token = ACTIVE.set(profiler)
+    profiler.start()
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
+        ACTIVE.reset(token)
+
+@contextmanager
+def track():
+    """
+    Отмечает, для какого запроса текущий поток выполняет задачу.
+
+    Потоки с задачами непрофилируемых запросов тоже отмечаются, чтобы их
+    стеки не попадали в профили других запросов.
+    """
+    profiler = ACTIVE.get()
+    ident = threading.get_ident()
+    with _owners_lock:
+        _owners[ident] = profiler
+    try:
+        yield
+    finally:
+        with _owners_lock:
+            _owners.pop(ident, None)
@@ -0,0 +1,260 @@
+import os
+import re
+import time
+import shutil
+import asyncio
+import threading
+import uuid
+
+# Идентификатор рабочего пространства — uuid4 в шестнадцатеричном виде
+_WORKSPACE_ID = re.compile(r"[0-9a-f]{32}")
+
+
+class Workspace:
+    def __init__(self, workspace_id: str, upload_dir: str, result_dir: str, json_dir: str) -> None:
+        """
+        Изолированное рабочее пространство одного запроса.
+
+        Args:
+            workspace_id (str): Идентификатор рабочего пространства.
+            upload_dir (str): Директория загруженных файлов и отрендеренных страниц.
+            result_dir (str): Директория аннотированных изображений.
+            json_dir (str): Директория JSON-аннотаций.
+        """
+        self.id = workspace_id
+        self.upload_dir = upload_dir
+        self.result_dir = result_dir
+        self.json_dir = json_dir
+
+    @property
+    def dirs(self) -> list:
+        """
+        Все директории рабочего пространства.
+        """
+        return [self.upload_dir, self.result_dir, self.json_dir]
+
+    def result_url(self, filename: str) -> str:
+        """
+        Возвращает ссылку на аннотированное изображение.
+
+        Args:
+            filename (str): Имя файла.
+
+        Returns:
+            str: Относительный URL файла.
+        """
+        return f"/results/{self.id}/{filename}"
+
+    def json_url(self, filename: str) -> str:
+        """
+        Возвращает ссылку на JSON-аннотацию.
+
+        Args:
+            filename (str): Имя файла.
+
+        Returns:
+            str: Относительный URL файла.
+        """
+        return f"/json/{self.id}/{filename}"
+
+
+class WorkspaceManager:
+    def __init__(self, upload_root: str, result_root: str, json_root: str,
+                 ttl: float = 3600, reap_interval: float = 60) -> None:
+        """
+        Создает рабочие пространства запросов и удаляет устаревшие.
+
+        Каждое рабочее пространство — подкаталог с его идентификатором в директориях
+        загрузок, результатов и JSON. Пространство считается устаревшим, если
+        его результаты не изменялись и не запрашивались дольше ttl секунд и оно
+        не используется обработкой.
+
+        Args:
+            upload_root (str): Директория загруженных файлов.
+            result_root (str): Директория аннотированных изображений.
+            json_root (str): Директория JSON-аннотаций.
+            ttl (float): Время жизни неиспользуемого рабочего пространства в секундах.
+            reap_interval (float): Период проверки устаревших пространств в секундах.
+        """
+        self.upload_root = upload_root
+        self.result_root = result_root
+        self.json_root = json_root
+        self.ttl = ttl
+        self.reap_interval = reap_interval
+
+        self._lock = threading.Lock()
+        # Идентификатор -> количество незавершенных обработок
+        self._active = {}
+        self.reaped = 0
+        self._task = None
+
+    async def start(self) -> None:
+        """
+        Запускает периодическое удаление устаревших пространств в текущем цикле событий.
+        """
+        self._task = asyncio.create_task(self._reaper())
+
+    async def stop(self) -> None:
+        """
+        Останавливает удаление устаревших пространств.
+        """
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def create(self) -> Workspace:
+        """
+        Создает новое рабочее пространство.
+
+        Returns:
+            Workspace: Созданное рабочее пространство.
+        """
+        workspace = self._workspace(uuid.uuid4().hex)
+        for directory in workspace.dirs:
+            os.makedirs(directory, exist_ok=True)
+        return workspace
+
+    def get(self, workspace_id: str):
+        """
+        Возвращает существующее рабочее пространство и продлевает его время жизни.
+
+        Args:
+            workspace_id (str): Идентификатор рабочего пространства.
+
+        Returns:
+            Workspace | None: Рабочее пространство или None, если оно не найдено.
+        """
+        # Идентификатор попадает в пути, поэтому принимаем только ожидаемый формат
+        if not _WORKSPACE_ID.fullmatch(workspace_id):
+            return None
+        workspace = self._workspace(workspace_id)
+        if not os.path.isdir(workspace.result_dir):
+            return None
+        self.touch(workspace)
+        return workspace
+
+    def acquire(self, workspace: Workspace) -> None:
+        """
+        Отмечает рабочее пространство как используемое: оно не будет удалено до release.
+
+        Args:
+            workspace (Workspace): Рабочее пространство.
+        """
+        with self._lock:
+            self._active[workspace.id] = self._active.get(workspace.id, 0) + 1
+
+    def release(self, workspace: Workspace) -> None:
+        """
+        Снимает отметку использования, время жизни отсчитывается заново.
+
+        Args:
+            workspace (Workspace): Рабочее пространство.
+        """
+        with self._lock:
+            count = self._active.get(workspace.id, 0) - 1
+            if count > 0:
+                self._active[workspace.id] = count
+            else:
+                self._active.pop(workspace.id, None)
+        self.touch(workspace)
+
+    def in_use(self, workspace: Workspace) -> bool:
+        """
+        Проверяет, идет ли обработка в рабочем пространстве.
+
+        Args:
+            workspace (Workspace): Рабочее пространство.
+
+        Returns:
+            bool: True, если результаты пространства еще могут измениться.
+        """
+        with self._lock:
+            return workspace.id in self._active
+
+    def touch(self, workspace: Workspace) -> None:
+        """
+        Продлевает время жизни рабочего пространства.
+
+        Args:
+            workspace (Workspace): Рабочее пространство.
+        """
+        try:
+            os.utime(workspace.result_dir)
+        except OSError:
+            pass
+
+    def remove(self, workspace: Workspace) -> bool:
+        """
+        Удаляет рабочее пространство со всеми файлами, если в нем не идет обработка.
+
+        Args:
+            workspace (Workspace): Рабочее пространство.
+
+        Returns:
+            bool: True, если пространство удалено; False, если оно используется.
+        """
+        with self._lock:
+            if workspace.id in self._active:
+                return False
+        for directory in workspace.dirs:
+            shutil.rmtree(directory, ignore_errors=True)
+        return True
+
+    def reap(self) -> int:
+        """
+        Удаляет устаревшие рабочие пространства.
+
+        Returns:
+            int: Количество удаленных пространств.
+        """
+        deadline = time.time() - self.ttl
+        removed = 0
+        for root in (self.result_root, self.upload_root, self.json_root):
+            if not os.path.isdir(root):
+                continue
+            for workspace_id in os.listdir(root):
+                if not _WORKSPACE_ID.fullmatch(workspace_id):
+                    continue
+                workspace = self._workspace(workspace_id)
+                try:
+                    # Время жизни отсчитывается по директории результатов;
+                    # пространства без нее остались от прерванной обработки
+                    expired = os.path.getmtime(workspace.result_dir) < deadline
+                except OSError:
+                    expired = os.path.getmtime(os.path.join(root, workspace_id)) < deadline
+                if expired and self.remove(workspace):
+                    removed += 1
+        self.reaped += removed
+        return removed
+
+    def stats(self) -> dict:
+        """
+        Возвращает состояние рабочих пространств.
+
+        Returns:
+            dict: Время жизни, количество используемых и удаленных пространств.
+        """
+        with self._lock:
+            active = len(self._active)
+        return {"ttl": self.ttl, "active": active, "reaped": self.reaped}
+
+    def _workspace(self, workspace_id: str) -> Workspace:
+        return Workspace(
+            workspace_id,
+            os.path.join(self.upload_root, workspace_id),
+            os.path.join(self.result_root, workspace_id),
+            os.path.join(self.json_root, workspace_id),
+        )
+
+    async def _reaper(self) -> None:
+        """
+        Цикл периодического удаления устаревших пространств.
+        """
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.reap_interval)
+            try:
+                await loop.run_in_executor(None, self.reap)
+            except Exception as e:
+                print(f"Ошибка при удалении рабочих пространств: {e}")
@@ -11,6 +11,28 @@ import ResultsPage from './pages/ResultsPage';
 const App = () => {
   // Состояние для хранения обработанных изображений
   const [images, setImages] = React.useState([]);
+  // Состояние для отслеживания незавершенной обработки
+  const [processing, setProcessing] = React.useState(false);
+  // Состояние для хранения идентификатора рабочего пространства на сервере
+  const [workspaceId, setWorkspaceId] = React.useState(null);
+
+  /**
+   * Обрабатывает начало обработки изображений.
+   */
+  const handleProcessingStart = () => {
+    setImages([]);
+    setWorkspaceId(null);
+    setProcessing(true);
+  };
+
+  /**
+   * Добавляет очередное обработанное изображение.
+   *
+   * @param {string} image - Имя обработанного изображения.
+   */
+  const handlePageProcessed = (image) => {
+    setImages(prevImages => [...prevImages, image]);
+  };
 
   /**
    * Обрабатывает завершение обработки изображений.
@@ -19,6 +41,7 @@ const App = () => {
    */
   const handleProcessingComplete = (processedImages) => {
     setImages(processedImages);
+    setProcessing(false);
   };
 
   return (
@@ -26,9 +49,14 @@ const App = () => {
       {/* Маршруты приложения */}
       <Routes>
         {/* Маршрут для страницы загрузки файлов */}
-        <Route path="/" element={<UploadPage onProcessingComplete={handleProcessingComplete} />} />
+        <Route path="/" element={<UploadPage
+          onProcessingStart={handleProcessingStart}
+          onWorkspace={setWorkspaceId}
+          onPageProcessed={handlePageProcessed}
+          onProcessingComplete={handleProcessingComplete}
+        />} />
         {/* Маршрут для страницы результатов */}
-        <Route path="/results" element={<ResultsPage images={images} onDownload={() => { }} />} />
+        <Route path="/results" element={<ResultsPage images={images} workspaceId={workspaceId} processing={processing} onDownload={() => { }} />} />
       </Routes>
     </div>
   );
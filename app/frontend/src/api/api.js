@@ -15,13 +15,65 @@ export const uploadFiles = async (formData) => {
     });
 };
 
+/**
+ * Загружает файлы на сервер и получает результаты каждой страницы по мере готовности.
+ *
+ * @param {FormData} formData - Данные формы для загрузки.
+ * @param {Function} onEvent - Функция обратного вызова, получающая тип события и его данные.
+ * @returns {Promise} - Промис, который разрешается после завершения потока событий.
+ */
+export const uploadFilesStream = async (formData, onEvent) => {
+    const response = await fetch(`${API_URL}/process/stream`, {
+        method: "POST",
+        body: formData,
+    });
+    if (!response.ok || !response.body) {
+        throw new Error(`Ошибка сервера: ${response.status}`);
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+
+    // Разбираем поток Server-Sent Events: события разделены пустой строкой
+    while (true) {
+        const { done, value } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        let separatorIndex;
+        while ((separatorIndex = buffer.indexOf("\n\n")) !== -1) {
+            const rawEvent = buffer.slice(0, separatorIndex);
+            buffer = buffer.slice(separatorIndex + 2);
+
+            let event = "message";
+            let data = "";
+            rawEvent.split("\n").forEach(line => {
+                if (line.startsWith("event: ")) event = line.slice(7);
+                else if (line.startsWith("data: ")) data += line.slice(6);
+            });
+            onEvent(event, data ? JSON.parse(data) : null);
+        }
+    }
+};
+
+/**
+ * Возвращает URL аннотированного изображения.
+ *
+ * @param {string} workspaceId - Идентификатор рабочего пространства.
+ * @param {string} filename - Имя обработанного изображения.
+ * @returns {string} - URL изображения.
+ */
+export const resultUrl = (workspaceId, filename) => `${API_URL}/results/${workspaceId}/${filename}`;
+
 /**
  * Скачивает ZIP-архив с обработанными изображениями.
  *
+ * @param {string} workspaceId - Идентификатор рабочего пространства.
  * @returns {Promise} - Промис, который разрешается ответом от сервера с типом "blob".
  */
-export const downloadZip = async () => {
-    return axios.get(`${API_URL}/download/pics`, {
+export const downloadZip = async (workspaceId) => {
+    return axios.get(`${API_URL}/download/${workspaceId}/pics`, {
         responseType: "blob",
     });
 };
@@ -29,19 +81,21 @@ export const downloadZip = async () => {
 /**
  * Скачивает JSON-файлы с аннотациями.
  *
+ * @param {string} workspaceId - Идентификатор рабочего пространства.
  * @returns {Promise} - Промис, который разрешается ответом от сервера с типом "blob".
  */
-export const downloadJson = async () => {
-    return axios.get(`${API_URL}/download/json/`, {
+export const downloadJson = async (workspaceId) => {
+    return axios.get(`${API_URL}/download/${workspaceId}/json`, {
         responseType: "blob",
     });
 };
 
 /**
- * Очищает временные файлы на сервере.
+ * Очищает временные файлы рабочего пространства на сервере.
  *
+ * @param {string} workspaceId - Идентификатор рабочего пространства.
  * @returns {Promise} - Промис, который разрешается ответом от сервера.
  */
-export const cleanUp = async () => {
-    return axios.post(`${API_URL}/cleanup/`);
+export const cleanUp = async (workspaceId) => {
+    return axios.post(`${API_URL}/cleanup/${workspaceId}`);
 };
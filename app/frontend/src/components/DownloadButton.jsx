@@ -4,15 +4,16 @@ import { downloadZip, downloadJson } from "../api/api";
 /**
  * Компонент кнопки для скачивания файлов.
  *
+ * @param {string} workspaceId - Идентификатор рабочего пространства на сервере.
  * @returns {JSX.Element} - Компонент кнопки для скачивания файлов.
  */
-const DownloadButton = ({ }) => {
+const DownloadButton = ({ workspaceId }) => {
     /**
      * Обрабатывает скачивание файлов.
      */
     const handleDownloadAll = async () => {
         try {
-            const response = await downloadZip();
+            const response = await downloadZip(workspaceId);
 
             if (!response.data) {
                 console.error("Ответ от API не содержит данных.");
@@ -36,7 +37,7 @@ const DownloadButton = ({ }) => {
      */
     const handleDownloadJson = async () => {
         try {
-            const response = await downloadJson();
+            const response = await downloadJson(workspaceId);
 
             if (!response.data) {
                 console.error("Ответ от API не содержит данных.");
@@ -1,16 +1,19 @@
 import React, { useState, useCallback } from "react";
 import { useDropzone } from "react-dropzone";
-import { uploadFiles } from "../api/api";
+import { uploadFilesStream } from "../api/api";
 import Preview from "../components/Preview";
 import loading from '../assets/loading.svg';
 
 /**
  * Компонент для загрузки файлов.
  *
+ * @param {Function} onUploadStart - Функция обратного вызова, вызываемая в начале загрузки.
+ * @param {Function} onWorkspace - Функция обратного вызова, получающая идентификатор рабочего пространства.
+ * @param {Function} onPage - Функция обратного вызова, вызываемая с именем каждой обработанной страницы.
  * @param {Function} onUpload - Функция обратного вызова, вызываемая после завершения загрузки.
  * @returns {JSX.Element} - Компонент для загрузки файлов.
  */
-const FileUploader = ({ onUpload }) => {
+const FileUploader = ({ onUploadStart, onWorkspace, onPage, onUpload }) => {
     // Состояние для хранения выбранных файлов
     const [selectedFiles, setSelectedFiles] = useState([]);
     // Состояние для отслеживания процесса загрузки
@@ -63,17 +66,36 @@ const FileUploader = ({ onUpload }) => {
         selectedFiles.forEach(file => formData.append("files", file.file));
 
         setUploading(true);
+        onUploadStart();
+        // Страницы, результаты которых уже получены
+        const received = [];
+        let completed = false;
         try {
-            const response = await uploadFiles(formData);
-            if (response.data && Array.isArray(response.data.filenames)) {
-                onUpload(response.data.filenames);
-            } else {
+            // Получаем результаты страниц по мере их готовности
+            await uploadFilesStream(formData, (event, data) => {
+                if (event === "workspace") {
+                    onWorkspace(data.workspace_id);
+                } else if (event === "page") {
+                    received.push(data.filename);
+                    onPage(data.filename);
+                } else if (event === "done") {
+                    completed = true;
+                    onUpload(data.filenames);
+                } else if (event === "error") {
+                    console.error("Ошибка обработки файлов:", data.detail);
+                }
+            });
+            if (!completed) {
                 alert("Ошибка обработки файлов");
             }
         } catch (error) {
             console.error("Ошибка загрузки файлов:", error);
             alert("Ошибка загрузки файлов.");
         } finally {
+            // Завершаем обработку с уже полученными страницами, если поток оборвался
+            if (!completed) {
+                onUpload(received);
+            }
             setUploading(false);
         }
     };
@@ -2,15 +2,18 @@ import React from "react";
 import DownloadButton from "../components/DownloadButton";
 import Preview from "../components/Preview";
 import { useNavigate } from "react-router-dom";
-import { cleanUp } from "../api/api";
+import { cleanUp, resultUrl } from "../api/api";
+import loading from "../assets/loading.svg";
 
 /**
  * Компонент страницы результатов.
  *
  * @param {Array} images - Массив имен обработанных изображений.
+ * @param {string} workspaceId - Идентификатор рабочего пространства на сервере.
+ * @param {boolean} processing - Флаг незавершенной обработки.
  * @returns {JSX.Element} - Компонент страницы результатов.
  */
-const ResultsPage = ({ images }) => {
+const ResultsPage = ({ images, workspaceId, processing = false }) => {
     // Хук для навигации
     const navigate = useNavigate();
 
@@ -19,8 +22,10 @@ const ResultsPage = ({ images }) => {
      */
     const handleNavigateToHome = async () => {
         try {
-            // Очистка директорий
-            await cleanUp();
+            // Очистка рабочего пространства
+            if (workspaceId) {
+                await cleanUp(workspaceId);
+            }
             // Переход на главную страницу
             navigate("/");
         } catch (error) {
@@ -35,13 +40,19 @@ const ResultsPage = ({ images }) => {
             {/* Компонент предпросмотра изображений */}
             <Preview
                 files={images.map(image => ({
-                    url: `http://127.0.0.1:8000/results/${image}`,
+                    url: resultUrl(workspaceId, image),
                     name: image
                 }))}
                 showRemoveButton={false}
             />
+            {/* Индикатор загрузки, пока обрабатываются оставшиеся страницы */}
+            {processing && (
+                <div className="loading-indicator">
+                    <img src={loading} alt="Loading..." />
+                </div>
+            )}
             {/* Компонент кнопок для скачивания файлов */}
-            <DownloadButton />
+            <DownloadButton workspaceId={workspaceId} />
             {/* Кнопка для перехода на главную страницу */}
             <button onClick={handleNavigateToHome} className="page-button">На главную</button>
         </div>
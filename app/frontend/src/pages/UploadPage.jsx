@@ -5,15 +5,27 @@ import { useNavigate } from 'react-router-dom';
 /**
  * Компонент страницы загрузки файлов.
  *
+ * @param {Function} onProcessingStart - Функция обратного вызова, вызываемая в начале обработки файлов.
+ * @param {Function} onWorkspace - Функция обратного вызова, получающая идентификатор рабочего пространства.
+ * @param {Function} onPageProcessed - Функция обратного вызова, вызываемая после обработки каждой страницы.
  * @param {Function} onProcessingComplete - Функция обратного вызова, вызываемая после завершения обработки файлов.
  * @returns {JSX.Element} - Компонент страницы загрузки файлов.
  */
-const UploadPage = ({ onProcessingComplete }) => {
+const UploadPage = ({ onProcessingStart, onWorkspace, onPageProcessed, onProcessingComplete }) => {
     // Состояние для хранения обработанных файлов
     const [processedFiles, setProcessedFiles] = useState([]);
     // Хук для навигации
     const navigate = useNavigate();
 
+    /**
+     * Обрабатывает начало загрузки файлов.
+     */
+    const handleUploadStart = () => {
+        onProcessingStart();
+        // Переходим на страницу результатов, чтобы показывать страницы по мере готовности
+        navigate('/results');
+    };
+
     /**
      * Обрабатывает загрузку файлов.
      *
@@ -24,14 +36,12 @@ const UploadPage = ({ onProcessingComplete }) => {
         setProcessedFiles(files);
         // Вызываем функцию обратного вызова после завершения обработки файлов
         onProcessingComplete(files);
-        // Переходим на страницу результатов
-        navigate('/results');
     };
 
     return (
         <div>
             {/* Компонент для загрузки файлов */}
-            <FileUploader onUpload={handleUpload} />
+            <FileUploader onUploadStart={handleUploadStart} onWorkspace={onWorkspace} onPage={onPageProcessed} onUpload={handleUpload} />
             {/* Отображение предпросмотра обработанных файлов, если они есть */}
             {processedFiles.length > 0 && <Preview files={processedFiles} />}
         </div>
@@ -104,6 +104,73 @@ def evaluate_predictions(pred_boxes, pred_classes, pred_scores, gt_boxes, gt_cla
     
     return matches, num_pred, num_gt
 
+def update_class_metrics(class_metrics, matches, pred_classes, gt_classes):
+    """Обновление TP/FP/FN и суммарного IoU по классам для одного изображения"""
+    for match in matches:
+        class_id = match['class_id']
+        class_metrics[class_id]['TP'] += 1
+        class_metrics[class_id]['total_iou'] += match['iou']
+
+    # подсчет FP и FN
+    for class_id in range(len(class_names)):
+        pred_count = np.sum(pred_classes == class_id)
+        gt_count = np.sum(gt_classes == class_id)
+        tp_count = sum(1 for m in matches if m['class_id'] == class_id)
+
+        class_metrics[class_id]['FP'] += pred_count - tp_count
+        class_metrics[class_id]['FN'] += gt_count - tp_count
+
+def compute_metrics(class_metrics):
+    """Вычисление precision/recall/F1/mean IoU по классам и общих метрик"""
+    class_results = {}
+    for class_id in range(len(class_names)):
+        metrics = class_metrics[class_id]
+        tp = metrics['TP']
+        fp = metrics['FP']
+        fn = metrics['FN']
+
+        precision = tp / (tp + fp + 1e-6)
+        recall = tp / (tp + fn + 1e-6)
+        f1 = 2 * precision * recall / (precision + recall + 1e-6)
+        mean_iou = metrics['total_iou'] / (tp + 1e-6) if tp > 0 else 0
+
+        class_results[class_names[class_id]] = {
+            'precision': precision,
+            'recall': recall,
+            'f1': f1,
+            'mean_iou': mean_iou
+        }
+
+    # вычисление общих метрик
+    total_tp = sum(class_metrics[class_id]['TP'] for class_id in range(len(class_names)))
+    total_fp = sum(class_metrics[class_id]['FP'] for class_id in range(len(class_names)))
+    total_fn = sum(class_metrics[class_id]['FN'] for class_id in range(len(class_names)))
+    total_iou = sum(class_metrics[class_id]['total_iou'] for class_id in range(len(class_names)))
+
+    overall_metrics = {
+        'precision': total_tp / (total_tp + total_fp + 1e-6),
+        'recall': total_tp / (total_tp + total_fn + 1e-6),
+        'mean_iou': total_iou / (total_tp + 1e-6) if total_tp > 0 else 0
+    }
+
+    # f1 считаем через общие precision и recall
+    overall_metrics['f1'] = 2 * overall_metrics['precision'] * overall_metrics['recall'] / (
+        overall_metrics['precision'] + overall_metrics['recall'] + 1e-6
+    )
+    return overall_metrics, class_results
+
+def print_metrics(overall_metrics, class_results):
+    """Вывод общих метрик и метрик по классам"""
+    print("\nОбщие метрики:")
+    for metric, value in overall_metrics.items():
+        print(f"{metric}: {value:.4f}")
+
+    print("\nМетрики по классам:")
+    for class_name, metrics in class_results.items():
+        print(f"\n{class_name}:")
+        for metric, value in metrics.items():
+            print(f"{metric}: {value:.4f}")
+
 def plot_confusion_matrix(confusion_matrix, class_names):
     """Построение confusion matrix"""
     plt.figure(figsize=(12, 10))
@@ -202,19 +269,7 @@ def main():
             )
             
             # обновление метрик
-            for match in matches:
-                class_id = match['class_id']
-                class_metrics[class_id]['TP'] += 1
-                class_metrics[class_id]['total_iou'] += match['iou']
-            
-            # подсчет FP и FN
-            for class_id in range(len(class_names)):
-                pred_count = np.sum(pred_classes == class_id)
-                gt_count = np.sum(gt_classes == class_id)
-                tp_count = sum(1 for m in matches if m['class_id'] == class_id)
-                
-                class_metrics[class_id]['FP'] += pred_count - tp_count
-                class_metrics[class_id]['FN'] += gt_count - tp_count
+            update_class_metrics(class_metrics, matches, pred_classes, gt_classes)
             
             all_matches.extend(matches)
             
@@ -228,63 +283,14 @@ def main():
                 torch.from_numpy(gt_classes).long().to(device)
             )
     
-    # вычисление метрик для каждого класса
-    class_results = {}
-    overall_metrics = {
-        'precision': 0,  # при IoU > 0.5
-        'recall': 0, # при IoU > 0.5
-        'f1': 0, # при IoU > 0.5
-        'mean_iou': 0
-    }
-    
-    for class_id in range(len(class_names)):
-        metrics = class_metrics[class_id]
-        tp = metrics['TP']
-        fp = metrics['FP']
-        fn = metrics['FN']
-        
-        precision = tp / (tp + fp + 1e-6)
-        recall = tp / (tp + fn + 1e-6)
-        f1 = 2 * precision * recall / (precision + recall + 1e-6)
-        mean_iou = metrics['total_iou'] / (tp + 1e-6) if tp > 0 else 0
-        
-        class_results[class_names[class_id]] = {
-            'precision': precision,
-            'recall': recall,
-            'f1': f1,
-            'mean_iou': mean_iou
-        }
-    
-    # вычисление общих метрик
-    total_tp = sum(class_metrics[class_id]['TP'] for class_id in range(len(class_names)))
-    total_fp = sum(class_metrics[class_id]['FP'] for class_id in range(len(class_names)))
-    total_fn = sum(class_metrics[class_id]['FN'] for class_id in range(len(class_names)))
-    total_iou = sum(class_metrics[class_id]['total_iou'] for class_id in range(len(class_names)))
-
-    overall_metrics = {
-        'precision': total_tp / (total_tp + total_fp + 1e-6),
-        'recall': total_tp / (total_tp + total_fn + 1e-6),
-        'mean_iou': total_iou / (total_tp + 1e-6) if total_tp > 0 else 0
-    }
-
-    # f1 считаем через общие precision и recall
-    overall_metrics['f1'] = 2 * overall_metrics['precision'] * overall_metrics['recall'] / (
-        overall_metrics['precision'] + overall_metrics['recall'] + 1e-6
-    )
+    # вычисление метрик для каждого класса и общих метрик
+    overall_metrics, class_results = compute_metrics(class_metrics)
     
     # построение confusion matrix
     conf_matrix_fig = plot_confusion_matrix(conf_matrix.matrix, class_names)
     
     # вывод результатов
-    print("\nОбщие метрики:")
-    for metric, value in overall_metrics.items():
-        print(f"{metric}: {value:.4f}")
-    
-    print("\nМетрики по классам:")
-    for class_name, metrics in class_results.items():
-        print(f"\n{class_name}:")
-        for metric, value in metrics.items():
-            print(f"{metric}: {value:.4f}")
+    print_metrics(overall_metrics, class_results)
 
 if __name__ == "__main__":
     try:
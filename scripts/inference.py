@@ -1,3 +1,4 @@
+import sys
 import cv2
 import torch
 import json
@@ -7,6 +8,10 @@ from doclayout_yolo import YOLOv10
 import matplotlib.pyplot as plt
 import matplotlib.patches as patches
 
+# код модели сервиса лежит в app/backend
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app" / "backend"))
+from model.detections import Detections
+
 class_names = [
     'title', 'paragraph', 'table', 'picture', 
     'table_signature', 'picture_signature', 'numbered_list', 
@@ -48,13 +53,10 @@ def create_json_annotation(results, image_path, image_height, image_width):
     for class_name in class_names:
         annotation[class_name] = []
     
-    # заполнение списков координатами
-    for result in results:
-        boxes = result.boxes.cpu().numpy()
-        for box in boxes:
-            coords = box.xyxy[0].tolist()  # [x1, y1, x2, y2]
-            class_name = class_names[int(box.cls[0])]
-            annotation[class_name].append(coords)
+    # заполнение списков координатами [x1, y1, x2, y2], сгруппированными по классам
+    groups = Detections.from_results(results).by_class(class_names)
+    for class_name in class_names:
+        annotation[class_name] = groups[class_name].tolist()
     
     return annotation
 
@@ -73,8 +75,11 @@ def predict_and_visualize(model, image_path, output_path, json_output_path, conf
         device='cuda' if torch.cuda.is_available() else 'cpu'
     )
     
+    # переводим результаты в массивы один раз для JSON и визуализации
+    detections = Detections.from_results(results)
+
     # создание и сохранение JSON-аннотации
-    json_annotation = create_json_annotation(results, image_path, height, width)
+    json_annotation = create_json_annotation(detections, image_path, height, width)
     with open(json_output_path, 'w', encoding='utf-8') as f:
         json.dump(json_annotation, f, ensure_ascii=False, indent=4)
     print(f"JSON-разметка сохранена в {json_output_path}")
@@ -87,36 +92,29 @@ def predict_and_visualize(model, image_path, output_path, json_output_path, conf
     plt.imshow(image)
     
     # рисуем предсказания
-    for result in results:
-        boxes = result.boxes.cpu().numpy()
-        for box in boxes:
-            # получаем координаты
-            x1, y1, x2, y2 = box.xyxy[0]
-            conf = box.conf[0]
-            cls_id = int(box.cls[0])
-            
-            # получаем метку класса и цвет
-            class_name = class_names[cls_id]
-            color = colors[class_name]
-            
-            # создаем прямоугольник
-            rect = patches.Rectangle(
-                (x1, y1), x2-x1, y2-y1,
-                linewidth=2,
-                edgecolor=tuple(c/255 for c in color),
-                facecolor='none',
-                alpha=0.7
-            )
-            plt.gca().add_patch(rect)
-            
-            # добавляем текст с меткой класса и уверенностью
-            plt.text(
-                x1, y1-5,
-                f'{class_name} {conf:.2f}',
-                color='white',
-                bbox=dict(facecolor=tuple(c/255 for c in color), alpha=0.7),
-                fontsize=8
-            )
+    for (x1, y1, x2, y2), conf, cls_id in zip(detections.xyxy.tolist(), detections.conf.tolist(), detections.cls.tolist()):
+        # получаем метку класса и цвет
+        class_name = class_names[cls_id]
+        color = colors[class_name]
+        
+        # создаем прямоугольник
+        rect = patches.Rectangle(
+            (x1, y1), x2-x1, y2-y1,
+            linewidth=2,
+            edgecolor=tuple(c/255 for c in color),
+            facecolor='none',
+            alpha=0.7
+        )
+        plt.gca().add_patch(rect)
+        
+        # добавляем текст с меткой класса и уверенностью
+        plt.text(
+            x1, y1-5,
+            f'{class_name} {conf:.2f}',
+            color='white',
+            bbox=dict(facecolor=tuple(c/255 for c in color), alpha=0.7),
+            fontsize=8
+        )
     
     # убираем оси
     plt.axis('off')
@@ -131,7 +129,7 @@ def predict_and_visualize(model, image_path, output_path, json_output_path, conf
     plt.close()
     
     print(f"Визуализация сохранена в {output_path}")
-    return results
+    return detections
 
 def main():
     # пути к файлам и директориям
@@ -167,16 +165,12 @@ def main():
         json_output_path = json_output_dir / f"pred_{image_path.stem}.json"
         
         try:
-            results = predict_and_visualize(model, image_path, output_path, json_output_path)
+            detections = predict_and_visualize(model, image_path, output_path, json_output_path)
             
             # выводим информацию о найденных объектах
-            for result in results:
-                boxes = result.boxes.cpu().numpy()
-                print(f"\nНайдено {len(boxes)} объектов:")
-                for box in boxes:
-                    class_name = class_names[int(box.cls[0])]
-                    conf = box.conf[0]
-                    print(f"- {class_name}: {conf:.2f}")
+            print(f"\nНайдено {len(detections)} объектов:")
+            for cls_id, conf in zip(detections.cls.tolist(), detections.conf.tolist()):
+                print(f"- {class_names[cls_id]}: {conf:.2f}")
                     
         except Exception as e:
             print(f"Ошибка при обработке {image_path.name}: {str(e)}")
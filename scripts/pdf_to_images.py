@@ -1,25 +1,65 @@
 import os
+from concurrent.futures import ProcessPoolExecutor
 import pypdfium2 as pdfium
 
-def pdf_to_images(pdf_dir, img_dir, dpi=300):
-    os.makedirs(img_dir, exist_ok=True)
-    
-    for filename in os.listdir(pdf_dir):
+def render_range(pdf_path, base_name, start, stop, img_dir, dpi, imgsz=None):
+    """Рендеринг диапазона страниц одного документа. Каждый процесс открывает свой PdfDocument.
+    Если задан imgsz, длинная сторона страницы равна imgsz пикселей (столько использует модель), а dpi не учитывается"""
+    pdf = pdfium.PdfDocument(pdf_path)
+    img_paths = []
+    try:
+        for i in range(start, stop):
+            page = pdf[i]
+            scale = imgsz / max(page.get_size()) if imgsz else dpi / 72
+            img = page.render(scale=scale).to_pil()
+            img_path = os.path.join(img_dir, f"{base_name}_{i + 1}.png")
+            img.save(img_path)
+            img_paths.append(img_path)
+    finally:
+        pdf.close()
+    return img_paths
+
+def split_pages(pdf_dir, chunk_size):
+    """Разбиение всех документов директории на диапазоны страниц"""
+    tasks = []
+    for filename in sorted(os.listdir(pdf_dir)):
         if filename.endswith(".pdf"):
             pdf_path = os.path.join(pdf_dir, filename)
             base_name = os.path.splitext(filename)[0]
             try:
                 pdf = pdfium.PdfDocument(pdf_path)
-                for i in range(len(pdf)):
-                    page = pdf[i]
-                    img = page.render(scale=dpi / 72).to_pil()
-                    img_filename = f"{base_name}_{i + 1}.png"
-                    img.save(os.path.join(img_dir, img_filename))
-                    # print(f"Сохранено изображение: {img_filename}")
+                page_count = len(pdf)
+                pdf.close()
             except Exception as e:
                 print(f"Ошибка при обработке {filename}: {e}")
+                continue
+            for start in range(0, page_count, chunk_size):
+                tasks.append((pdf_path, base_name, start, min(start + chunk_size, page_count)))
+    return tasks
+
+def pdf_to_images(pdf_dir, img_dir, dpi=300, workers=None, chunk_size=8, imgsz=None):
+    os.makedirs(img_dir, exist_ok=True)
+    workers = workers or os.cpu_count()
+
+    # диапазоны страниц всех документов распределяются по пулу процессов
+    tasks = split_pages(pdf_dir, chunk_size)
+    img_paths = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(render_range, pdf_path, base_name, start, stop, img_dir, dpi, imgsz)
+            for pdf_path, base_name, start, stop in tasks
+        ]
+        # результаты собираем в порядке документов и страниц
+        for (pdf_path, _, start, stop), future in zip(tasks, futures):
+            try:
+                img_paths.extend(future.result())
+            except Exception as e:
+                print(f"Ошибка при обработке {os.path.basename(pdf_path)} (страницы {start + 1}-{stop}): {e}")
+    return img_paths
 
 if __name__ == "__main__":
     pdf_dir = "./data/pdf"
     img_dir = "./data/image"
-    pdf_to_images(pdf_dir, img_dir)
+    # None — рендеринг с фиксированным dpi, число — по длинной стороне под размер входа модели (например, 1024)
+    imgsz = None
+    pdf_to_images(pdf_dir, img_dir, imgsz=imgsz)
@@ -0,0 +1,109 @@
+import sys
+import json
+import time
+import random
+from pathlib import Path
+from collections import defaultdict
+
+from tqdm import tqdm
+
+from evaluate import class_names, load_ground_truth, evaluate_predictions, update_class_metrics, compute_metrics
+
+# код модели сервиса лежит в app/backend
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "app" / "backend"))
+from model.model import YOLOModel
+from model.backends import quantize_model
+
+def evaluate_model(model, test_images, json_dir, conf_threshold=0.25):
+    """Оценка модели сервиса на тестовых изображениях: метрики и среднее время на изображение"""
+    class_metrics = defaultdict(lambda: {'TP': 0, 'FP': 0, 'FN': 0, 'total_iou': 0})
+    total_time = 0
+
+    for image_path in tqdm(test_images, desc=f"Оценка ({model.backend})"):
+        gt_boxes, gt_classes = load_ground_truth(json_dir / f"{image_path.stem}.json")
+
+        start = time.perf_counter()
+        results = model.predict(str(image_path), conf_threshold)
+        total_time += time.perf_counter() - start
+
+        boxes = results[0].boxes.cpu().numpy()
+        pred_boxes = boxes.xyxy
+        pred_classes = boxes.cls.astype(int)
+        pred_scores = boxes.conf
+
+        matches, _, _ = evaluate_predictions(pred_boxes, pred_classes, pred_scores, gt_boxes, gt_classes)
+        update_class_metrics(class_metrics, matches, pred_classes, gt_classes)
+
+    overall_metrics, class_results = compute_metrics(class_metrics)
+    overall_metrics['latency_ms'] = total_time / max(len(test_images), 1) * 1000
+    return overall_metrics, class_results
+
+def regression_report(reference, quantized):
+    """Разница метрик квантованной модели относительно исходной"""
+    ref_overall, ref_classes = reference
+    q_overall, q_classes = quantized
+    return {
+        'overall': {
+            metric: {'fp32': ref_overall[metric], 'int8': q_overall[metric], 'delta': q_overall[metric] - ref_overall[metric]}
+            for metric in ref_overall
+        },
+        'classes': {
+            class_name: {
+                metric: {'fp32': value, 'int8': q_classes[class_name][metric], 'delta': q_classes[class_name][metric] - value}
+                for metric, value in metrics.items()
+            }
+            for class_name, metrics in ref_classes.items()
+        }
+    }
+
+def main():
+    # пути к файлам и директориям
+    project_root = Path.cwd()
+    weights_path = project_root / "app/backend/model/best_model.pt"
+    calibration_dir = project_root / "data/image"
+    # отложенная выборка, как в evaluate.py: калибровочные страницы не должны попадать в оценку
+    test_dataset_dir = project_root / "mixed_test_dataset"
+    images_dir = test_dataset_dir / "image"
+    json_dir = test_dataset_dir / "json"
+    report_path = project_root / "quantization_report.json"
+    imgsz = 1024
+    calibration_size = 100
+
+    # калибруем на случайной выборке страниц
+    calibration_images = sorted(calibration_dir.glob("*.png")) + sorted(calibration_dir.glob("*.jpg"))
+    random.seed(0)
+    calibration_images = random.sample(calibration_images, min(calibration_size, len(calibration_images)))
+
+    # на случай пересечения выборок исключаем из оценки страницы, использованные для калибровки
+    calibration_stems = {path.stem for path in calibration_images}
+    test_images = sorted(images_dir.glob("*.png")) + sorted(images_dir.glob("*.jpg"))
+    excluded = sum(path.stem in calibration_stems for path in test_images)
+    test_images = [path for path in test_images if path.stem not in calibration_stems]
+    print(f"Калибровочная выборка: {len(calibration_images)} изображений из {calibration_dir}")
+    print(f"Тестовая выборка: {len(test_images)} изображений из {images_dir} (исключено пересекающихся с калибровкой: {excluded})")
+    if not test_images:
+        raise SystemExit(f"Нет тестовых изображений в {images_dir}")
+
+    quantized_path = quantize_model(str(weights_path), [str(path) for path in calibration_images], imgsz=imgsz)
+    print(f"Квантованная модель сохранена в {quantized_path}")
+
+    # сравниваем исходную модель и INT8-вариант на одних и тех же изображениях
+    reference = evaluate_model(YOLOModel(str(weights_path)), test_images, json_dir)
+    quantized = evaluate_model(YOLOModel(str(weights_path), backend="onnx-int8", imgsz=imgsz), test_images, json_dir)
+    report = regression_report(reference, quantized)
+
+    print("\nОбщие метрики (fp32 -> int8):")
+    for metric, values in report['overall'].items():
+        print(f"{metric}: {values['fp32']:.4f} -> {values['int8']:.4f} ({values['delta']:+.4f})")
+
+    print("\nИзменение F1 по классам:")
+    for class_name in class_names:
+        values = report['classes'][class_name]['f1']
+        print(f"{class_name}: {values['fp32']:.4f} -> {values['int8']:.4f} ({values['delta']:+.4f})")
+
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=4, default=float)
+    print(f"\nОтчет сохранен в {report_path}")
+
+if __name__ == "__main__":
+    main()